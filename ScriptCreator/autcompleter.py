@@ -1,9 +1,42 @@
 from PyQt5.Qsci import QsciAPIs
 from player import Player
+from registers import NAMES as REGISTER_NAMES
+import ast
+import functools
 import importlib
+import inspect
 import builtins
+import textwrap
 from pathlib import Path
 
+
+@functools.lru_cache(maxsize=None)
+def player_names():
+    """Return ``(methods, variables)`` of ``Player`` without creating one.
+
+    Variables are the registers, the slots, the properties and whatever
+    ``Player.__init__`` assigns to ``self``.
+    """
+    methods = [name for name in dir(Player) if callable(getattr(Player, name, None))]
+    variables = set(REGISTER_NAMES)
+    for cls in Player.__mro__:
+        variables.update(slot for slot in getattr(cls, "__slots__", ()) if not slot.startswith("_"))
+        variables.update(name for name, value in vars(cls).items() if isinstance(value, property))
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(Player.__init__)))
+    except (OSError, TypeError, SyntaxError):
+        tree = None
+    if tree is not None:
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Attribute)
+                and isinstance(node.ctx, ast.Store)
+                and isinstance(node.value, ast.Name)
+                and node.value.id == "self"
+            ):
+                variables.add(node.attr)
+    return methods, sorted(variables)
+
 class AutoCompleter():
     def __init__(self, api):
         self.api: QsciAPIs = api
@@ -17,9 +50,7 @@ class AutoCompleter():
     def player_completions(self):
         try:
             if self.current != "player":
-                methods = [method_name for method_name in dir(Player())
-                  if callable(getattr(Player(), method_name))]
-                variables = Player().__dict__.keys()
+                methods, variables = player_names()
                 self.load_autocomplete(methods, variables)
                 self.current = "player"
         except Exception as e:
@@ -0,0 +1,147 @@
+"""Benchmark lock contention of group variables.
+
+    python bench_group_state.py --groups 20 --players 10 --seconds 3
+
+Every player is a thread that reads group variables, writes some and appends
+itself to a shared list the way member id scripts do. The old layout (one
+dict of dicts behind one lock, as ``Player`` kept it) runs against
+:class:`group_state.GroupStore`. The benchmark reports operations per second,
+how often an operation had to wait for a held lock, and the time spent
+waiting. Waits include getting the GIL back afterwards.
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from group_state import GroupStore
+
+
+class TimedLock:
+    """``threading.Lock`` that counts contended acquisitions and their wait."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = 0.0
+        self.acquired = 0
+        self.contended = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.acquired += 1
+            return True
+        if not blocking:
+            return False
+        begin = time.perf_counter()
+        ok = self._lock.acquire(True, timeout)
+        if ok:
+            # updated while holding the lock
+            self.wait += time.perf_counter() - begin
+            self.acquired += 1
+            self.contended += 1
+        return ok
+
+    def release(self):
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class GlobalDictVars:
+    """Group variables as ``Player`` stored them before ``GroupStore``."""
+
+    def __init__(self):
+        self.lock = TimedLock()
+        self.groups = {}
+
+    def get(self, gid, name, default=None):
+        with self.lock:
+            return self.groups.setdefault(gid, {}).get(name, default)
+
+    def set(self, gid, name, value):
+        with self.lock:
+            self.groups.setdefault(gid, {})[name] = value
+
+    def update(self, gid, name, func, default=None):
+        with self.lock:
+            group = self.groups.setdefault(gid, {})
+            group[name] = func(group.get(name, default))
+            return group[name], 0
+
+    def locks(self):
+        return [self.lock]
+
+
+class ShardedVars(GroupStore):
+    def __init__(self):
+        super().__init__(lock_factory=TimedLock)
+
+    def locks(self):
+        return [shard.lock for shard in self.shards().values()]
+
+
+def _player(store, gid, me, start, end, counts, rng):
+    # every thread stops on its own, the main thread may not get the GIL in time
+    start.wait()
+    ops = 0
+    while time.perf_counter() < end[0]:
+        roll = rng.random()
+        if roll < 0.8:
+            store.get(gid, rng.choice(("state", "target", "ids")))
+        elif roll < 0.95:
+            store.set(gid, "target", (me, ops))
+        else:
+            store.update(gid, "ids", lambda ids: (ids + [me])[-10:], [])
+        ops += 1
+    counts.append(ops)
+
+
+def run(name, store, groups, players, seconds, seed):
+    start = threading.Event()
+    end = [0.0]
+    counts = []
+    threads = [
+        threading.Thread(
+            target=_player,
+            args=(store, gid, (gid, p), start, end, counts, random.Random(seed + gid * players + p)),
+        )
+        for gid in range(groups)
+        for p in range(players)
+    ]
+    for thread in threads:
+        thread.start()
+    begin = time.perf_counter()
+    end[0] = begin + seconds
+    start.set()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - begin
+    locks = store.locks()
+    wait = sum(lock.wait for lock in locks)
+    acquired = sum(lock.acquired for lock in locks)
+    contended = sum(lock.contended for lock in locks)
+    total = sum(counts)
+    print(
+        f"{name:>8}: {total / seconds:9.0f} ops/s, {acquired / max(total, 1):6.1%} of ops lock, "
+        f"{contended * 1000 / max(total, 1):6.2f} lock waits per 1000 ops, "
+        f"{wait * 1e6 / max(total, 1):7.1f} us waited per op"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group variable contention benchmark")
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run("global", GlobalDictVars(), args.groups, args.players, args.seconds, args.seed)
+    run("sharded", ShardedVars(), args.groups, args.players, args.seconds, args.seed)
+
+
+if __name__ == "__main__":
+    main()
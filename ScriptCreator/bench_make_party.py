@@ -0,0 +1,141 @@
+"""Benchmark how long subgroups take to form their parties.
+
+    python bench_make_party.py --sizes 2 3 --parties 10 --latency 0.05
+
+There is no game server here, so every member is a thread that runs the
+handshake of ``Player.make_party`` against a simulated server: an invitation
+accepted by a member reaches the subgroup leader as a confirmation after
+``--latency`` seconds. The randomized human-like pauses of ``make_party``
+(``--accept-delay``, ``--invite-gap``) default to zero so the numbers show the
+coordination overhead alone; pass ``--accept-delay 2.5 --invite-gap 5`` for
+the real pacing.
+
+Every run is done twice: with the old helpers, which copied the state and
+checked it again every 0.2-0.25 seconds, and with
+:class:`partystate.MakePartyState`, whose waiters are woken on every change.
+"""
+
+import argparse
+import copy
+import threading
+import time
+
+from partystate import MakePartyState
+
+
+class PollingPartyState(MakePartyState):
+    """Waiters copy the whole state and check it every ``interval`` seconds."""
+
+    def __init__(self, interval=0.25):
+        super().__init__()
+        self.interval = interval
+
+    def wait(self, index, predicate, timeout=None, cancelled=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                copy.deepcopy(self._subgroups)
+                result = predicate(self._subgroup(index))
+            if result:
+                return result
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.interval)
+
+
+class Server:
+    """Delivers confirmations to the leader after a fixed latency."""
+
+    def __init__(self, board, latency):
+        self.board = board
+        self.latency = latency
+
+    def accept(self, index, name):
+        timer = threading.Timer(self.latency, self.board.confirm, (index, name))
+        timer.daemon = True
+        timer.start()
+
+
+def _member(board, server, index, position, names, args, done):
+    size = len(names)
+    final_stage = 2 * (size - 1)
+    board.register_ready(index, position, size, list(range(size)), names)
+    board.wait_started(index, size)
+    if position == 0:
+        board.wait_stage(index, 0)
+        for offset in range(1, size):
+            invite_stage = 2 * offset - 1
+            while True:
+                board.set_stage(index, invite_stage)
+                reached = board.wait(
+                    index, lambda sub: sub.confirmed_total() >= 1 + offset, timeout=6.0
+                )
+                if reached:
+                    break
+            board.set_stage(index, invite_stage + 1, completed=offset == size - 1)
+            if offset < size - 1 and args.invite_gap:
+                time.sleep(args.invite_gap)
+    else:
+        board.wait_stage(index, 2 * position - 1)
+        if args.accept_delay:
+            time.sleep(args.accept_delay)
+        server.accept(index, names[position])
+        board.set_stage(index, 2 * position, completed=position == size - 1)
+    board.wait_stage(index, final_stage)
+    board.wait(index, lambda sub: sub.confirmed_total(size) >= size, timeout=12.0)
+    done[position] = time.perf_counter()
+    board.finalize(index, position)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(name, board, size, args):
+    server = Server(board, args.latency)
+    results = []
+    threads = []
+    for index in range(1, args.parties + 1):
+        names = [f"p{index}m{position}" for position in range(size)]
+        done = [0.0] * size
+        results.append(done)
+        threads += [
+            threading.Thread(
+                target=_member, args=(board, server, index, position, names, args, done)
+            )
+            for position in range(size)
+        ]
+    cpu = time.process_time()
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu
+    # the pauses of the handshake itself are not overhead
+    floor = (size - 1) * (args.latency + args.accept_delay) + (size - 2) * args.invite_gap
+    times = [max(done) - begin for done in results]
+    print(
+        f"{name:>9} size {size}: party formed p50 {_percentile(times, 0.5) * 1000:7.1f} ms, "
+        f"max {max(times) * 1000:7.1f} ms, overhead p50 "
+        f"{(_percentile(times, 0.5) - floor) * 1000:7.1f} ms; "
+        f"{board.changes} changes, {cpu * 1000:.0f} ms cpu"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="make_party coordination benchmark")
+    parser.add_argument("--sizes", nargs="+", type=int, choices=(2, 3), default=[2, 3])
+    parser.add_argument("--parties", type=int, default=10, help="subgroups forming at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="server round trip (s)")
+    parser.add_argument("--accept-delay", type=float, default=0.0, help="make_party uses 2-3 s")
+    parser.add_argument("--invite-gap", type=float, default=0.0, help="make_party uses 5 s")
+    args = parser.parse_args()
+    for size in args.sizes:
+        run("polling", PollingPartyState(), size, args)
+        run("condition", MakePartyState(), size, args)
+
+
+if __name__ == "__main__":
+    main()
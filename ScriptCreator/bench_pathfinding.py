@@ -0,0 +1,201 @@
+"""Benchmark the flat and hierarchical path finders on real maps.
+
+Run from the ``ScriptCreator`` folder so ``resources/maps.zip`` resolves::
+
+    python bench_pathfinding.py --maps 1 20 260 --queries 20
+
+Queries are grouped into short (up to 30 cells), medium (up to the HPA*
+threshold) and cross-map walks (at least 60% of the map diagonal).
+``--cache`` additionally replays repeated walks whose start and goal jitter
+by a few cells, the way ``walk_to_point`` does, and reports the path cache
+hit rate and the search time it saved. ``--smoothing`` compares the walk
+packets needed for the old turning-point waypoints with line-of-sight
+smoothing.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import path
+from gridsearch import octile, path_cost
+from hpa import AbstractGraph
+
+
+def _walkable_cells(grid):
+    return [
+        (x, y)
+        for y, row in enumerate(grid)
+        for x, value in enumerate(row)
+        if value
+    ]
+
+
+def _sample_queries(grid, rng, count):
+    cells = _walkable_cells(grid)
+    height = len(grid)
+    width = len(grid[0])
+    diagonal = octile(0, 0, width - 1, height - 1)
+    buckets = {
+        "short": (1, 30),
+        "medium": (30, path.HPA_DISTANCE_THRESHOLD),
+        "cross-map": (0.6 * diagonal, float("inf")),
+    }
+    queries = {name: [] for name in buckets}
+    attempts = 0
+    while attempts < count * 2000 and any(len(q) < count for q in queries.values()):
+        attempts += 1
+        start = rng.choice(cells)
+        goal = rng.choice(cells)
+        distance = octile(*start, *goal)
+        for name, (low, high) in buckets.items():
+            if low <= distance < high and len(queries[name]) < count:
+                queries[name].append((start, goal))
+    return queries
+
+
+def _time_queries(finder, queries):
+    timings = []
+    costs = []
+    for start, goal in queries:
+        begin = time.perf_counter()
+        result = finder(start, goal)
+        timings.append(time.perf_counter() - begin)
+        costs.append(path_cost(list(result)) if result else None)
+    return timings, costs
+
+
+def run_cache_replay(map_ids, count, seed, jitter=3):
+    rng = random.Random(seed)
+    path._path_cache.reset_stats()
+    searched = 0.0
+    for map_id in map_ids:
+        grid = path.loadMap(map_id)
+        if not grid:
+            continue
+        cells = _walkable_cells(grid)
+        routes = [(rng.choice(cells), rng.choice(cells)) for _ in range(count)]
+        for _ in range(5):
+            for start, goal in routes:
+                real_start = (start[0] + rng.randint(-jitter, jitter), start[1] + rng.randint(-jitter, jitter))
+                real_goal = (goal[0] + rng.randint(-jitter, jitter), goal[1] + rng.randint(-jitter, jitter))
+                if not (_in_grid(grid, real_start) and _in_grid(grid, real_goal)):
+                    continue
+                begin = time.perf_counter()
+                path._cached_find_path(map_id, *real_start, *real_goal)
+                searched += time.perf_counter() - begin
+    stats = path.path_cache_stats()
+    print(
+        f"path cache: {stats['hits']} hits ({stats['exact_hits']} exact), "
+        f"{stats['misses']} misses, hit rate {stats['hit_rate']:.1%}, "
+        f"lookups {stats['lookup_time'] * 1000:.1f} ms, saved {stats['saved_time'] * 1000:.1f} ms "
+        f"of search time (total {searched * 1000:.1f} ms)"
+    )
+
+
+def _in_grid(grid, cell):
+    x, y = cell
+    return 0 <= y < len(grid) and 0 <= x < len(grid[0]) and grid[y][x]
+
+
+def _turning_points(cells):
+    # waypoint compression used by walk_to_point before path smoothing
+    def sign(v):
+        return -1 if v < 0 else (1 if v > 0 else 0)
+
+    waypoints = []
+    last_dir = None
+    for prev, cur in zip(cells, cells[1:]):
+        d = (sign(cur[0] - prev[0]), sign(cur[1] - prev[1]))
+        if last_dir is not None and d != last_dir:
+            waypoints.append(prev)
+        last_dir = d
+    waypoints.append(cells[-1])
+    return waypoints
+
+
+def run_smoothing(map_ids, count, seed):
+    rng = random.Random(seed)
+    for map_id in map_ids:
+        grid = path.loadMap(map_id)
+        if not grid:
+            continue
+        cells = _walkable_cells(grid)
+        turning = smoothed = walks = 0
+        elapsed = 0.0
+        while walks < count:
+            start, goal = rng.choice(cells), rng.choice(cells)
+            route = path._flat_find_path(grid, *start, *goal)
+            if len(route) < 2:
+                continue
+            route = [(int(n[0]), int(n[1])) for n in route]
+            begin = time.perf_counter()
+            waypoints = path.smooth_path(route, grid)
+            elapsed += time.perf_counter() - begin
+            turning += len(_turning_points(route))
+            smoothed += len(waypoints)
+            walks += 1
+        # every waypoint is sent as player_walk + pets_walk
+        print(
+            f"map {map_id}: packets per walk {2 * turning / walks:.1f} turning points -> "
+            f"{2 * smoothed / walks:.1f} smoothed "
+            f"({1 - smoothed / turning:.0%} fewer), "
+            f"smoothing {elapsed / walks * 1000:.2f} ms per walk"
+        )
+
+
+def run(map_ids, count, seed):
+    rng = random.Random(seed)
+    for map_id in map_ids:
+        grid = path.loadMap(map_id)
+        if not grid:
+            print(f"map {map_id}: could not be loaded")
+            continue
+        begin = time.perf_counter()
+        graph = AbstractGraph(grid)
+        graph.precompute()
+        build = time.perf_counter() - begin
+        print(
+            f"map {map_id} ({len(grid[0])}x{len(grid)}): abstract graph built in "
+            f"{build * 1000:.1f} ms"
+        )
+
+        finders = {
+            "flat A*": lambda s, g: path._flat_find_path(grid, s[0], s[1], g[0], g[1]),
+            "HPA*": graph.find_path,
+        }
+        for bucket, queries in _sample_queries(grid, rng, count).items():
+            if not queries:
+                continue
+            results = {name: _time_queries(f, queries) for name, f in finders.items()}
+            flat_costs = results["flat A*"][1]
+            for name, (timings, costs) in results.items():
+                ratios = [
+                    c / f for c, f in zip(costs, flat_costs) if c is not None and f
+                ]
+                quality = f"{max(ratios):.3f}" if ratios else "-"
+                print(
+                    f"  {bucket:<9} {name:<8} n={len(timings):<3} "
+                    f"median {statistics.median(timings) * 1000:8.2f} ms  "
+                    f"max {max(timings) * 1000:8.2f} ms  worst cost ratio {quality}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Path finder benchmark")
+    parser.add_argument("--maps", nargs="+", type=int, default=[1, 20, 145, 260])
+    parser.add_argument("--queries", type=int, default=20, help="queries per bucket")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="replay jittered walks")
+    parser.add_argument("--smoothing", action="store_true", help="compare walk packets")
+    args = parser.parse_args()
+    run(args.maps, args.queries, args.seed)
+    if args.cache:
+        run_cache_replay(args.maps, args.queries, args.seed)
+    if args.smoothing:
+        run_smoothing(args.maps, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
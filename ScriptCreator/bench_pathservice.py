@@ -0,0 +1,112 @@
+"""Benchmark packet handling latency while players search paths.
+
+Run from the ``ScriptCreator`` folder so ``resources/maps.zip`` resolves::
+
+    python bench_pathservice.py --map 1 --players 4 --seconds 5
+
+A thread stands in for a packetlogger and handles a small packet every
+``--interval`` milliseconds, recording how late each one was handled. At the
+same time ``--players`` threads search random paths, first in their own
+threads (``path.findPath``, the old per-player executors) and then on the
+shared :class:`pathservice.PathService` process pool.
+"""
+
+import argparse
+import random
+import threading
+import time
+
+import path
+from pathservice import PathService, unflatten
+
+
+def _packet_thread(stop, interval, delays):
+    # a cheap stand-in for the parsing done for every received packet
+    packet = "at 123456 1 45 67 2 0 0 1"
+    state = {}
+    due = time.perf_counter()
+    while not stop.is_set():
+        due += interval
+        pause = due - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+        parts = packet.split(" ")
+        state["x"], state["y"] = int(parts[3]), int(parts[4])
+        delays.append(time.perf_counter() - due)
+
+
+def _player_thread(stop, search, pairs, done):
+    rng = random.Random(threading.get_ident())
+    while not stop.is_set():
+        start, goal = rng.choice(pairs)
+        search(start, goal)
+        done.append(1)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_mode(name, search, pairs, players, seconds, interval):
+    stop = threading.Event()
+    delays, done = [], []
+    threads = [threading.Thread(target=_packet_thread, args=(stop, interval, delays))]
+    threads += [
+        threading.Thread(target=_player_thread, args=(stop, search, pairs, done))
+        for _ in range(players)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(
+        f"{name:>8}: packet delay p50 {_percentile(delays, 0.5) * 1000:.2f} ms, "
+        f"p99 {_percentile(delays, 0.99) * 1000:.2f} ms, max {max(delays) * 1000:.2f} ms; "
+        f"{len(done) / seconds:.1f} searches/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Path service latency benchmark")
+    parser.add_argument("--map", type=int, default=1)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=2.0, help="ms between packets")
+    parser.add_argument("--pairs", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    grid = path.loadMap(args.map)
+    if not grid:
+        print(f"map {args.map}: could not be loaded")
+        return
+    rng = random.Random(args.seed)
+    cells = [(x, y) for y, row in enumerate(grid) for x, value in enumerate(row) if value]
+    pairs = [(rng.choice(cells), rng.choice(cells)) for _ in range(args.pairs)]
+    interval = args.interval / 1000
+
+    def local(start, goal):
+        # same search as the service workers, without the path cache
+        return path._search_path(args.map, grid, *start, *goal)
+
+    run_mode("threads", local, pairs, args.players, args.seconds, interval)
+
+    service = PathService() if args.workers is None else PathService(args.workers)
+    service.find_path(args.map, pairs[0][0], pairs[0][1]).result()
+
+    def offloaded(start, goal):
+        return unflatten(service.find_path(args.map, start, goal).result())
+
+    try:
+        run_mode("service", offloaded, pairs, args.players, args.seconds, interval)
+        print(f"service stats: {service.stats()}")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
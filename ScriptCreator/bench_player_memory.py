@@ -0,0 +1,112 @@
+"""Benchmark the memory and attribute reads of player state.
+
+    python bench_player_memory.py --players 100
+    python bench_player_memory.py --players 100 --player
+
+The layouts below hold the same fields as ``Player``: the old one creates the
+hot fields and ``attr1``..``attr100`` (49 ints, 50 empty lists) as instance
+attributes, the new one keeps the hot fields in slots and the registers in a
+:class:`registers.Registers`. The benchmark reports the bytes allocated per
+instance (``tracemalloc``) and the time of attribute reads.
+
+``--player`` also measures real ``Player`` objects. They start an event loop
+thread and executors each, so the number includes those; it needs the
+client dependencies (PyQt5, pywinctl) to import ``player``.
+"""
+
+import argparse
+import gc
+import timeit
+import tracemalloc
+
+from registers import Registers
+
+HOT_FIELDS = (
+    "name",
+    "id",
+    "pos_x",
+    "pos_y",
+    "map_id",
+    "level",
+    "champion_level",
+    "hp_percent",
+    "current_hp",
+    "max_hp",
+    "mp_percent",
+    "current_mp",
+    "max_mp",
+    "is_resting",
+    "leadername",
+    "leaderID",
+)
+
+
+class DictLayout:
+    """Player fields as instance attributes, as ``Player`` created them."""
+
+    def __init__(self):
+        for name in HOT_FIELDS:
+            setattr(self, name, 0)
+        for i in range(1, 50):
+            setattr(self, f"attr{i}", 0)
+        for i in range(51, 101):
+            setattr(self, f"attr{i}", [])
+
+
+class SlotLayout(Registers):
+    """Hot fields in slots and the registers in one list."""
+
+    __slots__ = ("__dict__", "__weakref__", *HOT_FIELDS)
+
+    def __init__(self):
+        super().__init__()
+        for name in HOT_FIELDS:
+            setattr(self, name, 0)
+
+
+def allocated(factory, count):
+    """Return ``(objects, bytes per object)`` allocated by ``count`` calls."""
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return objects, total / count
+
+
+def reads(obj, expression, number=200_000):
+    return timeit.timeit(expression, globals={"p": obj}, number=number) / number * 1e9
+
+
+def report(label, factory, count):
+    objects, per_object = allocated(factory, count)
+    obj = objects[0]
+    print(
+        f"{label:>8}: {per_object:8.0f} B per instance, "
+        f"{per_object * count / 1024:7.1f} KiB for {count}; "
+        f"pos_x {reads(obj, 'p.pos_x'):5.1f} ns, attr19 {reads(obj, 'p.attr19'):5.1f} ns, "
+        f"attr51 {reads(obj, 'p.attr51'):5.1f} ns"
+    )
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="player state memory benchmark")
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--player", action="store_true", help="also measure player.Player")
+    args = parser.parse_args()
+    report("dict", DictLayout, args.players)
+    report("slots", SlotLayout, args.players)
+    if args.player:
+        from player import Player
+
+        players = report("Player", Player, args.players)
+        for player in players:
+            player.loop.call_soon_threadsafe(player.loop.stop)
+
+
+if __name__ == "__main__":
+    main()
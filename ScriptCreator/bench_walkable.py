@@ -0,0 +1,80 @@
+"""Benchmark the nearest walkable cell lookup used by field triangulation.
+
+Run from the ``ScriptCreator`` folder so ``resources/maps.zip`` resolves::
+
+    python bench_walkable.py --maps 1 235 260 --queries 200
+
+Compares the old full-map scan of ``find_walkable_pos`` with the cached
+multi-source BFS index and checks both return the same cell.
+"""
+
+import argparse
+import random
+import time
+
+import calculatefieldlocation
+import path
+
+
+def _full_scan(x, y, map_array):
+    # find_walkable_pos before the nearest walkable index
+    closest_distance = float('inf')
+    closest_coord = None
+    for i in range(len(map_array[0])):
+        for j in range(len(map_array)):
+            if map_array[j][i] == 1:
+                distance = abs(i - x) + abs(j - y)
+                if distance < closest_distance:
+                    closest_distance = distance
+                    closest_coord = (i, j)
+    return closest_coord
+
+
+def run(map_ids, count, seed):
+    rng = random.Random(seed)
+    for map_id in map_ids:
+        grid = path.loadMap(map_id)
+        if not grid:
+            print(f"map {map_id}: could not be loaded")
+            continue
+        width, height = len(grid[0]), len(grid)
+        # include points just outside the map, like offsets from the border
+        queries = [
+            (rng.randint(-20, width + 20), rng.randint(-20, height + 20))
+            for _ in range(count)
+        ]
+
+        begin = time.perf_counter()
+        calculatefieldlocation.build_nearest_walkable(grid)
+        build = time.perf_counter() - begin
+        calculatefieldlocation.find_walkable_pos(0, 0, grid)
+
+        begin = time.perf_counter()
+        indexed = [calculatefieldlocation.find_walkable_pos(x, y, grid) for x, y in queries]
+        lookup = (time.perf_counter() - begin) / count
+
+        scan_queries = queries[:max(1, count // 20)]
+        begin = time.perf_counter()
+        scanned = [_full_scan(x, y, grid) for x, y in scan_queries]
+        scan = (time.perf_counter() - begin) / len(scan_queries)
+
+        mismatches = sum(a != b for a, b in zip(indexed, scanned))
+        print(
+            f"map {map_id} ({width}x{height}): full scan {scan * 1000:.2f} ms, "
+            f"index lookup {lookup * 1e6:.2f} us (build {build * 1000:.1f} ms, "
+            f"pays off after {build / max(scan - lookup, 1e-9):.0f} calls), "
+            f"{mismatches} mismatches in {len(scan_queries)} checked"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest walkable cell benchmark")
+    parser.add_argument("--maps", nargs="+", type=int, default=[1, 235, 260])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.maps, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,138 @@
 # implemented based on Roman_ example, but withouth the use of numpy
 
 import math
+import threading
 import time
-
-def eliminate(r1, r2, col, target=0):
-    fac = (r2[col]-target) / r1[col]
-    for i in range(len(r2)):
-        r2[i] -= fac * r1[i]
-
-def gauss(a):
-    for i in range(len(a)):
-        if a[i][i] == 0:
-            for j in range(i+1, len(a)):
-                if a[i][j] != 0:
-                    a[i], a[j] = a[j], a[i]
-                    break
-            else:
-                raise ValueError("Matrix is not invertible")
-        for j in range(i+1, len(a)):
-            eliminate(a[i], a[j], i)
-    for i in range(len(a)-1, -1, -1):
-        for j in range(i-1, -1, -1):
-            eliminate(a[i], a[j], i)
-    for i in range(len(a)):
-        eliminate(a[i], a[i], i, target=1)
-    return a
-
-def inverse(a):
-    tmp = [[] for _ in a]
-    for i,row in enumerate(a):
-        assert len(row) == len(a)
-        tmp[i].extend(row + [0]*i + [1] + [0]*(len(a)-i-1))
-    gauss(tmp)
-    return [tmp[i][len(tmp[i])//2:] for i in range(len(tmp))]
-
-def matrix_multiply(matrix1, matrix2):
-    # Determine the dimensions of the matrices
-    rows1, cols1 = len(matrix1), len(matrix1[0])
-    rows2, cols2 = len(matrix2), 1  # Assuming matrix2 is a column vector
-
-    # Check if the matrices can be multiplied
-    if cols1 != rows2:
-        raise ValueError("Incompatible matrix dimensions for multiplication")
-
-    # Initialize the result matrix with zeros
-    result = [0] * rows1
-
-    # Perform matrix multiplication
-    for i in range(rows1):
-        for j in range(cols1):
-            result[i] += matrix1[i][j] * matrix2[j]
-
-    return result
+from collections import OrderedDict
 
 # angle of the red arrow can be wrong (both visually and in packet)
-# this function fixes it
+# this function fixes it: a single decimal digit really is the second one,
+# so 1.5 means 1.05 and -0.5 means -0.05
 def fix_angle(angle):
-    whole_part, decimal_part = str(angle).split(".")
-
-    if len(decimal_part) == 1:
-        decimal_part = "0" + decimal_part
-
-    new_number_string = whole_part + "." + decimal_part
-    return(float(new_number_string))
+    angle = float(angle)
+    if round(angle, 1) != angle:
+        return angle
+    whole = int(angle)
+    return round(whole + (angle - whole) / 10, 2)
+
+def solve_field_location(observations, fix_angles=True):
+    """Least-squares intersection of several rod readings.
+
+    ``observations`` is an iterable of ``(x, y, angle)`` or
+    ``(x, y, angle, weight)`` readings, possibly from different players. The
+    point closest to all the lines is found in closed form from the 2x2
+    normal equations. Returns ``(x, y, confidence, residual)`` where
+    ``residual`` is the RMS distance from the lines and ``confidence`` in
+    ``[0, 1]`` drops with parallel readings and with disagreeing ones, or
+    ``None`` when the readings are all parallel.
+    """
+    sxx = sxy = syy = bx = by = 0.0
+    total = 0.0
+    lines = []
+    for obs in observations:
+        x, y, angle = float(obs[0]), float(obs[1]), obs[2]
+        weight = float(obs[3]) if len(obs) > 3 else 1.0
+        if fix_angles:
+            angle = fix_angle(angle)
+        dx, dy = math.cos(angle), math.sin(angle)
+        # projection onto the line normal: I - d d^T
+        pxx, pxy, pyy = 1 - dx * dx, -dx * dy, 1 - dy * dy
+        sxx += weight * pxx
+        sxy += weight * pxy
+        syy += weight * pyy
+        bx += weight * (pxx * x + pxy * y)
+        by += weight * (pxy * x + pyy * y)
+        total += weight
+        lines.append((x, y, dx, dy, weight))
+
+    det = sxx * syy - sxy * sxy
+    if total <= 0 or det <= 1e-9 * total * total:
+        return None
+    px = (syy * bx - sxy * by) / det
+    py = (sxx * by - sxy * bx) / det
+
+    squared = 0.0
+    for x, y, dx, dy, weight in lines:
+        cross = (px - x) * dy - (py - y) * dx
+        squared += weight * cross * cross
+    residual = math.sqrt(squared / total)
+    # smallest eigenvalue of the normal matrix, 1.0 for perpendicular or
+    # evenly spread readings after normalising by total / 2
+    half_trace = (sxx + syy) / 2
+    smallest = half_trace - math.sqrt(max(half_trace * half_trace - det, 0.0))
+    spread = min(1.0, smallest / (total / 2))
+    confidence = spread / (1 + residual)
+    return px, py, confidence, residual
+
+_nearest_cache = OrderedDict()
+_nearest_lock = threading.Lock()
+_NEAREST_CACHE_SIZE = 8
+
+def build_nearest_walkable(map_array):
+    # multi-source BFS from every walkable cell: each cell ends up owning its
+    # closest walkable cell by manhattan distance. Owners are encoded as
+    # x * height + y so that ties resolve to the smallest x, then y, exactly
+    # like the old full scan did
+    height = len(map_array)
+    width = len(map_array[0]) if height else 0
+    size = width * height
+    owner = [-1] * size
+    frontier = []
+    for y, row in enumerate(map_array):
+        base = y * width
+        for x, value in enumerate(row):
+            if value == 1:
+                owner[base + x] = x * height + y
+                frontier.append(base + x)
+    while frontier:
+        claims = {}
+        for cell in frontier:
+            source = owner[cell]
+            x = cell % width
+            for n in (
+                cell - 1 if x > 0 else -1,
+                cell + 1 if x < width - 1 else -1,
+                cell - width,
+                cell + width if cell + width < size else -1,
+            ):
+                if n < 0 or owner[n] != -1:
+                    continue
+                best = claims.get(n)
+                if best is None or source < best:
+                    claims[n] = source
+        for cell, source in claims.items():
+            owner[cell] = source
+        frontier = list(claims)
+    return width, height, owner
+
+def _nearest_walkable_index(map_array):
+    # grids come from path's map cache, so the list identity is stable
+    key = id(map_array)
+    with _nearest_lock:
+        cached = _nearest_cache.get(key)
+        if cached is not None and cached[0] is map_array:
+            _nearest_cache.move_to_end(key)
+            return cached[1]
+        index = build_nearest_walkable(map_array)
+        _nearest_cache[key] = (map_array, index)
+        while len(_nearest_cache) > _NEAREST_CACHE_SIZE:
+            _nearest_cache.popitem(last=False)
+        return index
 
 def find_walkable_pos(x, y, map_array):
-    closest_distance = float('inf')
-    closest_coord = None
-
-    #this iterates over the entire array, rework this to just go from the x, y in a "circle"
-    for i in range(len(map_array[0])):
-        for j in range(len(map_array)):
-            if map_array[j][i] == 1:  # if walkable
-                distance = abs(i - x) + abs(j - y)
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_coord = (i, j)
-
-    return closest_coord
+    if not map_array:
+        return None
+    width, height, owner = _nearest_walkable_index(map_array)
+    if not width:
+        return None
+    # points outside the map keep the same nearest cell as the closest border
+    # cell, manhattan distance only grows by a constant
+    cx = min(max(int(x), 0), width - 1)
+    cy = min(max(int(y), 0), height - 1)
+    source = owner[cy * width + cx]
+    if source < 0:
+        return None
+    return (source // height, source % height)
 
 #calculate where to go based on current position an angle to get the second point required for triangulation
 def calculate_point_B_position(x, y, angle, map_array, offset = 20):
@@ -104,8 +159,8 @@ def calculate_point_B_position(x, y, angle, map_array, offset = 20):
     new_x = (x + plus_x)
     new_y = (y + plus_y)
 
-    new_x, new_y = find_walkable_pos(new_x, new_y, map_array)
-    return(new_x, new_y)
+    # None when the map has no walkable cell (or is not loaded)
+    return find_walkable_pos(new_x, new_y, map_array)
 
 def calculate_field_location(a, b, a_angle, b_angle, map_array = None):
     cur_time = time.time()
@@ -116,15 +171,29 @@ def calculate_field_location(a, b, a_angle, b_angle, map_array = None):
         #if map_array:
         #    x,y = find_walkable_pos(x, y, map_array)
         #return x,y
-    a_angle = fix_angle(a_angle)
-    b_angle = fix_angle(b_angle)
-
-    params = matrix_multiply(inverse([[math.cos(a_angle), math.cos(b_angle)],[math.sin(a_angle), math.sin(b_angle)]]), [b[0]-a[0], b[1]-a[1]])
+    solved = solve_field_location([(a[0], a[1], a_angle), (b[0], b[1], b_angle)])
+    if solved is None:
+        print("Fail while calculating field loaction, try to use rod in a better place...")
+        return None
 
     # calculating final position
-    x = int(a[0] + params[0] * math.cos(a_angle))
-    y = int(a[1] + params[0] * math.sin(a_angle))
+    x = int(solved[0])
+    y = int(solved[1])
 
     if map_array:
-        x,y = find_walkable_pos(x, y, map_array)
-    return x,y
\ No newline at end of file
+        return find_walkable_pos(x, y, map_array)
+    return x,y
+
+def calculate_fused_field_location(observations, map_array = None):
+    # same as calculate_field_location but for any number of readings,
+    # returns (x, y, confidence) or None
+    solved = solve_field_location(observations)
+    if solved is None:
+        return None
+    x, y = int(solved[0]), int(solved[1])
+    if map_array:
+        walkable = find_walkable_pos(x, y, map_array)
+        if walkable is None:
+            return None
+        x, y = walkable
+    return x, y, solved[2]
\ No newline at end of file
@@ -1157,9 +1157,9 @@ class ConditionCreator(QDialog):
                         numeric_value = 0
                     script += f'selfsubg.{var_name} = {numeric_value}'
                 elif operation == "Increase (+1)":
-                    script += f'selfsubg.{var_name} = int(selfsubg.{var_name}) + 1'
+                    script += f'selfsubg.incr("{var_name}")'
                 else:
-                    script += f'selfsubg.{var_name} = int(selfsubg.{var_name}) - 1'
+                    script += f'selfsubg.decr("{var_name}")'
             elif len(action) >= 3:
                 if action[2] == "string":
                     script += f'self.{name} = "{action[1]}"'
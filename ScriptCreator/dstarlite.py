@@ -0,0 +1,223 @@
+"""Incremental path repair with D* Lite.
+
+``walk_to_point`` used to throw the whole path away whenever a waypoint was
+not reached in time. ``LocalReplanner`` instead keeps a D* Lite search per
+walk over a window of the grid around the stalled stretch: the cell the
+player could not get through gets a temporary extra cost and only the part
+of the search affected by that change is recomputed. The repaired stretch
+rejoins the original path a few cells further on.
+
+D* Lite searches backwards from its goal, so the start can move between
+repairs (the player keeps walking) without restarting the search.
+"""
+
+import heapq
+
+from gridsearch import INF, NEIGHBOURS, _clip_bounds, cell_coords, grid_size, octile
+
+# extra cost (cells) added to a cell each time progress stalls on it
+STALL_PENALTY = 10.0
+# how far (path cells) past the stalled waypoint the repair rejoins the path
+REPAIR_LOOKAHEAD = 12
+# cells around the repaired stretch the search may use
+REPAIR_MARGIN = 8
+# keep the heuristic a hair below the true cost so float rounding in the
+# summed steps cannot make a cell on the optimal path look worse than the start
+_H_SCALE = 1 - 1e-9
+
+
+def _h(a, b):
+    return octile(*a, *b) * _H_SCALE
+
+
+class DStarLite:
+    """D* Lite search from ``start`` to ``goal`` with changeable cell costs.
+
+    Moving between two cells costs the octile step plus the extra costs of
+    both cells. ``bounds`` is an optional half-open ``(x0, y0, x1, y1)``
+    window like in :func:`gridsearch.astar`.
+    """
+
+    def __init__(self, grid, start, goal, bounds=None):
+        self.grid = grid
+        width, height = grid_size(grid)
+        self.bounds = _clip_bounds(bounds, width, height)
+        self.start = (int(start[0]), int(start[1]))
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.extra = {}
+        self.km = 0.0
+        self._g = {}
+        self._rhs = {self.goal: 0.0}
+        self._open = {}
+        self._heap = []
+        self.expanded = 0
+        self._push(self.goal)
+
+    def _walkable(self, cell):
+        x, y = cell
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= x < x1 and y0 <= y < y1 and self.grid[y][x] != 0
+
+    def _neighbours(self, cell):
+        x, y = cell
+        for dx, dy, step in NEIGHBOURS:
+            other = (x + dx, y + dy)
+            if self._walkable(other):
+                yield other, step
+
+    def _cost(self, a, b, step):
+        return step + self.extra.get(a, 0.0) + self.extra.get(b, 0.0)
+
+    def _key(self, cell):
+        best = min(self._g.get(cell, INF), self._rhs.get(cell, INF))
+        return (best + _h(self.start, cell) + self.km, best)
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self._open[cell] = key
+        heapq.heappush(self._heap, (key, cell))
+
+    def _top(self):
+        while self._heap:
+            key, cell = self._heap[0]
+            if self._open.get(cell) == key:
+                return key, cell
+            heapq.heappop(self._heap)
+        return (INF, INF), None
+
+    def _update(self, cell):
+        if cell != self.goal:
+            g = self._g
+            self._rhs[cell] = min(
+                (self._cost(cell, other, step) + g.get(other, INF)
+                 for other, step in self._neighbours(cell)),
+                default=INF,
+            )
+        self._open.pop(cell, None)
+        if self._g.get(cell, INF) != self._rhs.get(cell, INF):
+            self._push(cell)
+
+    def compute(self):
+        """Bring the search up to date for the current start and costs."""
+
+        g = self._g
+        rhs = self._rhs
+        while True:
+            top_key, cell = self._top()
+            start = self.start
+            if cell is None or (
+                top_key >= self._key(start) and rhs.get(start, INF) == g.get(start, INF)
+            ):
+                return
+            new_key = self._key(cell)
+            if top_key < new_key:
+                self._push(cell)
+                continue
+            heapq.heappop(self._heap)
+            del self._open[cell]
+            self.expanded += 1
+            if g.get(cell, INF) > rhs.get(cell, INF):
+                g[cell] = rhs[cell]
+                for other, _step in self._neighbours(cell):
+                    self._update(other)
+            else:
+                g[cell] = INF
+                self._update(cell)
+                for other, _step in self._neighbours(cell):
+                    self._update(other)
+
+    def move_start(self, cell):
+        """Continue from ``cell`` after the walker moved."""
+
+        cell = (int(cell[0]), int(cell[1]))
+        self.km += _h(self.start, cell)
+        self.start = cell
+
+    def add_cost(self, cell, amount):
+        """Make walking through ``cell`` ``amount`` more expensive."""
+
+        cell = (int(cell[0]), int(cell[1]))
+        if not self._walkable(cell):
+            return
+        self.extra[cell] = self.extra.get(cell, 0.0) + amount
+        self._update(cell)
+        for other, _step in self._neighbours(cell):
+            self._update(other)
+
+    def path(self):
+        """Return the current best cell path from the start to the goal."""
+
+        self.compute()
+        cell = self.start
+        if not self._walkable(cell) or self._g.get(cell, INF) == INF:
+            return []
+        result = [cell]
+        g = self._g
+        limit = (self.bounds[2] - self.bounds[0]) * (self.bounds[3] - self.bounds[1])
+        while cell != self.goal and len(result) <= limit:
+            cell = min(
+                self._neighbours(cell),
+                key=lambda item: self._cost(cell, item[0], item[1]) + g.get(item[0], INF),
+            )[0]
+            result.append(cell)
+        return result if cell == self.goal else []
+
+
+class LocalReplanner:
+    """Repair one walk's cell path around the places where it stalls."""
+
+    def __init__(self, grid, path, lookahead=REPAIR_LOOKAHEAD, margin=REPAIR_MARGIN):
+        self.grid = grid
+        self.path = cell_coords(path)
+        self.lookahead = lookahead
+        self.margin = margin
+        self.planner = None
+
+    def _nearest(self, cell, begin=0):
+        return min(
+            range(begin, len(self.path)),
+            key=lambda i: octile(*cell, *self.path[i]),
+        )
+
+    def repair(self, position, toward, penalty=STALL_PENALTY):
+        """Return the path from ``position`` with a detour around the stall.
+
+        ``toward`` is the waypoint the walker failed to reach. An empty list
+        means no local detour exists and a full search is needed.
+        """
+
+        position = (int(position[0]), int(position[1]))
+        toward = (int(toward[0]), int(toward[1]))
+        if not self.path:
+            return []
+        here = self._nearest(position)
+        ahead = max(here, self._nearest(toward, here))
+
+        planner = self.planner
+        if planner is None or planner.goal not in self.path[here:]:
+            rejoin = min(len(self.path) - 1, ahead + self.lookahead)
+            stretch = self.path[here:rejoin + 1] + [position]
+            bounds = (
+                min(x for x, _y in stretch) - self.margin,
+                min(y for _x, y in stretch) - self.margin,
+                max(x for x, _y in stretch) + self.margin + 1,
+                max(y for _x, y in stretch) + self.margin + 1,
+            )
+            planner = self.planner = DStarLite(self.grid, position, self.path[rejoin], bounds)
+        else:
+            planner.move_start(position)
+
+        planner.add_cost(_first_step(position, toward), penalty)
+        detour = planner.path()
+        if not detour:
+            return []
+        rejoin = self.path.index(planner.goal, here)
+        self.path = detour + self.path[rejoin + 1:]
+        return self.path
+
+
+def _first_step(a, b):
+    # the cell next to ``a`` in the direction of ``b``
+    dx = (b[0] > a[0]) - (b[0] < a[0])
+    dy = (b[1] > a[1]) - (b[1] < a[1])
+    return a[0] + dx, a[1] + dy
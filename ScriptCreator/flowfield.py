@@ -0,0 +1,138 @@
+"""Shared flow fields for several players walking to the same destination.
+
+A flow field is a reverse Dijkstra search rooted at the destination: every
+settled cell stores the neighbour that leads one step closer to the goal, so
+any number of walkers can follow it with plain lookups. The search is resumed
+lazily, only as far as the farthest walker that asked for a route.
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from gridsearch import INF, NEIGHBOURS, grid_size, is_walkable
+
+
+class FlowField:
+    """Next-step table towards ``goal`` on a single ``map_array`` grid."""
+
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.width, self.height = grid_size(grid)
+        self.goal = (int(goal[0]), int(goal[1]))
+        self._cost = {}
+        self._toward = {self.goal: None}
+        self._best = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        if is_walkable(grid, *self.goal):
+            self._best[self.goal] = 0.0
+            self._heap.append((0.0, self.goal))
+
+    @property
+    def settled(self):
+        """Number of cells whose next step is already known."""
+
+        return len(self._cost)
+
+    def _settle(self, cell):
+        with self._lock:
+            grid = self.grid
+            width = self.width
+            height = self.height
+            while cell not in self._cost and self._heap:
+                cost, node = heapq.heappop(self._heap)
+                if node in self._cost:
+                    continue
+                self._cost[node] = cost
+                x, y = node
+                for dx, dy, step in NEIGHBOURS:
+                    nx = x + dx
+                    ny = y + dy
+                    if nx < 0 or ny < 0 or nx >= width or ny >= height or not grid[ny][nx]:
+                        continue
+                    key = (nx, ny)
+                    new_cost = cost + step
+                    if new_cost < self._best.get(key, INF):
+                        self._best[key] = new_cost
+                        self._toward[key] = node
+                        heapq.heappush(self._heap, (new_cost, key))
+        return cell in self._cost
+
+    def cost(self, x, y):
+        """Return the walking cost from ``(x, y)`` to the goal or ``None``."""
+
+        cell = (int(x), int(y))
+        if not self._settle(cell):
+            return None
+        return self._cost[cell]
+
+    def next_step(self, x, y):
+        """Return the neighbour of ``(x, y)`` closest to the goal."""
+
+        cell = (int(x), int(y))
+        if not self._settle(cell):
+            return None
+        return self._toward[cell]
+
+    def path_from(self, start):
+        """Return the cell path from ``start`` to the goal, ``[]`` if unreachable."""
+
+        cell = (int(start[0]), int(start[1]))
+        if not self._settle(cell):
+            return []
+        path = []
+        while cell is not None:
+            path.append(cell)
+            cell = self._toward[cell]
+        return path
+
+
+class FlowFieldCache:
+    """LRU cache of flow fields keyed by ``(map_id, goal)``."""
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, map_id, goal, grid):
+        key = (map_id, (int(goal[0]), int(goal[1])))
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None and field.grid is grid:
+                self._fields.move_to_end(key)
+                return field
+            field = FlowField(grid, key[1])
+            self._fields[key] = field
+            while len(self._fields) > self.maxsize:
+                self._fields.popitem(last=False)
+            return field
+
+    def clear(self):
+        with self._lock:
+            self._fields.clear()
+
+
+class WalkTargetTracker:
+    """Remember which walkers asked for the same destination recently."""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self._targets = {}
+        self._lock = threading.Lock()
+
+    def register(self, key, walker, now=None):
+        """Record ``walker`` heading to ``key`` and return how many share it."""
+
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window
+        with self._lock:
+            for stale_key in [k for k, v in self._targets.items() if max(v.values()) < cutoff]:
+                del self._targets[stale_key]
+            walkers = self._targets.setdefault(key, {})
+            walkers[walker] = now
+            for stale_walker in [w for w, seen in walkers.items() if seen < cutoff]:
+                del walkers[stale_walker]
+            return len(walkers)
@@ -0,0 +1,261 @@
+"""Group walks: one path for the leader, formation offsets for the members.
+
+When every member of a group walks to the same point on its own, the group
+pays one path search and one stream of walk packets per member. With
+``Player.walk_group`` the leader searches once and publishes the smoothed
+waypoints in a :class:`GroupMove` kept in the group's shared state. Members
+derive their own targets from those waypoints by applying a formation offset
+(rotated to the direction of travel and snapped to the nearest walkable cell
+with the precomputed index of :mod:`calculatefieldlocation`), and follow the
+leader's progress through the same object instead of polling.
+
+Offsets are ``(forward, side)`` pairs in cells, relative to the leader and
+its heading: ``(-2, 0)`` is two cells behind, ``(0, 2)`` two cells to the
+right.
+"""
+
+import asyncio
+import threading
+
+from calculatefieldlocation import find_walkable_pos
+from gridsearch import octile
+from path import MAX_WALK_SEGMENT, has_line_of_sight
+
+FORMATIONS = ("column", "line", "wedge", "block")
+DEFAULT_FORMATION = "wedge"
+# cells between neighbouring members
+DEFAULT_SPACING = 2
+# seconds a member waits for the leader to publish the path before planning
+# the walk itself
+PLAN_WAIT = 2.0
+# waypoints the leader may get ahead of the slowest member
+MAX_LAG = 1
+
+
+def formation_offsets(formation, count, spacing=DEFAULT_SPACING):
+    """Return the ``(forward, side)`` offsets of slots ``0 .. count - 1``.
+
+    Slot ``0`` is the leader and always ``(0, 0)``.
+    """
+
+    if formation not in FORMATIONS:
+        raise ValueError(f"unknown formation {formation!r}, use one of {FORMATIONS}")
+    offsets = [(0, 0)]
+    for slot in range(1, count):
+        rank = (slot + 1) // 2
+        side = rank if slot % 2 else -rank
+        if formation == "column":
+            offsets.append((-slot * spacing, 0))
+        elif formation == "line":
+            offsets.append((0, side * spacing))
+        elif formation == "wedge":
+            offsets.append((-rank * spacing, side * spacing))
+        else:
+            # rows of three behind the leader
+            row, col = divmod(slot - 1, 3)
+            offsets.append((-(row + 1) * spacing, (col - 1) * spacing))
+    return offsets
+
+
+def heading(a, b, default=(0, 1)):
+    """Return the 8-way unit step from ``a`` towards ``b``."""
+
+    dx = (b[0] > a[0]) - (b[0] < a[0])
+    dy = (b[1] > a[1]) - (b[1] < a[1])
+    if not dx and not dy:
+        return default
+    return dx, dy
+
+
+def place(cell, offset, direction):
+    """Return ``cell`` moved by a ``(forward, side)`` offset along ``direction``."""
+
+    forward, side = offset
+    fx, fy = direction
+    # right-hand side of the heading in screen coordinates (y grows down)
+    sx, sy = -fy, fx
+    return (
+        int(cell[0]) + forward * fx + side * sx,
+        int(cell[1]) + forward * fy + side * sy,
+    )
+
+
+def follow_waypoints(waypoints, start, offset, grid, origin=None, max_segment=MAX_WALK_SEGMENT):
+    """Return the targets of a member following ``waypoints`` at ``offset``.
+
+    ``start`` is the member's own position and ``origin`` the leader's
+    position the waypoints start from. The result has one list of cells per
+    leader waypoint; walking them in order keeps every step in line of sight
+    of the previous one. Where the offset cell is cut off by a wall, the
+    member falls back onto the leader's line for that leg, so the formation
+    narrows in corridors instead of needing a search. An empty first leg
+    means ``start`` cannot see the first target and the member has to search
+    its way there.
+    """
+
+    waypoints = [(int(x), int(y)) for x, y in waypoints]
+    start = (int(start[0]), int(start[1]))
+    previous_leader = (int(origin[0]), int(origin[1])) if origin is not None else start
+    direction = (0, 1)
+    current = start
+    legs = []
+    for i, waypoint in enumerate(waypoints):
+        direction = heading(previous_leader, waypoint, direction)
+        wanted = place(waypoint, offset, direction)
+        target = None
+        if offset != (0, 0) and grid:
+            snapped = find_walkable_pos(wanted[0], wanted[1], grid)
+            if (
+                snapped is not None
+                and octile(*current, *snapped) <= max_segment
+                and has_line_of_sight(grid, current, snapped)
+                and has_line_of_sight(grid, snapped, waypoint)
+            ):
+                target = snapped
+        if target is not None:
+            legs.append([target])
+        elif not grid or has_line_of_sight(grid, current, waypoint):
+            legs.append([waypoint])
+        elif i == 0:
+            # the member is not in sight of the path yet
+            legs.append([])
+            target = waypoint
+        else:
+            # every target so far sees its leader waypoint, which sees this one
+            legs.append([previous_leader, waypoint])
+        current = target if target is not None else waypoint
+        previous_leader = waypoint
+    return legs
+
+
+class GroupMove:
+    """Shared state of one group walk to one point.
+
+    The leader :meth:`claim`s the move, :meth:`publish`es its waypoints and
+    :meth:`advance`s as it sends them; members :meth:`join`, walk their legs
+    once the leader got that far and :meth:`report` what they reached. Any
+    change wakes every coroutine waiting in :meth:`wait_for`, whatever loop
+    it runs on.
+    """
+
+    def __init__(self, map_id, goal, formation=DEFAULT_FORMATION, spacing=DEFAULT_SPACING):
+        self.map_id = map_id
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.formation = formation
+        self.spacing = spacing
+        self.leader = None
+        self.origin = None
+        self.waypoints = None
+        self.progress = -1
+        self.finished = False
+        self.failed = False
+        self.searches = 0
+        self._slots = {}
+        self._reached = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._waiters = []
+
+    def claim(self, member):
+        """Become the leader of the move; ``False`` if someone already is."""
+
+        with self._lock:
+            self._active.add(member)
+            if self.leader is not None:
+                return self.leader == member
+            self.leader = member
+            self._slots[member] = 0
+        self._notify()
+        return True
+
+    def join(self, member):
+        """Return the formation slot of ``member``, adding it if needed."""
+
+        with self._lock:
+            self._active.add(member)
+            slot = self._slots.get(member)
+            if slot is None:
+                # slot 0 stays free for whoever leads
+                slot = self._slots[member] = len([s for s in self._slots.values() if s]) + 1
+                self._reached[member] = -1
+            return slot
+
+    def offset(self, slot):
+        return formation_offsets(self.formation, slot + 1, self.spacing)[slot]
+
+    def publish(self, origin, waypoints):
+        with self._lock:
+            self.origin = (int(origin[0]), int(origin[1]))
+            self.waypoints = [(int(x), int(y)) for x, y in waypoints]
+            self.failed = not self.waypoints
+            self.finished = self.failed
+        self._notify()
+
+    def advance(self, index):
+        with self._lock:
+            self.progress = max(self.progress, index)
+        self._notify()
+
+    def report(self, member, index):
+        with self._lock:
+            if member in self._reached:
+                self._reached[member] = max(self._reached[member], index)
+        self._notify()
+
+    def finish(self, failed=False):
+        with self._lock:
+            self.finished = True
+            self.failed = self.failed or failed
+        self._notify()
+
+    def leave(self, member):
+        """Drop ``member``; returns how many members are still walking."""
+
+        with self._lock:
+            self._active.discard(member)
+            self._reached.pop(member, None)
+            remaining = len(self._active)
+        self._notify()
+        return remaining
+
+    def slowest(self):
+        """Return the lowest waypoint index reached by a walking member."""
+
+        with self._lock:
+            reached = [i for m, i in self._reached.items() if m in self._active]
+        return min(reached, default=len(self.waypoints or ()))
+
+    def _notify(self):
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # that player's loop is already closed
+                pass
+
+    async def wait_for(self, predicate, timeout=None):
+        """Wait until ``predicate()`` holds, or ``timeout`` seconds passed."""
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            future = loop.create_future()
+            with self._lock:
+                self._waiters.append((loop, future))
+            # checked after registering, so a change in between is not lost
+            if predicate():
+                return True
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,177 @@
+"""Low level search helpers shared by the path finders.
+
+Grids use the same layout as ``path.loadMap``: a list of rows indexed
+``grid[y][x]`` where ``1`` marks a walkable cell and ``0`` a blocked one.
+Movement is 8-connected and diagonal steps are always allowed, matching the
+``DiagonalMovement.always`` mode used with the ``pathfinding`` package.
+"""
+
+import heapq
+import math
+
+SQRT2 = math.sqrt(2)
+INF = float("inf")
+
+NEIGHBOURS = (
+    (1, 0, 1.0),
+    (-1, 0, 1.0),
+    (0, 1, 1.0),
+    (0, -1, 1.0),
+    (1, 1, SQRT2),
+    (1, -1, SQRT2),
+    (-1, 1, SQRT2),
+    (-1, -1, SQRT2),
+)
+
+
+def octile(ax, ay, bx, by):
+    """Return the octile distance between two cells."""
+
+    dx = abs(ax - bx)
+    dy = abs(ay - by)
+    return dx + dy + (SQRT2 - 2) * min(dx, dy)
+
+
+def grid_size(grid):
+    """Return ``(width, height)`` of ``grid``."""
+
+    height = len(grid)
+    width = len(grid[0]) if height else 0
+    return width, height
+
+
+def is_walkable(grid, x, y):
+    """Return ``True`` when ``(x, y)`` is inside ``grid`` and walkable."""
+
+    if y < 0 or x < 0 or y >= len(grid):
+        return False
+    row = grid[y]
+    return x < len(row) and row[x] != 0
+
+
+def cell_coords(nodes):
+    """Return ``nodes`` as ``(x, y)`` int tuples.
+
+    Accepts pairs as well as objects exposing ``x`` and ``y`` such as the
+    ``GridNode`` results of the ``pathfinding`` package.
+    """
+
+    return [
+        (int(n.x), int(n.y)) if hasattr(n, "x") and hasattr(n, "y") else (int(n[0]), int(n[1]))
+        for n in nodes
+    ]
+
+
+def path_cost(path):
+    """Return the octile length of a sequence of adjacent cells."""
+
+    total = 0.0
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        total += SQRT2 if ax != bx and ay != by else 1.0
+    return total
+
+
+def _clip_bounds(bounds, width, height):
+    if bounds is None:
+        return 0, 0, width, height
+    x0, y0, x1, y1 = bounds
+    return max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+
+
+def _reconstruct(parent, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    path.reverse()
+    return path
+
+
+def astar(grid, start, goal, bounds=None):
+    """Return the shortest cell path from ``start`` to ``goal``.
+
+    ``bounds`` optionally restricts the search to the half-open rectangle
+    ``(x0, y0, x1, y1)``. The result includes both end points as ``(x, y)``
+    tuples and is empty when the goal cannot be reached.
+    """
+
+    width, height = grid_size(grid)
+    x0, y0, x1, y1 = _clip_bounds(bounds, width, height)
+    sx, sy = int(start[0]), int(start[1])
+    gx, gy = int(goal[0]), int(goal[1])
+    for x, y in ((sx, sy), (gx, gy)):
+        if not (x0 <= x < x1 and y0 <= y < y1) or not is_walkable(grid, x, y):
+            return []
+
+    start = (sx, sy)
+    best = {start: 0.0}
+    parent = {start: None}
+    closed = set()
+    open_heap = [(octile(sx, sy, gx, gy), 0.0, sx, sy)]
+    while open_heap:
+        _f, neg_cost, x, y = heapq.heappop(open_heap)
+        node = (x, y)
+        if node in closed:
+            continue
+        if x == gx and y == gy:
+            return _reconstruct(parent, node)
+        closed.add(node)
+        cost = -neg_cost
+        for dx, dy, step in NEIGHBOURS:
+            nx = x + dx
+            ny = y + dy
+            if nx < x0 or ny < y0 or nx >= x1 or ny >= y1 or not grid[ny][nx]:
+                continue
+            key = (nx, ny)
+            new_cost = cost + step
+            if new_cost < best.get(key, INF):
+                best[key] = new_cost
+                parent[key] = node
+                heapq.heappush(
+                    open_heap,
+                    (new_cost + octile(nx, ny, gx, gy), -new_cost, nx, ny),
+                )
+    return []
+
+
+def dijkstra(grid, source, bounds=None, targets=None):
+    """Return a ``{cell: cost}`` map of everything reachable from ``source``.
+
+    When ``targets`` is given the search stops as soon as all of them have
+    been settled and only their costs are returned.
+    """
+
+    width, height = grid_size(grid)
+    x0, y0, x1, y1 = _clip_bounds(bounds, width, height)
+    sx, sy = int(source[0]), int(source[1])
+    if not (x0 <= sx < x1 and y0 <= sy < y1) or not is_walkable(grid, sx, sy):
+        return {}
+
+    pending = set(targets) if targets is not None else None
+    best = {(sx, sy): 0.0}
+    settled = {}
+    open_heap = [(0.0, sx, sy)]
+    while open_heap:
+        cost, x, y = heapq.heappop(open_heap)
+        node = (x, y)
+        if node in settled:
+            continue
+        settled[node] = cost
+        if pending is not None:
+            pending.discard(node)
+            if not pending:
+                break
+        for dx, dy, step in NEIGHBOURS:
+            nx = x + dx
+            ny = y + dy
+            if nx < x0 or ny < y0 or nx >= x1 or ny >= y1 or not grid[ny][nx]:
+                continue
+            key = (nx, ny)
+            new_cost = cost + step
+            if new_cost < best.get(key, INF):
+                best[key] = new_cost
+                heapq.heappush(open_heap, (new_cost, nx, ny))
+
+    if targets is None:
+        return settled
+    return {node: settled[node] for node in targets if node in settled}
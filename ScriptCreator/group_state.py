@@ -0,0 +1,820 @@
+"""Group-shared variables, sharded per group with versioned entries.
+
+``Player`` used to keep every group's variables in one class-level dict behind
+one ``threading.Lock``, so every ``get_group_var``/``set_group_var`` of every
+condition in every group waited on the same lock. ``GroupStore`` keeps one
+:class:`GroupShard` per group id instead:
+
+* reads take no lock, they look the name up in the shard's current snapshot,
+  a dict that is never modified once published;
+* writes take only that shard's lock, copy the snapshot, change the copy and
+  publish it;
+* every entry carries the version of its last write, so a script can read a
+  value, compute a new one and store it with :meth:`GroupStore.compare_and_set`
+  only if nobody changed it in between, or let :meth:`GroupStore.update` do
+  the whole read-modify-write under the shard lock.
+
+Values are shared, not copied: treat what :meth:`GroupStore.get` returns as
+read-only and store a new object instead of changing it in place.
+
+Conditions waiting for another player to change a variable do not have to
+poll it: :meth:`GroupStore.watch` calls back on the watcher's event loop after
+every write of a name, and :meth:`GroupStore.wait_for` awaits a value.
+
+Counters do not need a read-modify-write either: :meth:`GroupStore.add`
+increments in one write and :meth:`GroupStore.compare_and_swap` replaces an
+expected value. :func:`barrier` lets members wait for each other.
+:class:`CounterStore` has the same methods for integer-only
+variables (the subgroup variables) and keeps them in ``array('q')`` slots.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+# a stored value and the version of its last write
+Entry = namedtuple("Entry", "value version")
+
+_EMPTY = {}
+# waiters are woken by write notifications, also when their group is merged
+# into another (the watch moves with it). A group id given as a callable can
+# change without any write (leaderID from a packet, a subgroup assignment),
+# so those waiters resolve it again this often (seconds)
+WAIT_RECHECK = 1.0
+# for a fixed group id the recheck is only a safety net
+WAIT_SAFETY_RECHECK = 30.0
+
+
+class Watch:
+    """A callback for writes of one name, cancelled with :meth:`cancel`."""
+
+    __slots__ = ("store", "gid", "name", "loop", "callback", "active", "version")
+
+    def __init__(self, store, gid, name, loop, callback):
+        self.store = store
+        self.gid = gid
+        self.name = name
+        self.loop = loop
+        self.callback = callback
+        self.active = True
+        # version of ``name`` in the group a merge moved the watch to
+        self.version = None
+
+    def notify(self, value):
+        if not self.active:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._run, value)
+        except RuntimeError:
+            # the watcher's loop is closed
+            self.cancel()
+
+    def _run(self, value):
+        if not self.active:
+            return
+        result = self.callback(value)
+        if asyncio.iscoroutine(result):
+            self.loop.create_task(result)
+
+    def cancel(self):
+        if self.active:
+            self.active = False
+            self.store._unwatch(self)
+
+
+class GroupShard:
+    """Variables of one group."""
+
+    __slots__ = ("lock", "entries", "generation", "_clock")
+
+    def __init__(self, lock, clock):
+        self.lock = lock
+        # replaced, never modified, on every write
+        self.entries = _EMPTY
+        self.generation = 0
+        # shared by all shards of a store, so a group that is dropped and
+        # created again never reuses a version
+        self._clock = clock
+
+    def _bump(self):
+        self.generation = next(self._clock)
+        return self.generation
+
+    def _publish(self, entries):
+        # every new snapshot is published here
+        self.entries = entries
+
+    def _write(self, name, value):
+        # caller holds ``lock``
+        version = self._bump()
+        entries = dict(self.entries)
+        entries[name] = Entry(value, version)
+        self._publish(entries)
+        return version
+
+
+class GroupStore:
+    """Shards of group variables keyed by group id."""
+
+    def __init__(self, lock_factory=threading.Lock):
+        self._lock_factory = lock_factory
+        self._shards = {}
+        self._clock = itertools.count(1)
+        # only taken to add or remove shards
+        self._shards_lock = threading.Lock()
+        # {gid: {name: (Watch, ...)}}, replaced on every change like snapshots
+        self._watchers = {}
+        self._watch_lock = threading.Lock()
+
+    def shard(self, gid, create=True):
+        """Return the shard of ``gid``; ``None`` if missing and not ``create``."""
+
+        shard = self._shards.get(gid)
+        if shard is None and create:
+            with self._shards_lock:
+                shard = self._shards.get(gid)
+                if shard is None:
+                    shard = self._shards[gid] = GroupShard(self._lock_factory(), self._clock)
+        return shard
+
+    def shards(self):
+        """Return ``{gid: shard}`` of every group that has variables."""
+
+        with self._shards_lock:
+            return dict(self._shards)
+
+    def groups(self):
+        """Return the ids of every group that has variables."""
+
+        return list(self.shards())
+
+    def get(self, gid, name, default=None):
+        shard = self._shards.get(gid)
+        entry = shard.entries.get(name) if shard is not None else None
+        return default if entry is None else entry.value
+
+    def get_versioned(self, gid, name, default=None):
+        """Return ``(value, version)``; the version of a missing name is 0."""
+
+        shard = self._shards.get(gid)
+        entry = shard.entries.get(name) if shard is not None else None
+        return (default, 0) if entry is None else (entry.value, entry.version)
+
+    def snapshot(self, gid):
+        """Return ``{name: value}`` of ``gid`` as of now."""
+
+        shard = self._shards.get(gid)
+        if shard is None:
+            return {}
+        return {name: entry.value for name, entry in shard.entries.items()}
+
+    def _acquire(self, gid):
+        # lock the live shard of gid; a shard removed while we waited for its
+        # lock is stale and a fresh one is used instead
+        while True:
+            shard = self.shard(gid)
+            shard.lock.acquire()
+            if self._shards.get(gid) is shard:
+                return shard
+            shard.lock.release()
+
+    def _detach(self, gid, shard):
+        # caller holds shard.lock
+        with self._shards_lock:
+            if self._shards.get(gid) is shard:
+                del self._shards[gid]
+        shard._bump()
+        shard._publish(_EMPTY)
+
+    def set(self, gid, name, value):
+        """Store ``value`` and return its version."""
+
+        shard = self._acquire(gid)
+        try:
+            version = shard._write(name, value)
+            self._notify(gid, (name,), shard.entries)
+            return version
+        finally:
+            shard.lock.release()
+
+    def compare_and_set(self, gid, name, expected_version, value):
+        """Store ``value`` only if ``name`` is still at ``expected_version``.
+
+        Use the version from :meth:`get_versioned`; ``0`` means the name must
+        not exist yet. Returns ``(stored, version)`` where ``version`` is the
+        new version on success and the current one otherwise.
+        """
+
+        shard = self._acquire(gid)
+        try:
+            entry = shard.entries.get(name)
+            current = 0 if entry is None else entry.version
+            if current != expected_version:
+                return False, current
+            version = shard._write(name, value)
+            self._notify(gid, (name,), shard.entries)
+            return True, version
+        finally:
+            shard.lock.release()
+
+    def update(self, gid, name, func, default=None):
+        """Replace ``name`` with ``func(old)`` atomically.
+
+        ``old`` is ``default`` when the name is missing. ``func`` runs under
+        the group's lock, so keep it short and do not write variables from
+        it. Returns ``(new_value, version)``.
+        """
+
+        shard = self._acquire(gid)
+        try:
+            entry = shard.entries.get(name)
+            value = func(default if entry is None else entry.value)
+            version = shard._write(name, value)
+            self._notify(gid, (name,), shard.entries)
+            return value, version
+        finally:
+            shard.lock.release()
+
+    def add(self, gid, name, delta, default=0):
+        """Add ``delta`` to ``name`` atomically; returns ``(new_value, version)``.
+
+        One write instead of a get and a set, so members counting
+        themselves in never lose an increment.
+        """
+
+        return self.update(gid, name, lambda value: value + delta, default)
+
+    def compare_and_swap(self, gid, name, expected, value, default=None):
+        """Store ``value`` only if ``name`` currently equals ``expected``.
+
+        Unlike :meth:`compare_and_set` this compares values, not versions.
+        Returns ``(swapped, current)`` where ``current`` is the value after
+        the call.
+        """
+
+        shard = self._acquire(gid)
+        try:
+            entry = shard.entries.get(name)
+            current = default if entry is None else entry.value
+            if current != expected:
+                return False, current
+            shard._write(name, value)
+            self._notify(gid, (name,), shard.entries)
+            return True, value
+        finally:
+            shard.lock.release()
+
+    def delete(self, gid, name):
+        """Remove ``name``; the group's shard goes away with its last name."""
+
+        shard = self._shards.get(gid)
+        if shard is None:
+            return
+        with shard.lock:
+            if self._shards.get(gid) is not shard or name not in shard.entries:
+                return
+            entries = dict(shard.entries)
+            del entries[name]
+            if not entries:
+                self._detach(gid, shard)
+            else:
+                shard._bump()
+                shard._publish(entries)
+            self._notify(gid, (name,), entries)
+
+    def drop(self, gid):
+        """Forget every variable of ``gid``."""
+
+        shard = self._shards.get(gid)
+        if shard is not None:
+            with shard.lock:
+                names = tuple(shard.entries)
+                self._detach(gid, shard)
+                self._notify(gid, names, _EMPTY)
+
+    def merge(self, source, target):
+        """Move the variables of ``source`` into ``target``.
+
+        Names present in both take the value from ``source``, like the
+        placeholder group of a player being folded into its leader's group.
+        """
+
+        if source == target:
+            return
+        # whoever watched the placeholder group follows it, also when it
+        # holds no variables yet
+        moved = self._shards.get(source)
+        if moved is None:
+            self._move_watchers(source, target)
+            return
+        with moved.lock:
+            entries = moved.entries
+            self._detach(source, moved)
+        if not entries:
+            self._move_watchers(source, target)
+            return
+        shard = self._acquire(target)
+        try:
+            version = shard._bump()
+            merged = dict(shard.entries)
+            for name, entry in entries.items():
+                merged[name] = Entry(entry.value, version)
+            shard._publish(merged)
+            # moved after the merged values are in, which are no new writes
+            self._move_watchers(source, target)
+            self._notify(target, tuple(entries), merged)
+        finally:
+            shard.lock.release()
+
+    def clear(self):
+        for gid, shard in self.shards().items():
+            with shard.lock:
+                names = tuple(shard.entries)
+                self._detach(gid, shard)
+                self._notify(gid, names, _EMPTY)
+
+    # ------------------------------------------------------------------ #
+    # Change notifications
+    # ------------------------------------------------------------------ #
+    def watch(self, gid, name, callback, loop=None):
+        """Call ``callback(value)`` on ``loop`` after every write of ``name``.
+
+        ``loop`` defaults to the running loop. Deleting the name reports
+        ``None``. A coroutine returned by ``callback`` is scheduled on the
+        loop. Returns a :class:`Watch`; call its ``cancel`` to stop.
+        """
+
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        watch = Watch(self, gid, name, loop, callback)
+        with self._watch_lock:
+            group = dict(self._watchers.get(gid, _EMPTY))
+            group[name] = group.get(name, ()) + (watch,)
+            self._watchers = {**self._watchers, gid: group}
+        return watch
+
+    def _unwatch(self, watch):
+        with self._watch_lock:
+            group = self._watchers.get(watch.gid)
+            if not group or watch not in group.get(watch.name, ()):
+                return
+            group = dict(group)
+            remaining = tuple(w for w in group[watch.name] if w is not watch)
+            if remaining:
+                group[watch.name] = remaining
+            else:
+                del group[watch.name]
+            watchers = dict(self._watchers)
+            if group:
+                watchers[watch.gid] = group
+            else:
+                del watchers[watch.gid]
+            self._watchers = watchers
+
+    def _move_watchers(self, source, target):
+        with self._watch_lock:
+            moved = self._watchers.get(source)
+            if not moved:
+                return
+            watchers = dict(self._watchers)
+            del watchers[source]
+            group = dict(watchers.get(target, _EMPTY))
+            for name, watches in moved.items():
+                # a write after this changes the version seen here
+                version = self.get_versioned(target, name)[1]
+                for watch in watches:
+                    watch.gid = target
+                    watch.version = version
+                group[name] = group.get(name, ()) + watches
+            watchers[target] = group
+            self._watchers = watchers
+
+    def _notify(self, gid, names, entries):
+        # called with the shard lock held, so callbacks see writes in order;
+        # ``entries`` only needs ``get(name)`` returning an Entry or None
+        group = self._watchers.get(gid)
+        if not group:
+            return
+        for name in names:
+            watches = group.get(name)
+            if not watches:
+                continue
+            entry = entries.get(name)
+            value = None if entry is None else entry.value
+            for watch in watches:
+                watch.notify(value)
+
+    async def wait_for(self, gid, name, predicate=None, timeout=None, default=None):
+        """Wait until ``predicate(value)`` holds for ``name``.
+
+        Without ``predicate`` this waits for the next write of ``name``.
+        ``gid`` may be a callable returning the group id, which is asked
+        again on every check. Returns ``True``, or ``False`` after
+        ``timeout`` seconds.
+        """
+
+        resolve = gid if callable(gid) else (lambda: gid)
+        recheck = WAIT_RECHECK if callable(gid) else WAIT_SAFETY_RECHECK
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        if predicate is None:
+            # group id and version the next write is compared against
+            first = resolve()
+            baseline = (first, self.get_versioned(first, name)[1])
+        resolved = target = None
+        while True:
+            key = resolve()
+            if key != resolved:
+                resolved = target = key
+            current = target
+            changed = asyncio.Event()
+            watch = self.watch(current, name, lambda _value: changed.set(), loop)
+            try:
+                # checked after watching, so a write in between is not missed
+                if predicate is None:
+                    version = self.get_versioned(current, name)[1]
+                    if current != baseline[0]:
+                        # versions of another group say nothing about this
+                        # wait; only its writes from now on count
+                        baseline = (current, version)
+                    elif version != baseline[1]:
+                        return True
+                elif predicate(self.get(current, name, default)):
+                    return True
+                remaining = recheck
+                if deadline is not None:
+                    left = deadline - loop.time()
+                    if left <= 0:
+                        return False
+                    remaining = min(remaining, left)
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                if watch.gid != current:
+                    # a merge moved the watch along with the group; writes
+                    # there after the move count
+                    target = watch.gid
+                    if predicate is None:
+                        baseline = (target, watch.version)
+                watch.cancel()
+
+
+# --------------------------------------------------------------------------- #
+# Barriers
+# --------------------------------------------------------------------------- #
+class BarrierResult(namedtuple("BarrierResult", "passed arrived missing")):
+    """Outcome of :func:`barrier`; true when every party arrived.
+
+    ``arrived`` lists the members seen at the barrier and ``missing`` the
+    expected members that were late, when the expected members are known.
+    """
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return self.passed
+
+
+async def barrier(store, gid, name, member, parties, timeout=None, expected=()):
+    """Wait at barrier ``name`` until ``parties`` members arrived.
+
+    Every member awaits the same name. The barrier is one variable of
+    ``store`` holding ``(generation, arrived, released)``: arriving adds
+    ``member`` with one atomic update, the last arrival starts the next
+    generation so the name can be used again, and the others are woken by
+    that write on their own event loops. ``gid`` may be a callable like in
+    :meth:`GroupStore.wait_for`.
+
+    After ``timeout`` seconds the member leaves the barrier again and the
+    result reports who of ``expected`` is late.
+    """
+
+    resolve = gid if callable(gid) else (lambda: gid)
+    generation = 0
+    released_now = ()
+
+    def arrive(state):
+        # may run more than once on a remote store
+        nonlocal generation, released_now
+        released_now = ()
+        generation, arrived, released = state or (0, (), ())
+        if member not in arrived:
+            arrived = arrived + (member,)
+        if len(arrived) >= parties:
+            released_now = arrived
+            return generation + 1, (), arrived
+        return generation, arrived, released
+
+    store.update(resolve(), name, arrive)
+    if released_now:
+        return BarrierResult(True, released_now, ())
+
+    def released(state):
+        return state is not None and state[0] > generation
+
+    if await store.wait_for(resolve, name, released, timeout):
+        state = store.get(resolve(), name)
+        return BarrierResult(True, state[2] if state else (), ())
+
+    arrived = ()
+
+    def leave(state):
+        nonlocal arrived
+        arrived = ()
+        if not state or state[0] != generation:
+            return state
+        arrived = tuple(m for m in state[1] if m != member)
+        return generation, arrived, state[2]
+
+    state, _version = store.update(resolve(), name, leave)
+    if released(state):
+        # released while we gave up
+        return BarrierResult(True, state[2], ())
+    missing = tuple(m for m in expected if m not in arrived and m != member)
+    return BarrierResult(False, arrived, missing)
+
+
+# --------------------------------------------------------------------------- #
+# Integer variables
+# --------------------------------------------------------------------------- #
+_WRITING = -1
+
+
+class CounterShard:
+    """Integer variables of one group, one array slot per registered name.
+
+    ``values[slot]`` holds the value and ``versions[slot]`` the version of
+    its last write, ``0`` while the name is unset. A write changes the two
+    slots in place, so it allocates nothing once the arrays are as long as
+    the name registry.
+    """
+
+    __slots__ = ("lock", "values", "versions", "generation", "_clock", "_store")
+
+    def __init__(self, lock, clock, store):
+        self.lock = lock
+        self.values = array("q")
+        self.versions = array("q")
+        self.generation = 0
+        self._clock = clock
+        # owner of the {name: slot} registry
+        self._store = store
+
+    def _bump(self):
+        self.generation = next(self._clock)
+        return self.generation
+
+    def entry(self, slot):
+        # lock free; ``versions[slot]`` is _WRITING while a write is half
+        # done and is read again so a value never pairs with another version
+        versions = self.versions
+        while True:
+            if slot >= len(versions):
+                return None
+            version = versions[slot]
+            if version == _WRITING:
+                # let the writer finish instead of spinning on the GIL
+                time.sleep(0)
+                continue
+            if not version:
+                return None
+            value = self.values[slot]
+            if versions[slot] == version:
+                return Entry(value, version)
+
+    def get(self, name):
+        slot = self._store._slots.get(name)
+        return None if slot is None else self.entry(slot)
+
+    def names(self):
+        return [
+            name for name, slot in self._store._slots.items() if self.entry(slot) is not None
+        ]
+
+    def _write(self, slot, value):
+        # caller holds ``lock``
+        if slot >= len(self.values):
+            grow = max(slot + 1 - len(self.values), len(self.values))
+            self.values.extend(bytes(grow))
+            self.versions.extend(bytes(grow))
+        version = self._bump()
+        self.versions[slot] = _WRITING
+        self.values[slot] = value
+        self.versions[slot] = version
+        return version
+
+    def _clear(self, slot):
+        # caller holds ``lock``
+        self.versions[slot] = 0
+        self.values[slot] = 0
+
+
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+
+def _as_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Subgroup variables accept only integers (received {value!r}).")
+    if not _INT64_MIN <= value <= _INT64_MAX:
+        raise ValueError(f"Subgroup variables must fit in 64 bits (received {value!r}).")
+    return value
+
+
+class CounterStore(GroupStore):
+    """:class:`GroupStore` for integer-only variables, backed by arrays.
+
+    Every name gets a slot in a store-wide registry the first time it is
+    written; each group keeps its values in an ``array('q')`` indexed by
+    slot instead of a dict copied on every write. Values must be integers
+    that fit in 64 bits, anything else raises ``ValueError``.
+    """
+
+    def __init__(self, lock_factory=threading.Lock):
+        super().__init__(lock_factory)
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def _slot(self, name):
+        slot = self._slots.get(name)
+        if slot is None:
+            with self._slots_lock:
+                slot = self._slots.get(name)
+                if slot is None:
+                    # replaced, so lock free readers never see it resize
+                    slot = len(self._slots)
+                    self._slots = {**self._slots, name: slot}
+        return slot
+
+    def shard(self, gid, create=True):
+        shard = self._shards.get(gid)
+        if shard is None and create:
+            with self._shards_lock:
+                shard = self._shards.get(gid)
+                if shard is None:
+                    shard = CounterShard(self._lock_factory(), self._clock, self)
+                    self._shards[gid] = shard
+        return shard
+
+    def get(self, gid, name, default=None):
+        # a value written meanwhile is read either before or after the write
+        shard = self._shards.get(gid)
+        slot = self._slots.get(name)
+        if shard is None or slot is None or slot >= len(shard.versions):
+            return default
+        if not shard.versions[slot]:
+            return default
+        return shard.values[slot]
+
+    def get_versioned(self, gid, name, default=None):
+        shard = self._shards.get(gid)
+        entry = shard.get(name) if shard is not None else None
+        return (default, 0) if entry is None else (entry.value, entry.version)
+
+    def snapshot(self, gid):
+        shard = self._shards.get(gid)
+        if shard is None:
+            return {}
+        values = {}
+        for name, slot in self._slots.items():
+            entry = shard.entry(slot)
+            if entry is not None:
+                values[name] = entry.value
+        return values
+
+    def _detach(self, gid, shard):
+        # caller holds shard.lock
+        with self._shards_lock:
+            if self._shards.get(gid) is shard:
+                del self._shards[gid]
+        for slot in range(len(shard.versions)):
+            if shard.versions[slot]:
+                shard._clear(slot)
+
+    def _store(self, gid, name, compute):
+        # ``compute(entry)`` returns the new value, or None to leave ``name``
+        # as it is; returns ``(written, entry after the call)``
+        slot = self._slot(name)
+        shard = self._acquire(gid)
+        try:
+            entry = shard.entry(slot)
+            value = compute(entry)
+            if value is None:
+                return False, entry
+            version = shard._write(slot, value)
+            self._notify(gid, (name,), shard)
+            return True, Entry(value, version)
+        finally:
+            shard.lock.release()
+
+    def set(self, gid, name, value):
+        value = _as_int(value)
+        slot = self._slot(name)
+        shard = self._acquire(gid)
+        try:
+            version = shard._write(slot, value)
+            if gid in self._watchers:
+                self._notify(gid, (name,), shard)
+            return version
+        finally:
+            shard.lock.release()
+
+    def compare_and_set(self, gid, name, expected_version, value):
+        value = _as_int(value)
+
+        def compute(entry):
+            current = 0 if entry is None else entry.version
+            return value if current == expected_version else None
+
+        written, entry = self._store(gid, name, compute)
+        return written, 0 if entry is None else entry.version
+
+    def compare_and_swap(self, gid, name, expected, value, default=None):
+        value = _as_int(value)
+
+        def compute(entry):
+            current = default if entry is None else entry.value
+            return value if current == expected else None
+
+        written, entry = self._store(gid, name, compute)
+        return written, default if entry is None else entry.value
+
+    def update(self, gid, name, func, default=None):
+        _written, entry = self._store(
+            gid, name, lambda entry: _as_int(func(default if entry is None else entry.value))
+        )
+        return entry.value, entry.version
+
+    def add(self, gid, name, delta, default=0):
+        delta = _as_int(delta)
+        slot = self._slot(name)
+        shard = self._acquire(gid)
+        try:
+            # nobody else writes while we hold the lock
+            if slot < len(shard.versions) and shard.versions[slot]:
+                value = shard.values[slot] + delta
+            else:
+                value = _as_int(default) + delta
+            if not _INT64_MIN <= value <= _INT64_MAX:
+                raise ValueError(f"Subgroup variables must fit in 64 bits (received {value!r}).")
+            version = shard._write(slot, value)
+            if gid in self._watchers:
+                self._notify(gid, (name,), shard)
+            return value, version
+        finally:
+            shard.lock.release()
+
+    def delete(self, gid, name):
+        slot = self._slots.get(name)
+        shard = self._shards.get(gid)
+        if slot is None or shard is None:
+            return
+        with shard.lock:
+            if self._shards.get(gid) is not shard or shard.entry(slot) is None:
+                return
+            shard._clear(slot)
+            shard._bump()
+            if not shard.names():
+                self._detach(gid, shard)
+            self._notify(gid, (name,), _EMPTY)
+
+    def drop(self, gid):
+        shard = self._shards.get(gid)
+        if shard is not None:
+            with shard.lock:
+                names = shard.names()
+                self._detach(gid, shard)
+                self._notify(gid, names, _EMPTY)
+
+    def clear(self):
+        for gid in self.groups():
+            self.drop(gid)
+
+    def merge(self, source, target):
+        if source == target:
+            return
+        moved = self._shards.get(source)
+        if moved is None:
+            self._move_watchers(source, target)
+            return
+        with moved.lock:
+            values = self.snapshot(source)
+            self._detach(source, moved)
+        if not values:
+            self._move_watchers(source, target)
+            return
+        shard = self._acquire(target)
+        try:
+            for name, value in values.items():
+                shard._write(self._slot(name), value)
+            self._move_watchers(source, target)
+            self._notify(target, tuple(values), shard)
+        finally:
+            shard.lock.release()
@@ -0,0 +1,527 @@
+"""Group variables shared between ScriptCreator processes.
+
+By default every process keeps its group and subgroup variables in its own
+:class:`group_state.GroupStore`, so a group can only span the players of one
+process. To run the members of a group from several processes (each with its
+own GIL, pinned to its own core), start a server once::
+
+    python groupserver.py
+
+and set ``SCRIPTCREATOR_GROUP_SERVER`` in the environment of every
+ScriptCreator or headless process, either to ``1`` for the default address or
+to an address (a socket path, a named pipe or a loopback ``host:port``;
+other hosts are refused).
+:func:`open_stores` then returns :class:`RemoteGroupStore` objects connected to
+the server instead of local stores, with the same methods, versions and
+notifications. ``Player`` opens them on first use (:class:`SharedStore`) and
+falls back to local stores when the server cannot be reached.
+
+Messages are pickled tuples framed by ``multiprocessing.connection`` (a
+length prefix per message) over a Unix socket or a Windows named pipe.
+Connections are authenticated before anything is unpickled, with
+``SCRIPTCREATOR_GROUP_KEY`` when it is set. Otherwise the server generates a
+random key and writes it to a file only the current user can read
+(:func:`key_path`), where the clients of the same user find it.
+
+Only plain values can be stored remotely. Objects holding locks or futures,
+like the make-party state and the formation moves, stay in their process.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import ipaddress
+import itertools
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+from group_state import WAIT_RECHECK, WAIT_SAFETY_RECHECK, CounterStore, GroupStore, Watch
+
+SERVER_ENV = "SCRIPTCREATOR_GROUP_SERVER"
+KEY_ENV = "SCRIPTCREATOR_GROUP_KEY"
+NAMESPACES = ("group", "subgroup")
+# seconds to wait for an answer before the server is considered gone
+CALL_TIMEOUT = 10.0
+
+# operations a client may run on a server store, all plain GroupStore methods
+_OPERATIONS = frozenset(
+    {
+        "get",
+        "get_versioned",
+        "snapshot",
+        "groups",
+        "set",
+        "compare_and_set",
+        "compare_and_swap",
+        "add",
+        "delete",
+        "drop",
+        "merge",
+        "clear",
+    }
+)
+
+
+def default_address():
+    if sys.platform == "win32":
+        return r"\\.\pipe\ScriptCreatorGroups"
+    return os.path.join(tempfile.gettempdir(), "scriptcreator-groups.sock")
+
+
+def check_address(address):
+    """Return ``address``; raise ``ValueError`` for a TCP address off this machine.
+
+    The server unpickles what its clients send, so it must never listen on a
+    network interface.
+    """
+
+    if isinstance(address, tuple):
+        host = address[0].strip("[]")
+        try:
+            loopback = host == "localhost" or ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"group state server must use a loopback address, not {host!r}")
+    return address
+
+
+def parse_address(text):
+    """Turn ``host:port`` into a TCP address; anything else is a path."""
+
+    if not text or text.strip().lower() in ("1", "true", "yes", "on", "default"):
+        return default_address()
+    text = text.strip()
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and host and "\\" not in host and "/" not in host:
+        return check_address((host, int(port)))
+    return text
+
+
+def key_path(address):
+    """Return the file holding the generated key of the server at ``address``."""
+
+    digest = hashlib.sha1(repr(address).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"scriptcreator-groups-{digest}.key")
+
+
+def _env_key():
+    key = os.environ.get(KEY_ENV)
+    return key.encode("utf-8") if key else None
+
+
+def _write_key(path, key):
+    # readable by the current user only
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(key)
+
+
+def _client_key(address):
+    key = _env_key()
+    if key:
+        return key
+    try:
+        with open(key_path(address), "rb") as handle:
+            return handle.read()
+    except OSError:
+        raise ConnectionError(
+            f"no key for the group state server at {address!r}; set {KEY_ENV}"
+        ) from None
+
+
+class GroupStateServer:
+    """Serve one :class:`GroupStore` per namespace to local processes."""
+
+    def __init__(self, address=None, authkey=None):
+        self.stores = {"group": GroupStore(), "subgroup": CounterStore()}
+        address = check_address(address or default_address())
+        if isinstance(address, str) and not address.startswith("\\\\") and os.path.exists(address):
+            # a socket file left behind by a server that did not shut down
+            os.unlink(address)
+        self.key_file = None
+        generated = authkey is None and _env_key() is None
+        if authkey is None:
+            authkey = _env_key() or os.urandom(32)
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        if generated:
+            self.key_file = key_path(self.address)
+            _write_key(self.key_file, authkey)
+        # watch callbacks run here and send the events to their clients
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Accept clients on a background thread; returns the thread."""
+
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            except Exception:
+                # failed authentication or a client that went away early
+                continue
+            with self._lock:
+                self._connections.add(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        send_lock = threading.Lock()
+        watches = {}
+
+        def send(message):
+            with send_lock:
+                conn.send(message)
+
+        def forward(wid, value):
+            try:
+                send((0, "event", wid, value))
+            except (OSError, ValueError):
+                pass
+
+        try:
+            while True:
+                try:
+                    rid, namespace, op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    store = self.stores[namespace]
+                    if op == "watch":
+                        wid, gid, name = args
+                        watches[wid] = store.watch(
+                            gid, name, lambda value, wid=wid: forward(wid, value), self._loop
+                        )
+                        result = None
+                    elif op == "unwatch":
+                        watch = watches.pop(args[0], None)
+                        if watch is not None:
+                            watch.cancel()
+                        result = None
+                    elif op in _OPERATIONS:
+                        result = getattr(store, op)(*args)
+                    else:
+                        raise ValueError(f"unknown operation {op!r}")
+                except Exception as error:
+                    send((rid, False, error))
+                else:
+                    send((rid, True, result))
+        finally:
+            for watch in watches.values():
+                watch.cancel()
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        if self.key_file is not None:
+            try:
+                os.unlink(self.key_file)
+            except OSError:
+                pass
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class GroupStateClient:
+    """One connection to a :class:`GroupStateServer`, shared by its stores."""
+
+    def __init__(self, address=None, authkey=None):
+        address = check_address(address or default_address())
+        self._conn = Client(address, authkey=authkey or _client_key(address))
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._watches = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def call(self, namespace, op, *args):
+        rid = next(self._ids)
+        future = Future()
+        self._pending[rid] = future
+        try:
+            with self._send_lock:
+                if self._closed:
+                    raise ConnectionError("group state server connection is closed")
+                self._conn.send((rid, namespace, op, args))
+            ok, result = future.result(CALL_TIMEOUT)
+        finally:
+            self._pending.pop(rid, None)
+        if not ok:
+            raise result
+        return result
+
+    def _read(self):
+        try:
+            while True:
+                rid, *message = self._conn.recv()
+                if rid == 0:
+                    _event, wid, value = message
+                    watch = self._watches.get(wid)
+                    if watch is not None:
+                        watch.notify(value)
+                    continue
+                future = self._pending.get(rid)
+                if future is not None:
+                    future.set_result(message)
+        except (EOFError, OSError):
+            pass
+        finally:
+            self._closed = True
+            for future in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(ConnectionError("group state server went away"))
+
+    def watch(self, store, namespace, gid, name, callback, loop):
+        wid = next(self._ids)
+        watch = Watch(store, gid, name, loop, callback)
+        self._watches[wid] = watch
+        self.call(namespace, "watch", wid, gid, name)
+        return watch, wid
+
+    def unwatch(self, namespace, wid):
+        # not waited for: a watch may be cancelled from the reader thread
+        if self._watches.pop(wid, None) is None:
+            return
+        with self._send_lock:
+            if not self._closed:
+                self._conn.send((next(self._ids), namespace, "unwatch", (wid,)))
+
+    def close(self):
+        with self._send_lock:
+            self._closed = True
+            self._conn.close()
+
+
+class RemoteGroupStore:
+    """:class:`GroupStore` methods on one namespace of a server.
+
+    :meth:`update` reads, applies ``func`` and stores the result with
+    :meth:`compare_and_set`, retrying when another process wrote in between,
+    so ``func`` may run more than once.
+    """
+
+    def __init__(self, client, namespace):
+        self._client = client
+        self._namespace = namespace
+        self._watch_ids = {}
+
+    def _call(self, op, *args):
+        return self._client.call(self._namespace, op, *args)
+
+    def get(self, gid, name, default=None):
+        return self._call("get", gid, name, default)
+
+    def get_versioned(self, gid, name, default=None):
+        return self._call("get_versioned", gid, name, default)
+
+    def snapshot(self, gid):
+        return self._call("snapshot", gid)
+
+    def groups(self):
+        return self._call("groups")
+
+    def set(self, gid, name, value):
+        return self._call("set", gid, name, value)
+
+    def compare_and_set(self, gid, name, expected_version, value):
+        return self._call("compare_and_set", gid, name, expected_version, value)
+
+    def update(self, gid, name, func, default=None):
+        while True:
+            old, version = self.get_versioned(gid, name, default)
+            value = func(old)
+            stored, version = self.compare_and_set(gid, name, version, value)
+            if stored:
+                return value, version
+
+    def add(self, gid, name, delta, default=0):
+        return self._call("add", gid, name, delta, default)
+
+    def compare_and_swap(self, gid, name, expected, value, default=None):
+        return self._call("compare_and_swap", gid, name, expected, value, default)
+
+    def delete(self, gid, name):
+        self._call("delete", gid, name)
+
+    def drop(self, gid):
+        self._call("drop", gid)
+
+    def merge(self, source, target):
+        self._call("merge", source, target)
+
+    def clear(self):
+        self._call("clear")
+
+    def watch(self, gid, name, callback, loop=None):
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        watch, wid = self._client.watch(self, self._namespace, gid, name, callback, loop)
+        self._watch_ids[watch] = wid
+        return watch
+
+    def _unwatch(self, watch):
+        wid = self._watch_ids.pop(watch, None)
+        if wid is not None:
+            self._client.unwatch(self._namespace, wid)
+
+    async def wait_for(self, gid, name, predicate=None, timeout=None, default=None):
+        """:meth:`GroupStore.wait_for` with the server calls on executor threads.
+
+        Every call waits for the answer of the server, which must not hold up
+        the event loop of the player meanwhile.
+        """
+
+        resolve = gid if callable(gid) else (lambda: gid)
+        recheck = WAIT_RECHECK if callable(gid) else WAIT_SAFETY_RECHECK
+        loop = asyncio.get_running_loop()
+
+        def call(func, *args):
+            return loop.run_in_executor(None, func, *args)
+
+        deadline = None if timeout is None else loop.time() + timeout
+        if predicate is None:
+            first = resolve()
+            baseline = (first, (await call(self.get_versioned, first, name))[1])
+        while True:
+            current = resolve()
+            changed = asyncio.Event()
+            watch = await call(self.watch, current, name, lambda _value: changed.set(), loop)
+            try:
+                # checked after watching, so a write in between is not missed
+                if predicate is None:
+                    version = (await call(self.get_versioned, current, name))[1]
+                    if current != baseline[0]:
+                        baseline = (current, version)
+                    elif version != baseline[1]:
+                        return True
+                elif predicate(await call(self.get, current, name, default)):
+                    return True
+                remaining = recheck
+                if deadline is not None:
+                    left = deadline - loop.time()
+                    if left <= 0:
+                        return False
+                    remaining = min(remaining, left)
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                watch.cancel()
+
+
+def connect(address=None, authkey=None):
+    """Return ``{namespace: RemoteGroupStore}`` on one new connection."""
+
+    client = GroupStateClient(address, authkey)
+    return {name: RemoteGroupStore(client, name) for name in NAMESPACES}
+
+
+def open_stores():
+    """Return the group and subgroup stores this process should use.
+
+    Local stores, unless ``SCRIPTCREATOR_GROUP_SERVER`` names a server.
+    """
+
+    address = os.environ.get(SERVER_ENV)
+    if address is None:
+        return GroupStore(), CounterStore()
+    stores = connect(parse_address(address))
+    return stores["group"], stores["subgroup"]
+
+
+_process_stores = None
+_process_stores_lock = threading.Lock()
+
+
+def process_stores():
+    """Return ``{namespace: store}`` of this process, opened on the first call.
+
+    When ``SCRIPTCREATOR_GROUP_SERVER`` is set but the server cannot be
+    reached, the process warns and keeps its group variables to itself.
+    """
+
+    global _process_stores
+    with _process_stores_lock:
+        if _process_stores is None:
+            try:
+                group, subgroup = open_stores()
+            except Exception as error:
+                print(
+                    f"[groupserver] cannot use the group state server ({error}); "
+                    "group variables are not shared with other processes"
+                )
+                group, subgroup = GroupStore(), CounterStore()
+            _process_stores = {"group": group, "subgroup": subgroup}
+        return _process_stores
+
+
+class SharedStore:
+    """Class attribute holding the store ``namespace`` of :func:`process_stores`.
+
+    The stores are opened when the attribute is first read rather than when
+    the class is created, so importing never connects to the server. The
+    attribute is then replaced by the store itself.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.owner = None
+        self.attribute = None
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.attribute = name
+
+    def __get__(self, obj, objtype=None):
+        store = process_stores()[self.namespace]
+        setattr(self.owner, self.attribute, store)
+        return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group state server for ScriptCreator processes")
+    parser.add_argument("--address", help="socket path, named pipe or host:port")
+    args = parser.parse_args()
+    server = GroupStateServer(parse_address(args.address))
+    print(f"group state server listening on {server.address}")
+    if server.key_file is not None:
+        print(f"generated key written to {server.key_file}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Hierarchical path-finding (HPA*) for long walks across a map.
+
+The map is split into square clusters. Entrances are placed on the borders
+shared by neighbouring clusters and connected through an abstract graph.
+Distances between the entrances of a cluster are computed the first time the
+search reaches that cluster and cached on the graph, so every map pays the
+preprocessing cost only for the areas it actually uses. A query searches the
+abstract graph and then refines each intra-cluster hop into real cells.
+"""
+
+import heapq
+import threading
+from collections import OrderedDict
+
+from gridsearch import INF, astar, dijkstra, grid_size, is_walkable, octile
+
+CLUSTER_SIZE = 16
+# entrances wider than this get one node at each end instead of the middle
+MAX_SINGLE_ENTRANCE = 6
+REFINED_CACHE_SIZE = 4096
+
+
+class AbstractGraph:
+    """Cluster abstraction of a single ``map_array`` grid."""
+
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid
+        self.cluster_size = int(cluster_size)
+        self.width, self.height = grid_size(grid)
+        self.entrances = {}
+        self.inter_edges = {}
+        self._intra_edges = {}
+        self._refined = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_entrances()
+
+    # ------------------------------------------------------------------ #
+    # Construction
+    # ------------------------------------------------------------------ #
+    def cluster_of(self, x, y):
+        return x // self.cluster_size, y // self.cluster_size
+
+    def cluster_bounds(self, cluster):
+        cx, cy = cluster
+        size = self.cluster_size
+        return (
+            cx * size,
+            cy * size,
+            min(self.width, (cx + 1) * size),
+            min(self.height, (cy + 1) * size),
+        )
+
+    def _add_transition(self, a, b):
+        for node in (a, b):
+            self.entrances.setdefault(self.cluster_of(*node), set()).add(node)
+        self.inter_edges.setdefault(a, []).append((b, 1.0))
+        self.inter_edges.setdefault(b, []).append((a, 1.0))
+
+    def _add_entrance_run(self, run):
+        if len(run) < MAX_SINGLE_ENTRANCE:
+            self._add_transition(*run[len(run) // 2])
+        else:
+            self._add_transition(*run[0])
+            self._add_transition(*run[-1])
+
+    def _scan_border(self, pairs):
+        run = []
+        for a, b in pairs:
+            if self.grid[a[1]][a[0]] and self.grid[b[1]][b[0]]:
+                run.append((a, b))
+            elif run:
+                self._add_entrance_run(run)
+                run = []
+        if run:
+            self._add_entrance_run(run)
+
+    def _build_entrances(self):
+        size = self.cluster_size
+        for bx in range(size, self.width, size):
+            for y0 in range(0, self.height, size):
+                y1 = min(self.height, y0 + size)
+                self._scan_border(((bx - 1, y), (bx, y)) for y in range(y0, y1))
+        for by in range(size, self.height, size):
+            for x0 in range(0, self.width, size):
+                x1 = min(self.width, x0 + size)
+                self._scan_border(((x, by - 1), (x, by)) for x in range(x0, x1))
+
+    def intra_edges(self, cluster):
+        """Return ``{entrance: [(entrance, cost), ...]}`` for ``cluster``."""
+
+        edges = self._intra_edges.get(cluster)
+        if edges is not None:
+            return edges
+        with self._lock:
+            edges = self._intra_edges.get(cluster)
+            if edges is None:
+                bounds = self.cluster_bounds(cluster)
+                nodes = self.entrances.get(cluster, set())
+                edges = {}
+                for node in nodes:
+                    others = nodes - {node}
+                    costs = dijkstra(self.grid, node, bounds, targets=others)
+                    edges[node] = list(costs.items())
+                self._intra_edges[cluster] = edges
+        return edges
+
+    def precompute(self):
+        """Compute the intra-cluster edges of every cluster up front."""
+
+        for cluster in list(self.entrances):
+            self.intra_edges(cluster)
+
+    # ------------------------------------------------------------------ #
+    # Queries
+    # ------------------------------------------------------------------ #
+    def _refine(self, a, b):
+        key = (a, b)
+        with self._lock:
+            cached = self._refined.get(key)
+            if cached is not None:
+                self._refined.move_to_end(key)
+                return cached
+        segment = tuple(
+            astar(self.grid, a, b, self.cluster_bounds(self.cluster_of(*a)))
+        )
+        with self._lock:
+            self._refined[key] = segment
+            if len(self._refined) > REFINED_CACHE_SIZE:
+                self._refined.popitem(last=False)
+        return segment
+
+    def find_path(self, start, goal):
+        """Return a list of ``(x, y)`` cells from ``start`` to ``goal``.
+
+        An empty list is returned when the abstract graph does not connect
+        both points; callers should then fall back to a flat search because
+        diagonal-only border crossings are not represented as entrances.
+        """
+
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        if not is_walkable(self.grid, *start) or not is_walkable(self.grid, *goal):
+            return []
+        if start == goal:
+            return [start]
+
+        start_cluster = self.cluster_of(*start)
+        goal_cluster = self.cluster_of(*goal)
+        start_targets = set(self.entrances.get(start_cluster, ()))
+        if start_cluster == goal_cluster:
+            start_targets.add(goal)
+        start_edges = dijkstra(
+            self.grid, start, self.cluster_bounds(start_cluster), targets=start_targets
+        )
+        goal_edges = dijkstra(
+            self.grid,
+            goal,
+            self.cluster_bounds(goal_cluster),
+            targets=self.entrances.get(goal_cluster, set()),
+        )
+
+        def neighbours(node):
+            if node == start:
+                yield from start_edges.items()
+            else:
+                yield from self.intra_edges(self.cluster_of(*node)).get(node, ())
+            yield from self.inter_edges.get(node, ())
+            cost = goal_edges.get(node)
+            if cost is not None:
+                yield goal, cost
+
+        best = {start: 0.0}
+        parent = {start: None}
+        closed = set()
+        open_heap = [(octile(*start, *goal), 0.0, start)]
+        abstract = None
+        while open_heap:
+            _f, cost, node = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            if node == goal:
+                abstract = []
+                while node is not None:
+                    abstract.append(node)
+                    node = parent[node]
+                abstract.reverse()
+                break
+            closed.add(node)
+            for other, step in neighbours(node):
+                new_cost = cost + step
+                if new_cost < best.get(other, INF):
+                    best[other] = new_cost
+                    parent[other] = node
+                    heapq.heappush(
+                        open_heap, (new_cost + octile(*other, *goal), new_cost, other)
+                    )
+
+        if not abstract:
+            return []
+
+        path = [abstract[0]]
+        for a, b in zip(abstract, abstract[1:]):
+            if max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1:
+                path.append(b)
+                continue
+            segment = self._refine(a, b)
+            if not segment:
+                return []
+            path.extend(segment[1:])
+        return path
@@ -3,9 +3,11 @@ import os
 import re
 import builtins
 import ctypes
+import multiprocessing
 import win32gui
 import win32con
 import threading
+import time
 import warnings
 from collections import defaultdict
 from typing import Dict, NamedTuple, Optional, Set
@@ -54,6 +56,9 @@ from PyQt5.Qsci import QsciScintilla
 from license_manager import prompt_for_license
 
 from player import Player, PeriodicCondition
+from roster import PartyRoster
+from snapshots import SNAPSHOT_FILE, SnapshotWriter, restore as restore_snapshot
+from workers import shutdown_pools
 from getports import returnAllPorts, returnCorrectPID
 from funcs import randomize_time
 try:
@@ -195,6 +200,27 @@ def _compute_subgroup_metadata(members, assignments=None):
     )
 
 
+def _share_party_roster(leader_obj, participants, **fields):
+    """Give every participant the same ``PartyRoster`` holding ``fields``.
+
+    The leader's roster is kept while the group is unchanged, so a refresh
+    that changes nothing does not bump its version. Players that left keep
+    the old roster.
+    """
+
+    roster = getattr(leader_obj, "party_roster", None)
+    if (
+        roster is None
+        or roster.names != fields.get("names")
+        or any(getattr(p, "party_roster", None) is not roster for p in participants)
+    ):
+        roster = PartyRoster()
+    roster.assign(**fields)
+    for participant in participants:
+        participant.party_roster = roster
+    return roster
+
+
 class PlayerTabContext(NamedTuple):
     player: Player
     index: int
@@ -1236,16 +1262,16 @@ class GroupScriptDialog(QDialog):
         member_pids = [_resolve_player_pid(m) for m in member_party_objs]
         party_pids = [leader_pid] + member_pids
 
-        shared_subgroups = dict(subgroup_map)
-        shared_order = dict(subgroup_order)
-        shared_members = {key: list(value) for key, value in subgroup_members.items()}
-        for participant in [leader_obj] + member_party_objs:
-            participant.partyname = party_names
-            participant.partyID = party_ids
-            participant.partyPID = list(party_pids)
-            participant.party_subgroups = dict(shared_subgroups)
-            participant.party_subgroup_order = dict(shared_order)
-            participant.party_subgroup_members = dict(shared_members)
+        _share_party_roster(
+            leader_obj,
+            [leader_obj] + member_party_objs,
+            names=party_names,
+            ids=party_ids,
+            pids=party_pids,
+            subgroups=subgroup_map,
+            subgroup_order=subgroup_order,
+            subgroup_members=subgroup_members,
+        )
         leader_obj.leaderID = leader_id
         for m in member_party_objs:
             m.leaderID = leader_id
@@ -1773,6 +1799,16 @@ class MyWindow(QMainWindow):
         self.name_sync_timer.timeout.connect(self.sync_player_names)
         self.name_sync_timer.start()
 
+        # Snapshots of the group runtime state every few seconds, so groups
+        # can continue after a crash or relog (see snapshots.py).
+        self.group_snapshots = SnapshotWriter(
+            SNAPSHOT_FILE,
+            lambda: [player_obj for player_obj, _ in list(self.players)],
+            (Player._group_store, Player._subgroup_store, Player._runtime_store),
+        )
+        Player._snapshots = self.group_snapshots
+        self.group_snapshots.start()
+
         # Create system tray icon and menu
         self.tray_icon = QSystemTrayIcon(QIcon('src/icon.png'), self)
         self.tray_icon.setToolTip("Script Creator")
@@ -1842,6 +1878,10 @@ class MyWindow(QMainWindow):
         clearConsoleAction.triggered.connect(self.clear_console)
         consoleMenu.addAction(clearConsoleAction)
 
+        workerStatsAction = QAction("Print Worker Stats", self)
+        workerStatsAction.triggered.connect(self.print_worker_stats)
+        consoleMenu.addAction(workerStatsAction)
+
         serverMenu = menubar.addMenu('Server Config')
         serverAction = QAction('Select Server', self)
         serverAction.triggered.connect(self.open_server_config)
@@ -2266,6 +2306,19 @@ class MyWindow(QMainWindow):
     def clear_console(self):
         os.system('cls')
 
+    def print_worker_stats(self):
+        """Print the live threads and tasks of every player to the console."""
+
+        total = 0
+        for player_obj, _ in list(self.players):
+            stats = player_obj.worker_stats()
+            total += stats["threads"]
+            print(
+                f"{player_obj.name}: {stats['threads']} threads, {stats['tasks']} loop tasks, "
+                f"{stats['futures']} pooled jobs, {stats['started']} threads started"
+            )
+        print(f"players: {total} threads, process: {threading.active_count()} threads")
+
     def setDarkTheme(self):
         setDarkTheme()
         self.settings.setValue("colorTheme", 0)
@@ -2281,6 +2334,13 @@ class MyWindow(QMainWindow):
 
     def exit_application(self, event):
         self.settings.setValue("windowScreenGeometry", self.saveGeometry())
+        self.group_snapshots.stop()
+        for player_obj, _ in list(self.players):
+            try:
+                player_obj.shutdown(timeout=0.5)
+            except Exception:
+                pass
+        shutdown_pools()
         QApplication.quit()
 
     def minimizeToTray(self):
@@ -2402,10 +2462,42 @@ class MyWindow(QMainWindow):
             info = dlg.get_loaded_group()
             if info:
                 self._assign_group_console(info)
+                self._resume_group_snapshot(info)
             self.group_script_group_counter += 1
             # start all scripts for this group asynchronously
             self.start_group_scripts()
 
+    def _resume_group_snapshot(self, group_info):
+        """Offer to continue a group from its last snapshot."""
+
+        leader_name = group_info.get("leader_name")
+        saved = self.group_snapshots.saved_group(leader_name) if leader_name else None
+        if not saved:
+            return
+
+        names = {leader_name, *group_info.get("member_names", [])}
+        group_players = [player_obj for player_obj, _ in self.players if player_obj.name in names]
+        saved_at = time.strftime("%H:%M:%S", time.localtime(saved.get("saved", 0)))
+        answer = QMessageBox.question(
+            self,
+            "Resume Group",
+            f"The group of {leader_name} was last saved at {saved_at}.\n"
+            "Continue where it stopped instead of starting over?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes,
+        )
+        if answer != QMessageBox.Yes:
+            self.group_snapshots.discard(leader_name)
+            return
+        restored = restore_snapshot(
+            saved,
+            group_players,
+            Player._group_store,
+            Player._subgroup_store,
+            Player._runtime_store,
+        )
+        print(f"[snapshots] resumed {', '.join(restored) or 'no players'} of {leader_name}'s group")
+
     def set_condition_logging_enabled(self, enabled: bool) -> None:
         enabled_bool = bool(enabled)
         self._condition_logging_enabled = enabled_bool
@@ -2887,8 +2979,7 @@ class MyWindow(QMainWindow):
                 player_obj.reset_attrs()
             except Exception:
                 pass
-            player_obj.partyname = []
-            player_obj.partyID = []
+            player_obj.party_roster = PartyRoster()
             if hasattr(player_obj, "subgroup_index"):
                 player_obj.subgroup_index = None
             if hasattr(player_obj, "subgroup_member_limit"):
@@ -3277,16 +3368,17 @@ class MyWindow(QMainWindow):
                 member_objs
             )
 
-            shared_subgroups = dict(subgroup_map)
-            shared_order = dict(subgroup_order)
-            shared_members = {key: list(value) for key, value in subgroup_members.items()}
-            for participant in [leader_obj] + member_objs:
-                participant.partyname = party_names
-                participant.partyID = party_ids
-                participant.partyPID = list(party_pids)
-                participant.party_subgroups = dict(shared_subgroups)
-                participant.party_subgroup_order = dict(shared_order)
-                participant.party_subgroup_members = dict(shared_members)
+            # bumps the group's roster version only when something changed
+            _share_party_roster(
+                leader_obj,
+                [leader_obj] + member_objs,
+                names=party_names,
+                ids=party_ids,
+                pids=party_pids,
+                subgroups=subgroup_map,
+                subgroup_order=subgroup_order,
+                subgroup_members=subgroup_members,
+            )
 
             leader_obj.attr51 = [m.name for m in member_objs]
             leader_obj.leaderID = leader_obj.id
@@ -3629,6 +3721,8 @@ def setDarkTheme():
     app.setStyleSheet("QToolTip { color: #ffffff; background-color: #2a82da; border: 1px solid white; }")
 
 if __name__ == "__main__":
+    # the path service workers start this executable again when frozen
+    multiprocessing.freeze_support()
     try:
         app_object = QApplication(sys.argv)
         lock_file = QLockFile("src/Script Creator.lock")
@@ -0,0 +1,78 @@
+"""Background map loading for the packet thread.
+
+Decoding a map takes long enough to hold up the packets that follow a
+``c_map``. ``MapLoader`` runs the loads on a small thread pool and hands out
+``concurrent.futures.Future`` objects; several players asking for the same
+map share one load. Map changes are recorded so the maps players usually
+walk into next can be prefetched while they are still on the current one.
+"""
+
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class MapLoader:
+    """Load maps on worker threads and remember observed map changes.
+
+    ``load`` is called with a map id and returns the grid. ``cached`` is an
+    optional lookup returning an already decoded grid or ``None``, so maps in
+    memory resolve without a round trip through the pool.
+    """
+
+    def __init__(self, load, cached=None, max_workers=2, prefetch_count=2):
+        self._load = load
+        self._cached = cached
+        self.prefetch_count = prefetch_count
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = {}
+        self._transitions = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def get(self, map_id):
+        """Return a future resolving to the grid of ``map_id``."""
+
+        if self._cached is not None:
+            grid = self._cached(map_id)
+            if grid:
+                future = Future()
+                future.set_result(grid)
+                return future
+        with self._lock:
+            future = self._pending.get(map_id)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._load, map_id)
+            self._pending[map_id] = future
+        # registered outside the lock, the callback runs inline if the load
+        # already finished
+        future.add_done_callback(lambda _f, mid=map_id: self._finished(mid))
+        return future
+
+    def _finished(self, map_id):
+        with self._lock:
+            self._pending.pop(map_id, None)
+
+    def record_transition(self, source, target):
+        """Remember that a player walked from map ``source`` into ``target``."""
+
+        if source is None or source == target:
+            return
+        with self._lock:
+            self._transitions[source][target] += 1
+
+    def predict(self, map_id, count=None):
+        """Return the maps most often entered from ``map_id``."""
+
+        count = self.prefetch_count if count is None else count
+        with self._lock:
+            seen = self._transitions.get(map_id)
+            if not seen:
+                return []
+            return [mid for mid, _n in seen.most_common(count)]
+
+    def prefetch(self, map_id):
+        """Start loading the maps predicted to follow ``map_id``."""
+
+        for next_map in self.predict(map_id):
+            self.get(next_map)
@@ -0,0 +1,271 @@
+"""Make-party coordination state shared by the members of a group.
+
+``Player.make_party`` runs the same handshake on every member of a subgroup:
+everyone registers as ready, the subgroup leader invites the others one at a
+time and each member accepts once the stage before its turn is reached. The
+progress used to be a plain dict in a group variable that every waiting member
+copied, normalized and checked again every 0.2-0.25 seconds.
+
+:class:`MakePartyState` keeps the progress of every subgroup of one group
+behind one ``threading.Condition``. Every change (a member becoming ready, a
+stage being reached, a confirmation arriving) notifies the waiters, which
+check their subgroup right away instead of on the next poll.
+"""
+
+import threading
+import time
+
+# waiters wake up at least this often (seconds) to notice a stopped script
+WAIT_RECHECK = 0.5
+
+
+def _key(value):
+    return str(value).strip().lower()
+
+
+class SubgroupParty:
+    """Make-party progress of one subgroup."""
+
+    __slots__ = (
+        "ready",
+        "confirmations",
+        "expected",
+        "members",
+        "member_names",
+        "leader_id",
+        "leader_name",
+        "stage",
+        "started",
+        "completed",
+        "last_update",
+    )
+
+    def __init__(self):
+        self.reset()
+        self.leader_id = None
+        self.leader_name = ""
+        self.last_update = 0.0
+
+    def reset(self):
+        self.ready = set()
+        self.confirmations = set()
+        self.expected = 0
+        self.members = []
+        self.member_names = []
+        self.stage = 0
+        self.started = False
+        self.completed = False
+
+    def confirmed_total(self, expected=None):
+        """Return the party size confirmed so far, the leader included."""
+
+        if expected is None:
+            expected = self.expected
+        total = 1 + len(self.confirmations)
+        if expected > 0:
+            total = min(expected, total)
+        return max(1, total)
+
+    def as_dict(self):
+        """Return a copy of the progress in the layout of the old group var."""
+
+        return {
+            "ready": set(self.ready),
+            "confirmations": set(self.confirmations),
+            "expected": self.expected,
+            "members": list(self.members),
+            "member_names": list(self.member_names),
+            "leader_id": self.leader_id,
+            "leader_name": self.leader_name,
+            "stage": self.stage,
+            "started": self.started,
+            "completed": self.completed,
+            "last_update": self.last_update,
+        }
+
+
+class MakePartyState:
+    """Make-party progress of every subgroup of one group.
+
+    All methods are thread safe. Members run ``make_party`` from their
+    condition threads and confirmations arrive on packet threads, so waiting
+    is done with :meth:`wait`, which blocks the calling thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._subgroups = {}
+        # number of changes so far
+        self.changes = 0
+
+    def _subgroup(self, index):
+        sub = self._subgroups.get(index)
+        if sub is None:
+            sub = self._subgroups[index] = SubgroupParty()
+        return sub
+
+    def _changed(self, sub):
+        # caller holds ``_cond``
+        sub.last_update = time.time()
+        self.changes += 1
+        self._cond.notify_all()
+
+    def get(self, index):
+        """Return a copy of the progress of subgroup ``index`` as a dict."""
+
+        with self._cond:
+            sub = self._subgroups.get(index)
+            return (sub or SubgroupParty()).as_dict()
+
+    def subgroups(self):
+        with self._cond:
+            return sorted(self._subgroups)
+
+    def load(self, states):
+        """Replace the progress with ``{index: dict}`` as returned by :meth:`get`."""
+
+        with self._cond:
+            self._subgroups = {}
+            for index, state in states.items():
+                sub = self._subgroup(index)
+                for name in SubgroupParty.__slots__:
+                    if name in state:
+                        setattr(sub, name, state[name])
+                sub.ready = set(sub.ready)
+                sub.confirmations = set(sub.confirmations)
+                sub.members = list(sub.members)
+                sub.member_names = list(sub.member_names)
+            self.changes += 1
+            self._cond.notify_all()
+
+    def register_ready(self, index, member_id, expected, member_ids, member_names=None):
+        """Mark ``member_id`` ready to form the party of subgroup ``index``.
+
+        A subgroup whose previous party completed starts over. The party
+        starts once ``expected`` members are ready. Returns ``(added,
+        ready_count, expected, started, started_now)``.
+        """
+
+        with self._cond:
+            sub = self._subgroup(index)
+            if sub.completed:
+                sub.reset()
+
+            sub.expected = int(expected)
+            sub.members = list(member_ids)
+            if isinstance(member_names, (list, tuple)):
+                sub.member_names = [
+                    name.strip() if isinstance(name, str) else "" for name in member_names
+                ]
+            if member_ids:
+                try:
+                    sub.leader_id = int(member_ids[0])
+                except (TypeError, ValueError):
+                    sub.leader_id = None
+            if isinstance(member_names, (list, tuple)) and member_names:
+                leader_name = member_names[0]
+                sub.leader_name = _key(leader_name) if isinstance(leader_name, str) else ""
+            elif not member_ids:
+                sub.leader_name = ""
+            if not sub.started:
+                sub.confirmations.clear()
+
+            added = member_id not in sub.ready
+            sub.ready.add(member_id)
+            started_now = self._start(sub, sub.expected)
+            self._changed(sub)
+            return added, len(sub.ready), sub.expected, sub.started, started_now
+
+    def _start(self, sub, expected):
+        # caller holds ``_cond``
+        if len(sub.ready) >= expected and not sub.started:
+            sub.started = True
+            sub.stage = 0
+            sub.completed = False
+            sub.confirmations.clear()
+            return True
+        return False
+
+    def confirm(self, index, key):
+        """Record that the member ``key`` joined; returns ``(count, expected)``."""
+
+        key = _key(key)
+        if not key:
+            return 0, 0
+        with self._cond:
+            sub = self._subgroup(index)
+            if key not in sub.confirmations:
+                sub.confirmations.add(key)
+                self._changed(sub)
+            return len(sub.confirmations), sub.expected
+
+    def set_stage(self, index, stage, completed=False):
+        """Move subgroup ``index`` forward to ``stage``; returns ``(stage, completed)``."""
+
+        with self._cond:
+            sub = self._subgroup(index)
+            if stage > sub.stage:
+                sub.stage = stage
+            if completed:
+                sub.completed = True
+            self._changed(sub)
+            return sub.stage, sub.completed
+
+    def finalize(self, index, member_id):
+        """Remove ``member_id`` from the ready members.
+
+        The subgroup is forgotten with its last member; returns ``True`` then.
+        """
+
+        with self._cond:
+            sub = self._subgroups.get(index)
+            if sub is None:
+                return False
+            sub.ready.discard(member_id)
+            self._changed(sub)
+            if not sub.ready:
+                del self._subgroups[index]
+                return True
+            return False
+
+    def wait(self, index, predicate, timeout=None, cancelled=None):
+        """Block until ``predicate(subgroup)`` returns something true.
+
+        ``predicate`` runs under the lock, gets the :class:`SubgroupParty`
+        of ``index`` and is called again after every change. Its result is
+        returned, or ``None`` after ``timeout`` seconds or once
+        ``cancelled()`` is true.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                result = predicate(self._subgroup(index))
+                if result:
+                    return result
+                if cancelled is not None and cancelled():
+                    return None
+                remaining = WAIT_RECHECK
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return None
+                    remaining = min(remaining, left)
+                self._cond.wait(remaining)
+
+    def wait_started(self, index, expected, timeout=None, cancelled=None):
+        """Wait until ``expected`` members are ready and the party started."""
+
+        def started(sub):
+            if self._start(sub, expected):
+                self._changed(sub)
+            return len(sub.ready) >= expected and sub.started
+
+        return bool(self.wait(index, started, timeout, cancelled))
+
+    def wait_stage(self, index, stage, timeout=None, cancelled=None):
+        """Wait until subgroup ``index`` reached ``stage``; returns its progress."""
+
+        return self.wait(
+            index, lambda sub: sub.as_dict() if sub.stage >= stage else None, timeout, cancelled
+        )
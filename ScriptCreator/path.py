@@ -1,24 +1,34 @@
 from pathfinding.core.grid import Grid
 from pathfinding.finder.a_star import AStarFinder
 from pathfinding.core.diagonal_movement import DiagonalMovement
-from functools import lru_cache
+from gridsearch import astar, cell_coords, is_walkable, octile
+from hpa import AbstractGraph
+from flowfield import FlowFieldCache, WalkTargetTracker
+from pathcache import FuzzyPathCache
+from maploader import MapLoader
+import shadowmaps
 import math
+import struct
+import time
 import zipfile
-try:
-    import requests
-except Exception:
-    requests = None
-try:
-    from PIL import Image
-except Exception:
-    Image = None
-import io
 
 _map_cache = {}
-SHADOW_API_ENABLED = True
-SHADOW_API_WHITELIST = {1}
+_hpa_graphs = {}
+# walks longer than this (octile cells) use the hierarchical finder
+HPA_DISTANCE_THRESHOLD = 80
+# longest straight segment (cells) sent in a single walk packet
+MAX_WALK_SEGMENT = 20
+# walkers sharing a destination within this many seconds share a flow field
+FLOW_FIELD_WINDOW = 5.0
+FLOW_FIELD_MIN_WALKERS = 2
+_flow_fields = FlowFieldCache(maxsize=16)
+_walk_targets = WalkTargetTracker(FLOW_FIELD_WINDOW)
+_path_cache = FuzzyPathCache(maxsize=256)
+# prefer maps imported into the local shadow store (see shadow_tool.py)
+SHADOW_MAPS_ENABLED = True
 
-def _parse_bin_dimensions(data):
+def _guess_bin_dimensions(data):
+    # dimensions as guessed before the header was read, kept for validate_maps.py
     if data[1] == 0:
         width = data[0]
         height = int((len(data)-4)/data[0])
@@ -46,6 +56,14 @@ def _parse_bin_dimensions(data):
         return None
     return width, height
 
+def _parse_bin_dimensions(data):
+    # the header holds width and height as little-endian uint16
+    if len(data) >= 4:
+        width, height = struct.unpack_from("<HH", data)
+        if width and height and width * height == len(data) - 4:
+            return width, height
+    return _guess_bin_dimensions(data)
+
 def _get_bin_dimensions(map_id):
     try:
         mid = int(map_id)
@@ -59,25 +77,11 @@ def _get_bin_dimensions(map_id):
     return _parse_bin_dimensions(data)
 
 def _load_shadow_map(map_id):
-    if requests is None or Image is None:
-        raise RuntimeError("shadow dependencies not available")
-    try:
-        mid = int(map_id)
-    except Exception:
-        mid = map_id
-    url = f"https://itempicker.atlagaming.eu/api/maps/shadow/{mid}"
-    resp = requests.get(url, timeout=5)
-    if resp.status_code != 200:
-        raise RuntimeError("shadow map not available")
-    im = Image.open(io.BytesIO(resp.content)).convert("L")
-    dims = _get_bin_dimensions(map_id)
-    if dims is not None:
-        tw, th = dims
-        if im.size != (tw, th):
-            im = im.resize((tw, th), Image.NEAREST)
-    w, h = im.size
-    px = im.load()
-    return [[1 if px[x, y] >= 128 else 0 for x in range(w)] for y in range(h)]
+    data = shadowmaps.read(map_id)
+    if data is None:
+        return None
+    width, height = shadowmaps.unpack_header(data)
+    return convertToArray(data[4:], width, height)
 
 def loadMap(map_id):
     # Normalize map id to int when possible
@@ -86,20 +90,20 @@ def loadMap(map_id):
     except Exception:
         mid = map_id
 
-    # Priority: shadow API (whitelist) -> fallback to maps.zip
+    # Priority: local shadow store -> fallback to maps.zip
     cached = _map_cache.get(mid)
     if cached is not None:
         return cached
 
-    try_shadow = bool(SHADOW_API_ENABLED) and (not SHADOW_API_WHITELIST or mid in SHADOW_API_WHITELIST) and (requests is not None and Image is not None)
-
-    if try_shadow:
+    if SHADOW_MAPS_ENABLED:
         try:
             shadow_grid = _load_shadow_map(mid)
+        except Exception as e:
+            print(e)
+            shadow_grid = None
+        if shadow_grid:
             _map_cache[mid] = shadow_grid
             return shadow_grid
-        except Exception:
-            pass
 
     # Fallback to local maps.zip
     try:
@@ -111,38 +115,35 @@ def loadMap(map_id):
 
     map_id = mid
 
-    # very ugly way of adjusting the datasize, but appeared easier than looking for pattern
-    if data[1] == 0:
-        width = data[0]
-        height = int((len(data)-4)/data[0])
-    elif data[3] == 0:
-        height = data[2]
-        width = int((len(data)-4)/data[2])
-    elif data[0] == data[2]:
-        sqroot = math.sqrt(len(data)-4)
-        width, height = int(sqroot), int(sqroot)
-    elif data[0] == 19 and data[2] == 14:
-        width, height = 275, 270
-    elif data[0] == 204 and data[2] == 9:
-        width, height = 460, 265
-    elif data[0] == 54 and data[2] == 34:
-        width, height = 310, 290
-    elif data[0] == 54 and data[2] == 44:
-        width, height = 310, 300
-    elif data[0] == 94 and data[2] == 145:
-        width, height = 350, 401
-    elif data[0] == 4 and data[2] == 24:
-        width, height = 260, 280
-    elif data[0] == 16 and data[2] == 10:
-        width, height = 272, 266
-    else:
+    dimensions = _parse_bin_dimensions(data)
+    if dimensions is None:
         print(f"Error while loading map: {map_id}")
         return []
+    width, height = dimensions
 
     result = convertToArray(data[4:], width, height)
     _map_cache[map_id] = result
     return result
 
+def _cached_map(map_id):
+    try:
+        return _map_cache.get(int(map_id))
+    except Exception:
+        return _map_cache.get(map_id)
+
+_map_loader = MapLoader(loadMap, cached=_cached_map)
+
+def load_map_async(map_id, previous=None):
+    """Return a future for the grid of ``map_id`` loaded in the background.
+
+    ``previous`` is the map the player came from; the change is remembered
+    and the maps usually entered after ``map_id`` are prefetched.
+    """
+    _map_loader.record_transition(previous, map_id)
+    future = _map_loader.get(map_id)
+    _map_loader.prefetch(map_id)
+    return future
+
 def convertToArray(data, width, height):
     # Calculate the total number of elements in the data
     total_elements = width * height
@@ -156,11 +157,22 @@ def convertToArray(data, width, height):
 
     return result_array
 
-@lru_cache(maxsize=256)
-def _cached_find_path(map_id, sx, sy, dx, dy):
-    mapArray = loadMap(map_id)
-    if not mapArray:
-        return tuple()
+def get_abstract_graph(map_id):
+    """Return the cached HPA* graph for ``map_id`` building it on first use."""
+    try:
+        mid = int(map_id)
+    except Exception:
+        mid = map_id
+    graph = _hpa_graphs.get(mid)
+    if graph is None:
+        mapArray = loadMap(mid)
+        if not mapArray:
+            return None
+        graph = AbstractGraph(mapArray)
+        _hpa_graphs[mid] = graph
+    return graph
+
+def _flat_find_path(mapArray, sx, sy, dx, dy):
     grid = Grid(matrix=mapArray)
     start = grid.node(int(sx), int(sy))
     end = grid.node(int(dx), int(dy))
@@ -168,6 +180,32 @@ def _cached_find_path(map_id, sx, sy, dx, dy):
     path, runs = finder.find_path(start, end, grid)
     return tuple((node.x, node.y) for node in path)
 
+def _search_path(map_id, mapArray, sx, sy, dx, dy):
+    if octile(sx, sy, dx, dy) > HPA_DISTANCE_THRESHOLD:
+        graph = get_abstract_graph(map_id)
+        if graph is not None:
+            path = graph.find_path((sx, sy), (dx, dy))
+            if path:
+                return tuple(path)
+    return _flat_find_path(mapArray, sx, sy, dx, dy)
+
+def _cached_find_path(map_id, sx, sy, dx, dy):
+    sx, sy, dx, dy = int(sx), int(sy), int(dx), int(dy)
+    mapArray = loadMap(map_id)
+    if not mapArray:
+        return tuple()
+    cached = _path_cache.lookup(map_id, mapArray, (sx, sy), (dx, dy))
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    path = _search_path(map_id, mapArray, sx, sy, dx, dy)
+    _path_cache.store(map_id, path, time.perf_counter() - started)
+    return path
+
+def path_cache_stats():
+    """Return hit rate and latency counters of the shared path cache."""
+    return _path_cache.stats()
+
 def findPath(PlayerPos, destination, mapArray=None, map_id=None):
     if map_id is not None:
         path = _cached_find_path(map_id, PlayerPos[0], PlayerPos[1], destination[0], destination[1])
@@ -179,4 +217,92 @@ def findPath(PlayerPos, destination, mapArray=None, map_id=None):
         finder = AStarFinder(diagonal_movement=DiagonalMovement.always)
         path, runs = finder.find_path(start, end, grid)
         return path
-    return []
\ No newline at end of file
+    return []
+
+def findSharedPath(walker, PlayerPos, destination, mapArray=None, map_id=None, anchor=None, search=None):
+    """Find a path, sharing a flow field with other walkers heading to ``anchor``.
+
+    ``anchor`` is the common destination (e.g. before a random radius was
+    applied) and defaults to ``destination``. Once ``FLOW_FIELD_MIN_WALKERS``
+    walkers asked for the same anchor on the same map within
+    ``FLOW_FIELD_WINDOW`` seconds, their paths are read from one cached flow
+    field instead of running a search each. Other walks are searched with
+    ``search``, which takes the arguments of :func:`findPath` (the default).
+    """
+    if search is None:
+        search = findPath
+    if map_id is None:
+        return search(PlayerPos, destination, mapArray, map_id)
+    try:
+        mid = int(map_id)
+    except Exception:
+        mid = map_id
+    if anchor is None:
+        anchor = destination
+    goal = (int(anchor[0]), int(anchor[1]))
+    if _walk_targets.register((mid, goal), walker) >= FLOW_FIELD_MIN_WALKERS:
+        grid = loadMap(mid)
+        if grid:
+            field = _flow_fields.get(mid, goal, grid)
+            shared = field.path_from(PlayerPos)
+            end = (int(destination[0]), int(destination[1]))
+            if shared and end != goal:
+                reach = max(abs(end[0] - goal[0]), abs(end[1] - goal[1])) + 2
+                tail = astar(grid, goal, end, (
+                    goal[0] - reach, goal[1] - reach, goal[0] + reach + 1, goal[1] + reach + 1,
+                ))
+                shared = shared + tail[1:] if tail else []
+            if shared:
+                return [list(p) for p in shared]
+    return search(PlayerPos, destination, mapArray, map_id)
+
+def _line_cells(x0, y0, x1, y1):
+    # Bresenham line between two cells, both end points included
+    dx = abs(x1 - x0)
+    dy = -abs(y1 - y0)
+    step_x = 1 if x0 < x1 else -1
+    step_y = 1 if y0 < y1 else -1
+    error = dx + dy
+    while True:
+        yield x0, y0
+        if x0 == x1 and y0 == y1:
+            return
+        doubled = 2 * error
+        if doubled >= dy:
+            error += dy
+            x0 += step_x
+        if doubled <= dx:
+            error += dx
+            y0 += step_y
+
+def has_line_of_sight(grid, a, b):
+    """Return True when every cell on the straight line from ``a`` to ``b`` is walkable."""
+    return all(is_walkable(grid, x, y) for x, y in _line_cells(int(a[0]), int(a[1]), int(b[0]), int(b[1])))
+
+def smooth_path(path, grid, max_segment=MAX_WALK_SEGMENT):
+    """Reduce ``path`` to the waypoints needed to walk it in straight lines.
+
+    Each waypoint is the farthest node of ``path`` still in line of sight of
+    the previous one and at most ``max_segment`` cells away (``None`` for no
+    limit). The start cell is dropped and the destination is always kept.
+    Nodes may be ``(x, y)`` pairs or objects exposing ``x`` and ``y``.
+    """
+    coords = cell_coords(path)
+    if len(coords) < 2:
+        return coords
+    waypoints = []
+    anchor = 0
+    last = len(coords) - 1
+    while anchor < last:
+        reach = anchor + 1
+        ax, ay = coords[anchor]
+        for probe in range(anchor + 2, last + 1):
+            px, py = coords[probe]
+            if max_segment and math.hypot(px - ax, py - ay) > max_segment:
+                break
+            if grid and not has_line_of_sight(grid, coords[anchor], coords[probe]):
+                break
+            reach = probe
+        waypoints.append(coords[reach])
+        anchor = reach
+    return waypoints
@@ -0,0 +1,152 @@
+"""Path cache that reuses routes between nearby start and goal cells.
+
+Walks rarely start from exactly the same cell twice, so an exact
+``(map_id, sx, sy, dx, dy)`` key almost never hits. Routes are stored under
+coarse cell buckets instead; a lookup takes a cached route from the same
+buckets and stitches short local searches from the real start onto it and
+from its end to the real goal.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from gridsearch import astar, octile
+
+BUCKET_SIZE = 8
+# how far (octile cells) the real endpoints may be from the cached route
+STITCH_DISTANCE = 12
+STITCH_MARGIN = 4
+
+
+class FuzzyPathCache:
+    """LRU cache of cell paths keyed by coarse start/goal buckets."""
+
+    def __init__(self, maxsize=256, bucket_size=BUCKET_SIZE):
+        self.maxsize = maxsize
+        self.bucket_size = bucket_size
+        self._paths = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0
+        self.saved_time = 0.0
+
+    def stats(self):
+        """Return hit counters and the search time saved by cache hits."""
+
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "exact_hits": self.exact_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "lookup_time": self.lookup_time,
+            "saved_time": self.saved_time,
+            "entries": len(self._paths),
+        }
+
+    def _key(self, map_id, start, goal):
+        size = self.bucket_size
+        return (
+            map_id,
+            start[0] // size,
+            start[1] // size,
+            goal[0] // size,
+            goal[1] // size,
+        )
+
+    def _candidate_keys(self, map_id, start, goal):
+        # the bucket of each end point first, then the neighbouring bucket on
+        # the side the point is closest to
+        half = self.bucket_size // 2
+        size = self.bucket_size
+
+        def buckets(value):
+            own = value // size
+            near = (value - half) // size if value % size < half else (value + half) // size
+            return (own,) if near == own else (own, near)
+
+        keys = []
+        for sx in buckets(start[0]):
+            for sy in buckets(start[1]):
+                for gx in buckets(goal[0]):
+                    for gy in buckets(goal[1]):
+                        keys.append((map_id, sx, sy, gx, gy))
+        return keys
+
+    def store(self, map_id, path, search_time=0.0):
+        """Remember ``path`` (a sequence of cells) and what it cost to find."""
+
+        if not path:
+            return
+        path = tuple((int(x), int(y)) for x, y in path)
+        key = self._key(map_id, path[0], path[-1])
+        with self._lock:
+            self._paths[key] = (path, search_time)
+            self._paths.move_to_end(key)
+            while len(self._paths) > self.maxsize:
+                self._paths.popitem(last=False)
+
+    def _stitch(self, grid, start, end):
+        if start == end:
+            return [start]
+        if octile(*start, *end) > STITCH_DISTANCE:
+            return []
+        bounds = (
+            min(start[0], end[0]) - STITCH_MARGIN,
+            min(start[1], end[1]) - STITCH_MARGIN,
+            max(start[0], end[0]) + STITCH_MARGIN + 1,
+            max(start[1], end[1]) + STITCH_MARGIN + 1,
+        )
+        return astar(grid, start, end, bounds)
+
+    def lookup(self, map_id, grid, start, goal):
+        """Return a path from ``start`` to ``goal`` built from a cached route.
+
+        ``None`` is returned on a miss so callers can run a full search.
+        """
+
+        began = time.perf_counter()
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        with self._lock:
+            entries = []
+            for key in self._candidate_keys(map_id, start, goal):
+                entry = self._paths.get(key)
+                if entry is not None:
+                    self._paths.move_to_end(key)
+                    entries.append(entry)
+
+        result = None
+        cached = None
+        search_time = 0.0
+        for cached, search_time in entries:
+            if cached[0] == start and cached[-1] == goal:
+                result = cached
+                break
+            join = min(range(len(cached)), key=lambda i: octile(*start, *cached[i]))
+            leave = min(
+                range(join, len(cached)), key=lambda i: octile(*goal, *cached[i])
+            )
+            head = self._stitch(grid, start, cached[join])
+            tail = self._stitch(grid, cached[leave], goal) if head else []
+            if head and tail:
+                result = tuple(head) + cached[join + 1:leave + 1] + tuple(tail[1:])
+                break
+
+        elapsed = time.perf_counter() - began
+        with self._lock:
+            self.lookup_time += elapsed
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if result is cached:
+                self.exact_hits += 1
+            self.saved_time += max(0.0, search_time - elapsed)
+        return result
@@ -0,0 +1,323 @@
+"""Path searches in worker processes shared by every player.
+
+Each player used to search paths on its own ``ThreadPoolExecutor`` thread.
+Those threads hold the GIL while they search, so a long A* on one character
+delays the packet threads and condition loops of all the others.
+``PathService`` runs the searches in a ``ProcessPoolExecutor`` instead.
+
+The grid of a map is published once into a ``multiprocessing.shared_memory``
+block (``uint16`` width and height, then one byte per cell, 1 = walkable).
+Workers map it read-only and index its rows in place. Requests for paths,
+reachability and the nearest walkable cell come from every player. Identical
+requests that are still running share one future. Paths come back as flat
+``array('h')`` coordinates.
+
+Only the grids of the last ``PATH_SERVICE_MAPS`` maps stay published; older
+blocks are unlinked once no request uses them. Callers wait at most
+``PATH_SERVICE_TIMEOUT`` seconds for an answer and then search locally.
+"""
+
+import array
+import atexit
+import os
+import struct
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from calculatefieldlocation import find_walkable_pos
+from gridsearch import NEIGHBOURS
+import path as _path
+
+# worker processes; one core is left for the packet threads
+PATH_SERVICE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# set to False to search in the calling thread like before
+PATH_SERVICE_ENABLED = True
+# shared grids kept published, least recently used are freed first
+PATH_SERVICE_MAPS = 16
+# seconds to wait for a worker before searching in the calling thread
+PATH_SERVICE_TIMEOUT = 10.0
+_HEADER = struct.Struct("<HH")
+
+
+def pack_grid(grid):
+    """Return ``grid`` as header plus one byte per cell."""
+
+    height = len(grid)
+    width = len(grid[0]) if height else 0
+    data = bytearray(_HEADER.pack(width, height))
+    for row in grid:
+        data.extend(1 if cell else 0 for cell in row)
+    return data
+
+
+def unpack_grid(buffer):
+    """Return rows of ``buffer`` (from :func:`pack_grid`) without copying them."""
+
+    width, height = _HEADER.unpack_from(buffer)
+    view = memoryview(buffer)[_HEADER.size:_HEADER.size + width * height]
+    return [view[y * width:(y + 1) * width] for y in range(height)]
+
+
+def flatten(cells):
+    """Return ``[(x, y), ...]`` as a flat ``array('h')``."""
+
+    flat = array.array("h")
+    for x, y in cells:
+        flat.append(int(x))
+        flat.append(int(y))
+    return flat
+
+
+def unflatten(flat):
+    """Return a flat coordinate array as ``[[x, y], ...]``."""
+
+    return [[flat[i], flat[i + 1]] for i in range(0, len(flat), 2)]
+
+
+def components(grid):
+    """Label the 8-connected walkable regions of ``grid``.
+
+    Returns a flat list with one label per cell, ``-1`` for blocked cells.
+    Two cells are reachable from each other when their labels match.
+    """
+
+    height = len(grid)
+    width = len(grid[0]) if height else 0
+    labels = [-1] * (width * height)
+    label = 0
+    for y in range(height):
+        row = grid[y]
+        for x in range(width):
+            if not row[x] or labels[y * width + x] != -1:
+                continue
+            labels[y * width + x] = label
+            queue = deque([(x, y)])
+            while queue:
+                cx, cy = queue.popleft()
+                for dx, dy, _step in NEIGHBOURS:
+                    nx, ny = cx + dx, cy + dy
+                    if 0 <= nx < width and 0 <= ny < height and grid[ny][nx]:
+                        index = ny * width + nx
+                        if labels[index] == -1:
+                            labels[index] = label
+                            queue.append((nx, ny))
+            label += 1
+    return labels
+
+
+# worker side: shared grids attached so far, by block name
+_attached = {}
+
+
+def _attach(name, map_id):
+    entry = _attached.get(name)
+    if entry is None:
+        # blocks of other maps the service freed; the oldest go first
+        while len(_attached) >= PATH_SERVICE_MAPS:
+            del _attached[next(iter(_attached))]
+        try:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13
+            block = shared_memory.SharedMemory(name=name)
+        grid = unpack_grid(block.buf)
+        entry = _attached[name] = {"block": block, "grid": grid, "labels": None}
+        # path's searches look the grid up by id, e.g. for the HPA* graph
+        _path._map_cache[map_id] = grid
+    return entry
+
+
+def _work(kind, name, map_id, args):
+    entry = _attach(name, map_id)
+    grid = entry["grid"]
+    if kind == "path":
+        (sx, sy), (dx, dy) = args
+        return flatten(_path._cached_find_path(map_id, sx, sy, dx, dy))
+    if kind == "reach":
+        (sx, sy), (dx, dy) = args
+        if entry["labels"] is None:
+            entry["labels"] = components(grid)
+        width = len(grid[0]) if grid else 0
+        height = len(grid)
+        if not (0 <= sx < width and 0 <= sy < height and 0 <= dx < width and 0 <= dy < height):
+            return False
+        start = entry["labels"][sy * width + sx]
+        return start != -1 and start == entry["labels"][dy * width + dx]
+    if kind == "nearest":
+        return find_walkable_pos(args[0], args[1], grid)
+    raise ValueError(f"unknown request {kind!r}")
+
+
+class PathService:
+    """Share path searches of all players on a process pool."""
+
+    def __init__(self, workers=PATH_SERVICE_WORKERS, load=_path.loadMap, max_maps=PATH_SERVICE_MAPS):
+        self.workers = workers
+        self.max_maps = max_maps
+        self._load = load
+        self._pool = None
+        # map id -> SharedMemory, least recently used first
+        self._blocks = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.deduped = 0
+
+    def _pool_for(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _block(self, map_id):
+        with self._lock:
+            block = self._blocks.get(map_id)
+            if block is not None:
+                self._blocks.move_to_end(map_id)
+                return block
+        # loading and packing can take a while; other maps are served meanwhile
+        grid = self._load(map_id)
+        if not grid:
+            return None
+        data = pack_grid(grid)
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        with self._lock:
+            published = self._blocks.get(map_id)
+            if published is None:
+                self._blocks[map_id] = block
+                evicted = self._evict()
+        if published is not None:
+            # another request published the map first
+            _free([block])
+            return published
+        _free(evicted)
+        return block
+
+    def _evict(self):
+        # called with the lock held; maps with requests running are kept
+        busy = {key[1] for key in self._inflight}
+        evicted = []
+        for map_id in list(self._blocks):
+            if len(self._blocks) <= self.max_maps:
+                break
+            if map_id not in busy:
+                evicted.append(self._blocks.pop(map_id))
+        return evicted
+
+    def _submit(self, kind, map_id, args):
+        map_id = int(map_id)
+        key = (kind, map_id, args)
+        with self._lock:
+            self.requests += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduped += 1
+                return future
+        while True:
+            block = self._block(map_id)
+            if block is None:
+                raise ValueError(f"map {map_id} could not be loaded")
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.deduped += 1
+                    return future
+                if self._blocks.get(map_id) is not block:
+                    # evicted before the request was registered
+                    continue
+                try:
+                    future = self._pool_for().submit(_work, kind, block.name, map_id, args)
+                except BrokenProcessPool:
+                    # a worker died, start a fresh pool
+                    self._pool = None
+                    future = self._pool_for().submit(_work, kind, block.name, map_id, args)
+                self._inflight[key] = future
+                break
+        # registered outside the lock, an already finished future calls back at once
+        future.add_done_callback(lambda _f: self._done(key, future))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            evicted = self._evict()
+        _free(evicted)
+
+    def find_path(self, map_id, start, goal):
+        """Future of the path from ``start`` to ``goal`` as a flat ``array('h')``."""
+
+        args = ((int(start[0]), int(start[1])), (int(goal[0]), int(goal[1])))
+        return self._submit("path", map_id, args)
+
+    def can_reach(self, map_id, start, goal):
+        """Future telling whether ``goal`` can be walked to from ``start``."""
+
+        args = ((int(start[0]), int(start[1])), (int(goal[0]), int(goal[1])))
+        return self._submit("reach", map_id, args)
+
+    def nearest_walkable(self, map_id, x, y):
+        """Future of the walkable cell closest to ``(x, y)`` or ``None``."""
+
+        return self._submit("nearest", map_id, (int(x), int(y)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "deduped": self.deduped,
+                "inflight": len(self._inflight),
+                "maps": len(self._blocks),
+            }
+
+    def close(self):
+        """Stop the workers and free the shared grids."""
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+            blocks, self._blocks = self._blocks, {}
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        _free(blocks.values())
+
+
+def _free(blocks):
+    for block in blocks:
+        block.close()
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_path_service():
+    """Return the shared service, or ``None`` when it is disabled."""
+
+    global _service
+    if not PATH_SERVICE_ENABLED:
+        return None
+    with _service_lock:
+        if _service is None:
+            _service = PathService()
+            atexit.register(_service.close)
+        return _service
+
+
+def find_path(PlayerPos, destination, mapArray=None, map_id=None):
+    """Drop-in for :func:`path.findPath` that searches on the service."""
+
+    service = get_path_service() if map_id is not None else None
+    if service is not None:
+        try:
+            future = service.find_path(map_id, PlayerPos, destination)
+            return unflatten(future.result(PATH_SERVICE_TIMEOUT))
+        except Exception as e:
+            print(f"Path service failed, searching locally: {e}")
+    return _path.findPath(PlayerPos, destination, mapArray, map_id)
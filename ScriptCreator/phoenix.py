@@ -56,6 +56,9 @@ class Api:
             except ConnectionResetError:
                 self.handle_disconnect()
                 break
+            except OSError:
+                # the socket was closed by close()
+                break
 
             if (len(buffer) <= 0):
                 break
@@ -75,9 +78,15 @@ class Api:
         return self._worker.is_alive()
 
     def close(self) -> None:
-        if self.working():
-            self._do_work = False
-            self._worker.join()  
+        self._do_work = False
+        # unblock the worker waiting in recv
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        if self.working() and self._worker is not threading.current_thread():
+            self._worker.join(2)
 
     def get_message(self) -> str:
         if self._messages.empty():
@@ -8,12 +8,29 @@ import ast
 import re
 import contextvars
 from dataclasses import dataclass, field
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Callable
-from queue import Queue, Empty
 from getports import returnCorrectPort, returnCorrectPID
-from path import loadMap, findPath
-from calculatefieldlocation import calculate_field_location, calculate_point_B_position
+from path import findPath, findSharedPath, load_map_async, smooth_path, MAX_WALK_SEGMENT
+from routeplanner import get_portal_graph
+from dstarlite import LocalReplanner
+from playerevents import PlayerEvents
+from walkdispatch import WalkDispatcher
+from workers import PlayerWorkers
+from group_state import GroupStore, barrier
+from groupserver import SharedStore
+from partystate import MakePartyState
+from registers import Registers
+from roster import PartyRoster
+from pathservice import PATH_SERVICE_TIMEOUT, find_path as find_path_offloaded, get_path_service
+from formation import (
+    DEFAULT_FORMATION,
+    DEFAULT_SPACING,
+    MAX_LAG,
+    PLAN_WAIT,
+    GroupMove,
+    follow_waypoints,
+)
+from calculatefieldlocation import calculate_field_location, calculate_fused_field_location, calculate_point_B_position
 import random
 import math
 import subprocess
@@ -406,6 +423,14 @@ def _resolve_pid_value(pid_value, name=None):
     return None
 
 
+def _subgroup_int(value):
+    # subgroup variables only hold integers, anything else reads as 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
 # proxy object exposing group-scoped variables via attribute access
 class GroupNamespace:
     """Allow scripts to access group variables as attributes."""
@@ -425,6 +450,30 @@ class GroupNamespace:
     def get(self, name, default=None):
         return self._player.get_group_var(name, default)
 
+    def incr(self, name, amount=1):
+        return self._player.incr_group_var(name, amount)
+
+    def decr(self, name, amount=1):
+        return self._player.decr_group_var(name, amount)
+
+    def add(self, name, amount):
+        return self._player.add_group_var(name, amount)
+
+    def cas(self, name, expected, value):
+        return self._player.cas_group_var(name, expected, value)
+
+    def wait_for(self, name, predicate=None, timeout=None):
+        """Await ``predicate(value)`` for ``name``, see ``Player.wait_group_var``."""
+        return self._player.wait_group_var(name, predicate, timeout)
+
+    def subscribe(self, name, callback):
+        """Call ``callback(value)`` whenever ``name`` is written."""
+        return self._player.subscribe_group_var(name, callback)
+
+    def barrier(self, name, parties=None, timeout=None):
+        """Await every member at ``name``, see ``Player.group_barrier``."""
+        return self._player.group_barrier(name, parties, timeout)
+
 
 class SubgroupNamespace:
     """Expose subgroup-scoped variables using attribute access."""
@@ -444,6 +493,30 @@ class SubgroupNamespace:
     def get(self, name, default=0):
         return self._player.get_subgroup_var(name, default)
 
+    def incr(self, name, amount=1):
+        return self._player.incr_subgroup_var(name, amount)
+
+    def decr(self, name, amount=1):
+        return self._player.decr_subgroup_var(name, amount)
+
+    def add(self, name, amount):
+        return self._player.add_subgroup_var(name, amount)
+
+    def cas(self, name, expected, value):
+        return self._player.cas_subgroup_var(name, expected, value)
+
+    def wait_for(self, name, predicate=None, timeout=None):
+        """Await ``predicate(value)`` for ``name``, see ``Player.wait_subgroup_var``."""
+        return self._player.wait_subgroup_var(name, predicate, timeout)
+
+    def subscribe(self, name, callback):
+        """Call ``callback(value)`` whenever ``name`` is written."""
+        return self._player.subscribe_subgroup_var(name, callback)
+
+    def rendezvous(self, name, parties=None, timeout=None):
+        """Await the subgroup at ``name``, see ``Player.subgroup_rendezvous``."""
+        return self._player.subgroup_rendezvous(name, parties, timeout)
+
 
 class ConditionControl:
     """Expose ``cond.on`` and ``cond.off`` helpers to toggle conditions."""
@@ -562,13 +635,60 @@ class PeriodicCondition:
     last_error: Optional[str] = field(default=None, repr=False)
 
 
+def _roster_property(field, doc):
+    # a Player attribute kept in its (shared) PartyRoster
+    def getter(self):
+        return getattr(self.party_roster, field)
+
+    def setter(self, value):
+        self.party_roster.assign(**{field: value})
+
+    return property(getter, setter, doc=doc)
+
+
 # player class which can be reused in other standalone apis
-class Player:
-    # shared storage for variables scoped per group (leader PID)
-    _group_vars = {}
-    _group_var_lock = threading.Lock()
-    _subgroup_vars = {}
-    _subgroup_var_lock = threading.Lock()
+class Player(Registers):
+    # fields read on every packet and condition tick; everything else lives in
+    # the instance dict
+    __slots__ = (
+        "__dict__",
+        "__weakref__",
+        "name",
+        "id",
+        "pos_x",
+        "pos_y",
+        "map_id",
+        "level",
+        "champion_level",
+        "hp_percent",
+        "current_hp",
+        "max_hp",
+        "mp_percent",
+        "current_mp",
+        "max_mp",
+        "is_resting",
+        "leadername",
+        "leaderID",
+    )
+
+    # shared storage for variables scoped per group (leader PID) and per
+    # (group, subgroup), see group_state.py; served by another process when
+    # SCRIPTCREATOR_GROUP_SERVER is set, see groupserver.py; opened on first use
+    _group_store = SharedStore("group")
+    _subgroup_store = SharedStore("subgroup")
+    # per group objects that cannot leave this process (locks, futures)
+    _runtime_store = GroupStore()
+    # snapshots.SnapshotWriter of the window, told when a player leaves its group
+    _snapshots = None
+
+    partyname = _roster_property("names", "Names of the party, the leader first.")
+    partyID = _roster_property("ids", "In-game ids of the party, the leader first.")
+    partyPID = _roster_property("pids", "Client PIDs of the party, the leader first.")
+    party_subgroups = _roster_property("subgroups", "Subgroup index by member PID.")
+    party_subgroup_order = _roster_property("subgroup_order", "Position inside the subgroup by PID.")
+    party_subgroup_members = _roster_property(
+        "subgroup_members", "``[(pid, name), ...]`` by subgroup index."
+    )
 
     class _GroupConsoleBuffer:
         __slots__ = ("chunks",)
@@ -589,6 +709,9 @@ class Player:
             return None
 
     def __init__(self, name=None, on_disconnect=None, api_port=None, pid=None, new_api_port=None):
+        # attr1..attr100, free for scripts to use as they want
+        super().__init__()
+
         # player info
         self.name = name
         self.id = 0
@@ -621,11 +744,19 @@ class Player:
         self.players = []
 
         # other
-        self.map_changed = False
+        # map_changed reads True until this time.monotonic() value
+        self._map_changed_until = 0.0
         self.last_walk_failed = False
 
-        # should move to shared class so map doesnt have to be loaded for each character individually
+        # grids are cached in ``path`` and loaded in the background, see _request_map
         self.map_array = []
+        self._map_future = None
+        self._map_future_id = None
+        # map and cell of the last ``at`` packet, i.e. where a map change landed
+        self._last_at = None
+        # map and last cell before the position moved to another map, i.e.
+        # the portal the player took
+        self._map_exit = None
         
         self.recv_packet_conditions = []
         self.send_packet_conditions = []
@@ -668,23 +799,30 @@ class Player:
         self._last_periodic_walk = {}
         self._periodic_ctx = threading.local()
         self._periodic_cond_lock = threading.Lock()
-        # dedicated executor so multiple conditions can run in parallel
-        self._cond_executor = ThreadPoolExecutor(max_workers=4)
         self._periodic_main_task = None
 
+        # threads and pooled work of this player, see workers.py
+        self._workers = PlayerWorkers(name or "")
+
         # walking coordination
         self.walk_lock = threading.Lock()
-        self.walk_queue = Queue()
-        self._walk_thread = threading.Thread(target=self._process_walk_queue, daemon=True)
-        self._walk_thread.start()
+        # walks started, waypoints walked and walk packets queued
+        self.walk_stats = {"walks": 0, "waypoints": 0, "packets": 0, "replans": 0, "replan_time": 0.0}
+        # local path repairs during the last walk_to_point
+        self.last_walk_replans = 0
 
-        # dedicated executor for heavy path computations
-        self._path_executor = ThreadPoolExecutor(max_workers=1)
-        
-        # asyncio event loop for non-blocking tasks
+        # path computations run on a pool shared by every player
+        self._path_executor = self._workers.executor("path")
+
+        # asyncio event loop for non-blocking tasks; its thread is started by
+        # _ensure_loop once the player is connected or a condition needs it
         self.loop = asyncio.new_event_loop()
-        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
-        self._loop_thread.start()
+        # position / map change notifications published by packetlogger
+        self._events = PlayerEvents(self.loop)
+        # walk packets, latest target per channel, see _dispatch_walk
+        self._walk_dispatcher = WalkDispatcher(self.loop, self._dispatch_walk)
+        self._loop_thread = None
+        self._loop_start_lock = threading.Lock()
 
         # indicates when a script has been loaded into this player
         self.script_loaded = False
@@ -695,12 +833,9 @@ class Player:
         # group info
         self.leadername = ""
         self.leaderID = 0
-        self.partyname = []
-        self.partyID = []
-        self.partyPID = []
-        self.party_subgroups = {}
-        self.party_subgroup_order = {}
-        self.party_subgroup_members = {}
+        # partyname, partyID, partyPID and the party_subgroup* maps, shared
+        # with the other players of the group by main.py
+        self.party_roster = PartyRoster()
         self.subgroup_index = None
         self.subgroup_member_limit = 0
 
@@ -711,16 +846,11 @@ class Player:
         # proxy for group-shared variables
         self._group = GroupNamespace(self)
         self._subgroup = SubgroupNamespace(self)
+        # group/subgroup variable subscriptions made by scripts
+        self._group_watches = []
 
         # callback when connection is lost
         self.on_disconnect = on_disconnect
-        
-        # initialize 100 empty attributes so user can use them as he wants
-        for i in range(1, 50):
-            setattr(self, f'attr{i}', 0)
-
-        for i in range(51, 101):
-            setattr(self, f'attr{i}', [])
 
         # connection metadata
         self.api = None
@@ -754,12 +884,8 @@ class Player:
                 self.api = None
                 self.stop_script = True
             else:
-                pl_thread = threading.Thread(target=self.packetlogger)
-                pl_thread.setDaemon(True)
-                pl_thread.start()
-
-                t = threading.Thread(target=self.queries, args=[0.25, ])
-                t.start()
+                self._workers.spawn(self.packetlogger)
+                self._workers.spawn(self.queries, 0.25)
 
                 # ensure condition loops are ready
                 self.start_condition_loop()
@@ -828,6 +954,35 @@ class Player:
 
         self._console_print(*args, **kwargs)
 
+    def _ensure_loop(self):
+        """Return ``self.loop``, running on its thread.
+
+        The loop thread is only started when first needed and the loop is
+        closed by :meth:`shutdown`. Recreate or restart it so conditions can
+        run after a reconnection or setup load.
+        """
+
+        with self._loop_start_lock:
+            if self.loop.is_closed():
+                self.loop = asyncio.new_event_loop()
+                self._events.rebind(self.loop)
+                self._walk_dispatcher.rebind(self.loop)
+                self._loop_thread = None
+            if self._loop_thread is None or not self._loop_thread.is_alive():
+                self._workers.reopen()
+                self._loop_thread = threading.Thread(
+                    target=self.loop.run_forever,
+                    name=f"{self.name or 'player'}-loop",
+                    daemon=True,
+                )
+                self._loop_thread.start()
+                self._periodic_main_task = None
+                with self._periodic_cond_lock:
+                    conds = list(self.periodical_conditions)
+                for cond in conds:
+                    cond.task = None
+            return self.loop
+
     def start_condition_loop(self):
         """Ensure background condition tasks are running.
 
@@ -836,30 +991,7 @@ class Player:
         keeps the per-condition tasks in sync with their ``active`` flag.  It
         is safe to call multiple times and from any thread."""
 
-        # ``self.loop`` is created in ``__init__`` but can be stopped if the
-        # client was disconnected.  Recreate it when necessary so conditions
-        # can continue running after a reconnection or setup load.
-        if not hasattr(self, "loop") or self.loop.is_closed():
-            self.loop = asyncio.new_event_loop()
-            self._loop_thread = threading.Thread(
-                target=self.loop.run_forever, daemon=True
-            )
-            self._loop_thread.start()
-            self._periodic_main_task = None
-            with self._periodic_cond_lock:
-                conds = list(self.periodical_conditions)
-            for cond in conds:
-                cond.task = None
-        elif not getattr(self, "_loop_thread", None) or not self._loop_thread.is_alive():
-            self._loop_thread = threading.Thread(
-                target=self.loop.run_forever, daemon=True
-            )
-            self._loop_thread.start()
-            self._periodic_main_task = None
-            with self._periodic_cond_lock:
-                conds = list(self.periodical_conditions)
-            for cond in conds:
-                cond.task = None
+        self._ensure_loop()
 
         def _ensure_tasks():
             if self._periodic_main_task is None or self._periodic_main_task.done():
@@ -1043,10 +1175,8 @@ class Player:
             return group_id
         gid = self.leaderID if self.leaderID else self._unique_group_id
         if gid != self._current_gid:
-            with Player._group_var_lock:
-                Player._group_vars.setdefault(gid, {}).update(
-                    Player._group_vars.pop(self._current_gid, {})
-                )
+            Player._group_store.merge(self._current_gid, gid)
+            Player._runtime_store.merge(self._current_gid, gid)
             self._current_gid = gid
         return gid
 
@@ -1064,28 +1194,192 @@ class Player:
         """
 
         gid = self._resolve_gid(group_id)
-        with Player._group_var_lock:
-            group = Player._group_vars.setdefault(gid, {})
-            return group.get(name, default)
+        return Player._group_store.get(gid, name, default)
+
+    def get_group_var_versioned(self, name, default=None, group_id=None):
+        """Return ``(value, version)`` of ``name`` for this group.
+
+        Pass the version to :meth:`compare_and_set_group_var` to store a new
+        value only if nobody changed ``name`` in between. A missing name has
+        version ``0``.
+        """
+
+        gid = self._resolve_gid(group_id)
+        return Player._group_store.get_versioned(gid, name, default)
 
     def set_group_var(self, name, value, group_id=None):
         """Assign ``value`` to ``name`` for this group."""
 
         gid = self._resolve_gid(group_id)
-        with Player._group_var_lock:
-            Player._group_vars.setdefault(gid, {})[name] = value
+        Player._group_store.set(gid, name, value)
+
+    def compare_and_set_group_var(self, name, expected_version, value, group_id=None):
+        """Assign ``value`` if ``name`` is still at ``expected_version``.
+
+        Returns ``True`` when the value was stored. On ``False`` read the
+        variable again and retry, or use :meth:`update_group_var`.
+        """
+
+        gid = self._resolve_gid(group_id)
+        stored, _version = Player._group_store.compare_and_set(
+            gid, name, expected_version, value
+        )
+        return stored
+
+    def update_group_var(self, name, func, default=None, group_id=None):
+        """Atomically replace ``name`` with ``func(current)`` and return it.
+
+        ``current`` is ``default`` while the variable is unset, e.g.
+        ``update_group_var("ids", lambda ids: ids + [self.id], [])``. Build a
+        new value in ``func`` instead of changing ``current`` in place.
+        """
+
+        gid = self._resolve_gid(group_id)
+        value, _version = Player._group_store.update(gid, name, func, default)
+        return value
+
+    def add_group_var(self, name, amount, default=0, group_id=None):
+        """Atomically add ``amount`` to ``name`` and return the new value.
+
+        Unlike a get followed by a set, no increment is lost when several
+        members count at once. ``default`` is the start value of an unset
+        variable.
+        """
+
+        gid = self._resolve_gid(group_id)
+        value, _version = Player._group_store.add(gid, name, amount, default)
+        return value
+
+    def incr_group_var(self, name, amount=1, group_id=None):
+        """Atomically increase ``name`` by ``amount`` and return it."""
+
+        return self.add_group_var(name, amount, group_id=group_id)
+
+    def decr_group_var(self, name, amount=1, group_id=None):
+        """Atomically decrease ``name`` by ``amount`` and return it."""
+
+        return self.add_group_var(name, -amount, group_id=group_id)
+
+    def cas_group_var(self, name, expected, value, group_id=None):
+        """Assign ``value`` only if ``name`` currently equals ``expected``.
+
+        An unset variable equals ``None``. Returns ``True`` when the value
+        was stored, e.g. ``cas_group_var("leader", None, self.id)`` lets
+        exactly one member claim a role.
+        """
+
+        gid = self._resolve_gid(group_id)
+        swapped, _current = Player._group_store.compare_and_swap(gid, name, expected, value)
+        return swapped
 
     def del_group_var(self, name, group_id=None):
         """Remove ``name`` from this group if present."""
 
         gid = self._resolve_gid(group_id)
-        with Player._group_var_lock:
-            group = Player._group_vars.get(gid)
-            if not group:
-                return
-            group.pop(name, None)
-            if not group:
-                Player._group_vars.pop(gid, None)
+        Player._group_store.delete(gid, name)
+
+    async def wait_group_var(self, name, predicate=None, timeout=None, group_id=None):
+        """Wait until ``predicate(value)`` holds for group variable ``name``.
+
+        Woken by the write that changes ``name``, whichever player makes it,
+        instead of polling. Without ``predicate`` the next write is awaited.
+        Returns ``False`` when ``timeout`` seconds pass first.
+        """
+
+        gid = group_id if group_id is not None else (lambda: self._resolve_gid(None))
+        return await Player._group_store.wait_for(gid, name, predicate, timeout)
+
+    def subscribe_group_var(self, name, callback, group_id=None):
+        """Call ``callback(value)`` on this player's loop after each write of ``name``.
+
+        Returns a handle whose ``cancel()`` ends the subscription; all of
+        them end with :meth:`reset_group_runtime`.
+        """
+
+        gid = self._resolve_gid(group_id)
+        watch = Player._group_store.watch(gid, name, callback, self._callback_loop())
+        self._group_watches.append(watch)
+        return watch
+
+    async def group_barrier(self, name, parties=None, timeout=None):
+        """Wait until ``parties`` members of the group reached barrier ``name``.
+
+        ``parties`` defaults to the size of the party. The result is true
+        once everyone arrived. After ``timeout`` seconds it is false and
+        its ``missing`` names the members that were late::
+
+            result = selfgroup.barrier("room1", timeout=60)
+            if not result:
+                print("late:", result.missing)
+        """
+
+        names = self.partyname if isinstance(self.partyname, list) else []
+        expected = tuple(n for n in names if isinstance(n, str) and n)
+        if parties is None:
+            parties = len(expected)
+        if parties <= 0:
+            raise RuntimeError("Group barrier error: the party size is unknown, pass parties.")
+        result = await barrier(
+            Player._group_store,
+            lambda: self._resolve_gid(None),
+            f"_barrier:{name}",
+            self.name,
+            parties,
+            timeout,
+            expected,
+        )
+        if not result:
+            print(
+                f"[GROUP] {self.name} barrier {name} timed out with {len(result.arrived)}/"
+                f"{parties} members, late: {', '.join(result.missing) or 'unknown'}"
+            )
+        return result
+
+    async def subgroup_rendezvous(self, name, parties=None, timeout=None):
+        """Wait until every member of the subgroup reached ``name``.
+
+        Like :meth:`group_barrier` for the members of this subgroup only;
+        ``parties`` defaults to the subgroup size.
+        """
+
+        group_identifier, sid = self._resolve_subgroup_ids()
+        try:
+            limit = int(getattr(self, "subgroup_member_limit", 0) or 0)
+        except (TypeError, ValueError):
+            limit = 0
+        membership = self._get_subgroup_membership_info(limit, sid) if limit > 0 else None
+        expected = tuple(membership[1]) if membership else ()
+        if parties is None:
+            parties = len(expected) or limit
+        if parties <= 0:
+            raise RuntimeError("Subgroup rendezvous error: the subgroup size is unknown, pass parties.")
+        result = await barrier(
+            Player._group_store,
+            lambda: self._resolve_gid(None),
+            f"_rendezvous:{group_identifier}:{sid}:{name}",
+            self.name,
+            parties,
+            timeout,
+            expected,
+        )
+        if not result:
+            print(
+                f"[MEMBER] {self.name} rendezvous {name} timed out with "
+                f"{len(result.arrived)}/{parties} members, late: "
+                f"{', '.join(result.missing) or 'unknown'}"
+            )
+        return result
+
+    def _callback_loop(self):
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return self._ensure_loop()
+
+    def _cancel_group_watches(self):
+        watches, self._group_watches = self._group_watches, []
+        for watch in watches:
+            watch.cancel()
 
     def _resolve_subgroup_ids(self, group_id=None, subgroup_index=None):
         group_identifier = group_id
@@ -1124,14 +1418,7 @@ class Player:
         """Return the value of ``name`` shared by this subgroup."""
 
         gid, sid = self._resolve_subgroup_ids(group_id, subgroup_index)
-        with Player._subgroup_var_lock:
-            subgroup_data = Player._subgroup_vars.setdefault(gid, {})
-            values = subgroup_data.setdefault(sid, {})
-            value = values.get(name, default)
-        try:
-            return int(value)
-        except (TypeError, ValueError):
-            return 0
+        return _subgroup_int(Player._subgroup_store.get((gid, sid), name, default))
 
     def set_subgroup_var(
         self,
@@ -1150,10 +1437,41 @@ class Player:
                 f"Subgroup variables accept only integers (received {value!r})."
             )
 
-        with Player._subgroup_var_lock:
-            subgroup_data = Player._subgroup_vars.setdefault(gid, {})
-            subgroup_values = subgroup_data.setdefault(sid, {})
-            subgroup_values[name] = numeric_value
+        Player._subgroup_store.set((gid, sid), name, numeric_value)
+
+    def add_subgroup_var(self, name, amount, group_id=None, subgroup_index=None):
+        """Atomically add the integer ``amount`` to ``name`` and return it.
+
+        An unset variable starts at ``0``, so ``incr_subgroup_var("arrived")``
+        followed by ``wait_subgroup_var("arrived", lambda n: n >= 3)`` waits
+        until three members checked in.
+        """
+
+        gid, sid = self._resolve_subgroup_ids(group_id, subgroup_index)
+        value, _version = Player._subgroup_store.add((gid, sid), name, amount, 0)
+        return value
+
+    def incr_subgroup_var(self, name, amount=1, group_id=None, subgroup_index=None):
+        """Atomically increase ``name`` by ``amount`` and return it."""
+
+        return self.add_subgroup_var(name, amount, group_id, subgroup_index)
+
+    def decr_subgroup_var(self, name, amount=1, group_id=None, subgroup_index=None):
+        """Atomically decrease ``name`` by ``amount`` and return it."""
+
+        return self.add_subgroup_var(name, -amount, group_id, subgroup_index)
+
+    def cas_subgroup_var(self, name, expected, value, group_id=None, subgroup_index=None):
+        """Assign ``value`` only if ``name`` currently equals ``expected``.
+
+        An unset variable equals ``0``. Returns ``True`` when stored.
+        """
+
+        gid, sid = self._resolve_subgroup_ids(group_id, subgroup_index)
+        swapped, _current = Player._subgroup_store.compare_and_swap(
+            (gid, sid), name, expected, value, 0
+        )
+        return swapped
 
     def del_subgroup_var(
         self,
@@ -1164,18 +1482,43 @@ class Player:
         """Remove ``name`` from the current subgroup if it exists."""
 
         gid, sid = self._resolve_subgroup_ids(group_id, subgroup_index)
-        with Player._subgroup_var_lock:
-            subgroup_data = Player._subgroup_vars.get(gid)
-            if not subgroup_data:
-                return
-            values = subgroup_data.get(sid)
-            if not values:
-                return
-            values.pop(name, None)
-            if not values:
-                subgroup_data.pop(sid, None)
-            if not subgroup_data:
-                Player._subgroup_vars.pop(gid, None)
+        Player._subgroup_store.delete((gid, sid), name)
+
+    async def wait_subgroup_var(
+        self,
+        name,
+        predicate=None,
+        timeout=None,
+        group_id=None,
+        subgroup_index=None,
+    ):
+        """Wait until ``predicate(value)`` holds for subgroup variable ``name``."""
+
+        self._resolve_subgroup_ids(group_id, subgroup_index)
+        check = None if predicate is None else (lambda value: predicate(_subgroup_int(value)))
+        return await Player._subgroup_store.wait_for(
+            lambda: self._resolve_subgroup_ids(group_id, subgroup_index),
+            name,
+            check,
+            timeout,
+            default=0,
+        )
+
+    def subscribe_subgroup_var(self, name, callback, group_id=None, subgroup_index=None):
+        """Call ``callback(value)`` on this player's loop after each write of ``name``."""
+
+        key = self._resolve_subgroup_ids(group_id, subgroup_index)
+        watch = Player._subgroup_store.watch(
+            key, name, lambda value: callback(_subgroup_int(value)), self._callback_loop()
+        )
+        self._group_watches.append(watch)
+        return watch
+
+    @staticmethod
+    def _drop_subgroup_vars(group_identifier):
+        for key in Player._subgroup_store.groups():
+            if key[0] == group_identifier:
+                Player._subgroup_store.drop(key)
 
     # ------------------------------------------------------------------ #
     # Party coordination helpers
@@ -1269,192 +1612,54 @@ class Player:
             if subgroup_index > 0:
                 self._clear_party_completion_state(subgroup_index)
 
-    def _read_make_party_state(self):
-        gid = self._resolve_gid(None)
-        with Player._group_var_lock:
-            group = Player._group_vars.setdefault(gid, {})
-            stored = group.get("_make_party_state")
-            if not isinstance(stored, dict):
-                return {}
-            return copy.deepcopy(stored)
-
-    def _normalize_make_party_substate(self, sub_state):
-        if not isinstance(sub_state, dict):
-            sub_state = {}
-
-        ready_raw = sub_state.get("ready", set())
-        if isinstance(ready_raw, set):
-            ready_set = set(ready_raw)
-        elif isinstance(ready_raw, (list, tuple)):
-            ready_set = set(ready_raw)
-        else:
-            ready_set = set()
-
-        confirmations_raw = sub_state.get("confirmations", set())
-        if isinstance(confirmations_raw, set):
-            confirmations_set = set(confirmations_raw)
-        elif isinstance(confirmations_raw, (list, tuple)):
-            confirmations_set = set(
-                str(entry).strip().lower()
-                for entry in confirmations_raw
-                if isinstance(entry, (str, int))
-            )
-        elif isinstance(confirmations_raw, dict):
-            confirmations_set = set(
-                str(key).strip().lower()
-                for key, value in confirmations_raw.items()
-                if value
-            )
-        else:
-            confirmations_set = set()
-
-        try:
-            expected = int(sub_state.get("expected", 0))
-        except (TypeError, ValueError):
-            expected = 0
-
-        members_raw = sub_state.get("members", [])
-        if isinstance(members_raw, (list, tuple)):
-            members = list(members_raw)
-        else:
-            members = []
-
-        member_names_raw = sub_state.get("member_names", [])
-        if isinstance(member_names_raw, (list, tuple)):
-            member_names = list(member_names_raw)
-        else:
-            member_names = []
-
-        leader_id_raw = sub_state.get("leader_id")
-        try:
-            leader_id = int(leader_id_raw)
-        except (TypeError, ValueError):
-            leader_id = None
-
-        leader_name_raw = sub_state.get("leader_name")
-        if isinstance(leader_name_raw, str):
-            leader_name = leader_name_raw.strip().lower()
-        else:
-            leader_name = ""
-
-        try:
-            stage = int(sub_state.get("stage", 0))
-        except (TypeError, ValueError):
-            stage = 0
-
-        started = bool(sub_state.get("started", False))
-        completed = bool(sub_state.get("completed", False))
-        try:
-            last_update = float(sub_state.get("last_update", 0.0))
-        except (TypeError, ValueError):
-            last_update = 0.0
-
-        return {
-            "ready": ready_set,
-            "confirmations": confirmations_set,
-            "expected": expected,
-            "members": members,
-            "member_names": member_names,
-            "leader_id": leader_id,
-            "leader_name": leader_name,
-            "stage": stage,
-            "started": started,
-            "completed": completed,
-            "last_update": last_update,
-        }
-
-    def _ensure_make_party_substate_mutable(self, state, subgroup_index):
-        sub_state = state.get(subgroup_index)
-        if not isinstance(sub_state, dict):
-            sub_state = {}
-
-        ready_raw = sub_state.get("ready")
-        if isinstance(ready_raw, set):
-            ready_set = ready_raw
-        elif isinstance(ready_raw, (list, tuple)):
-            ready_set = set(ready_raw)
-        else:
-            ready_set = set()
-        sub_state["ready"] = ready_set
-
-        member_names_raw = sub_state.get("member_names")
-        if isinstance(member_names_raw, list):
-            member_names_list = member_names_raw
-        elif isinstance(member_names_raw, (tuple, set)):
-            member_names_list = list(member_names_raw)
-        else:
-            member_names_list = []
-        sub_state["member_names"] = member_names_list
-
-        leader_name_raw = sub_state.get("leader_name")
-        if isinstance(leader_name_raw, str):
-            sub_state["leader_name"] = leader_name_raw.strip().lower()
-        else:
-            sub_state["leader_name"] = ""
+    def _make_party_board(self):
+        """Return the :class:`MakePartyState` of this player's group."""
 
-        leader_id_raw = sub_state.get("leader_id")
-        try:
-            sub_state["leader_id"] = int(leader_id_raw)
-        except (TypeError, ValueError):
-            sub_state["leader_id"] = None
-
-        confirmations_raw = sub_state.get("confirmations")
-        if isinstance(confirmations_raw, set):
-            confirmations_set = confirmations_raw
-        elif isinstance(confirmations_raw, (list, tuple)):
-            confirmations_set = set(
-                str(entry).strip().lower()
-                for entry in confirmations_raw
-                if isinstance(entry, (str, int))
-            )
-        elif isinstance(confirmations_raw, dict):
-            confirmations_set = set(
-                str(key).strip().lower()
-                for key, value in confirmations_raw.items()
-                if value
-            )
-        else:
-            confirmations_set = set()
-        sub_state["confirmations"] = confirmations_set
-
-        try:
-            sub_state["expected"] = int(sub_state.get("expected", 0))
-        except (TypeError, ValueError):
-            sub_state["expected"] = 0
-
-        members_raw = sub_state.get("members")
-        if isinstance(members_raw, list):
-            sub_state["members"] = members_raw
-        elif isinstance(members_raw, tuple):
-            sub_state["members"] = list(members_raw)
-        else:
-            sub_state["members"] = []
+        gid = self._resolve_gid(None)
+        board = Player._runtime_store.get(gid, "_make_party_state")
+        if isinstance(board, MakePartyState):
+            return board
+        board, _ = Player._runtime_store.update(
+            gid,
+            "_make_party_state",
+            lambda stored: stored if isinstance(stored, MakePartyState) else MakePartyState(),
+        )
+        return board
 
-        try:
-            sub_state["stage"] = int(sub_state.get("stage", 0))
-        except (TypeError, ValueError):
-            sub_state["stage"] = 0
+    def _wait_make_party(self, wait, timeout=None):
+        # ``wait(board, timeout, cancelled)`` blocks on the board of the
+        # group; when the player moves to another group meanwhile the wait
+        # goes on with that group's board
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not getattr(self, "stop_script", False):
+            board = self._make_party_board()
 
-        sub_state["started"] = bool(sub_state.get("started", False))
-        sub_state["completed"] = bool(sub_state.get("completed", False))
-        try:
-            sub_state["last_update"] = float(sub_state.get("last_update", 0.0))
-        except (TypeError, ValueError):
-            sub_state["last_update"] = 0.0
+            def cancelled():
+                return (
+                    getattr(self, "stop_script", False)
+                    or self._make_party_board() is not board
+                )
 
-        state[subgroup_index] = sub_state
-        return sub_state
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            result = wait(board, left, cancelled)
+            if result or self._make_party_board() is board:
+                return result
+        return None
 
-    def _update_make_party_state(self, updater):
+    def _update_group_dict(self, name, updater):
+        # run ``updater`` on a private copy of a dict group var and publish
+        # the copy, so readers of the old value never see a half update
         gid = self._resolve_gid(None)
-        with Player._group_var_lock:
-            group = Player._group_vars.setdefault(gid, {})
-            state = group.get("_make_party_state")
-            if not isinstance(state, dict):
-                state = {}
+        result = None
+
+        def apply(stored):
+            nonlocal result
+            state = copy.deepcopy(stored) if isinstance(stored, dict) else {}
             result = updater(state)
-            group["_make_party_state"] = state
-            return result
+            return state
+
+        Player._group_store.update(gid, name, apply)
+        return result
 
     def _safe_party_id(self):
         try:
@@ -1470,79 +1675,14 @@ class Player:
     def _register_make_party_ready(
         self, subgroup_index, expected_size, member_ids, member_names=None
     ):
-        def updater(state):
-            sub_state = self._ensure_make_party_substate_mutable(state, subgroup_index)
-            if sub_state.get("completed"):
-                sub_state["ready"].clear()
-                sub_state["started"] = False
-                sub_state["completed"] = False
-                sub_state["stage"] = 0
-                sub_state["members"] = []
-                sub_state["member_names"] = []
-                sub_state["expected"] = 0
-                sub_state["confirmations"].clear()
-
-            sub_state["expected"] = int(expected_size)
-            sub_state["members"] = list(member_ids)
-            if isinstance(member_names, (list, tuple)):
-                sub_state["member_names"] = [
-                    name.strip() if isinstance(name, str) else ""
-                    for name in member_names
-                ]
-            if member_ids:
-                leader_id_raw = member_ids[0]
-                try:
-                    sub_state["leader_id"] = int(leader_id_raw)
-                except (TypeError, ValueError):
-                    sub_state["leader_id"] = None
-            if isinstance(member_names, (list, tuple)) and member_names:
-                leader_name_raw = member_names[0]
-                if isinstance(leader_name_raw, str):
-                    sub_state["leader_name"] = leader_name_raw.strip().lower()
-                else:
-                    sub_state["leader_name"] = ""
-            elif not member_ids:
-                sub_state["leader_name"] = ""
-            if not sub_state["started"]:
-                sub_state["confirmations"].clear()
-
-            ready_set = sub_state["ready"]
-            current_id = self._safe_party_id()
-            added = current_id not in ready_set
-            if added:
-                ready_set.add(current_id)
-
-            ready_count = len(ready_set)
-            started_now = False
-            if ready_count >= sub_state["expected"] and not sub_state["started"]:
-                sub_state["started"] = True
-                sub_state["stage"] = 0
-                sub_state["completed"] = False
-                sub_state["last_update"] = time.time()
-                sub_state["confirmations"].clear()
-                started_now = True
-
-            return added, ready_count, sub_state["expected"], bool(sub_state["started"]), started_now
-
-        return self._update_make_party_state(updater)
+        return self._make_party_board().register_ready(
+            subgroup_index, self._safe_party_id(), expected_size, member_ids, member_names
+        )
 
     def _register_make_party_confirmation(self, subgroup_index, confirmation_key):
         if not confirmation_key:
             return 0, 0
-
-        normalized_key = str(confirmation_key).strip().lower()
-        if not normalized_key:
-            return 0, 0
-
-        def updater(state):
-            sub_state = self._ensure_make_party_substate_mutable(state, subgroup_index)
-            confirmations = sub_state["confirmations"]
-            if normalized_key not in confirmations:
-                confirmations.add(normalized_key)
-                sub_state["last_update"] = time.time()
-            return len(confirmations), sub_state.get("expected", 0)
-
-        return self._update_make_party_state(updater)
+        return self._make_party_board().confirm(subgroup_index, confirmation_key)
 
     def _note_make_party_confirmation(self, member_name=None, member_id=None):
         try:
@@ -1609,134 +1749,60 @@ class Player:
             self.make_party_member_count = total
 
     def _wait_for_make_party_start(self, subgroup_index, expected_size):
-        def ensure_started(state):
-            sub_state = self._ensure_make_party_substate_mutable(state, subgroup_index)
-            ready_count = len(sub_state["ready"])
-            started_now = False
-            if ready_count >= expected_size and not sub_state["started"]:
-                sub_state["started"] = True
-                sub_state["stage"] = 0
-                sub_state["completed"] = False
-                sub_state["last_update"] = time.time()
-                started_now = True
-            return ready_count, bool(sub_state["started"]), started_now
-
-        while not getattr(self, "stop_script", False):
-            ready_count, started, _ = self._update_make_party_state(ensure_started)
-            if ready_count >= expected_size and started:
-                return True
-            time.sleep(0.25)
-        return False
+        return bool(
+            self._wait_make_party(
+                lambda board, timeout, cancelled: board.wait_started(
+                    subgroup_index, expected_size, timeout, cancelled
+                )
+            )
+        )
 
     def _wait_for_make_party_stage(self, subgroup_index, target_stage):
-        while not getattr(self, "stop_script", False):
-            state = self._read_make_party_state()
-            sub_state = self._normalize_make_party_substate(state.get(subgroup_index))
-            if sub_state.get("completed") and sub_state.get("stage", 0) >= target_stage:
-                return sub_state
-            if sub_state.get("stage", 0) >= target_stage:
-                return sub_state
-            time.sleep(0.2)
-        return None
+        return self._wait_make_party(
+            lambda board, timeout, cancelled: board.wait_stage(
+                subgroup_index, target_stage, timeout, cancelled
+            )
+        )
 
     def _wait_for_make_party_count(self, subgroup_index, target_count, timeout=6.0):
-        deadline = time.time() + max(1.0, float(timeout))
-        last_total = 1
-
-        while not getattr(self, "stop_script", False):
-            state = self._read_make_party_state()
-            sub_state = self._normalize_make_party_substate(state.get(subgroup_index))
-            confirmations = sub_state.get("confirmations", set())
-            if not isinstance(confirmations, set):
-                confirmations = set(confirmations)
-            confirmed_total = 1 + len(confirmations)
-            expected = sub_state.get("expected", 0)
-            if isinstance(expected, int) and expected > 0:
-                confirmed_total = min(expected, confirmed_total)
-            if confirmed_total < 1:
-                confirmed_total = 1
-            self.make_party_member_count = confirmed_total
-            last_total = confirmed_total
-            if confirmed_total >= target_count:
-                return True, confirmed_total
-            if time.time() >= deadline:
-                break
-            time.sleep(0.25)
-
-        return False, last_total
+        return self._wait_for_make_party_total(subgroup_index, target_count, None, timeout)
 
     def _wait_for_make_party_confirmations(self, subgroup_index, expected_size, timeout=12.0):
-        deadline = time.time() + max(1.0, float(timeout))
-        last_count = 1
+        return self._wait_for_make_party_total(
+            subgroup_index, expected_size, expected_size, timeout
+        )
 
-        while not getattr(self, "stop_script", False):
-            state = self._read_make_party_state()
-            sub_state = self._normalize_make_party_substate(state.get(subgroup_index))
-            confirmations = sub_state.get("confirmations", set())
-            if not isinstance(confirmations, set):
-                confirmations = set(confirmations)
-            confirmed_total = 1 + len(confirmations)
-            if expected_size > 0:
-                confirmed_total = min(expected_size, confirmed_total)
-            if confirmed_total < 1:
-                confirmed_total = 1
-            self.make_party_member_count = confirmed_total
-            last_count = confirmed_total
-            if expected_size > 0 and confirmed_total >= expected_size:
-                return True, confirmed_total
-            if time.time() >= deadline:
-                break
-            time.sleep(0.25)
+    def _wait_for_make_party_total(self, subgroup_index, target, expected, timeout):
+        # ``expected`` caps the count, ``None`` uses the subgroup's own size
+        last_total = 1
 
-        return False, last_count
+        def reached(sub):
+            nonlocal last_total
+            last_total = sub.confirmed_total(expected)
+            self.make_party_member_count = last_total
+            return last_total >= target and (expected is None or expected > 0)
 
-    def _set_make_party_stage(self, subgroup_index, stage, *, completed=False):
-        def updater(state):
-            sub_state = self._ensure_make_party_substate_mutable(state, subgroup_index)
-            current_stage = int(sub_state.get("stage", 0))
-            if stage > current_stage:
-                sub_state["stage"] = stage
-            if completed:
-                sub_state["completed"] = True
-            sub_state["last_update"] = time.time()
-            return sub_state["stage"], sub_state["completed"]
+        reached_target = self._wait_make_party(
+            lambda board, left, cancelled: board.wait(subgroup_index, reached, left, cancelled),
+            max(1.0, float(timeout)),
+        )
+        return bool(reached_target), last_total
 
-        return self._update_make_party_state(updater)
+    def _set_make_party_stage(self, subgroup_index, stage, *, completed=False):
+        return self._make_party_board().set_stage(subgroup_index, stage, completed)
 
     def _finalize_make_party_state(self, subgroup_index):
-        def updater(state):
-            if subgroup_index not in state:
-                return False
-            sub_state = self._ensure_make_party_substate_mutable(state, subgroup_index)
-            ready_set = sub_state["ready"]
-            ready_set.discard(self._safe_party_id())
-            sub_state["last_update"] = time.time()
-            if not ready_set:
-                state.pop(subgroup_index, None)
-                return True
-            return False
-
-        return self._update_make_party_state(updater)
+        return self._make_party_board().finalize(subgroup_index, self._safe_party_id())
 
     def _update_party_completion_state(self, updater):
-        gid = self._resolve_gid(None)
-        with Player._group_var_lock:
-            group = Player._group_vars.setdefault(gid, {})
-            completion_state = group.get("_party_completion_state")
-            if not isinstance(completion_state, dict):
-                completion_state = {}
-            result = updater(completion_state)
-            group["_party_completion_state"] = completion_state
-            return result
+        return self._update_group_dict("_party_completion_state", updater)
 
     def _read_party_completion_state(self):
         gid = self._resolve_gid(None)
-        with Player._group_var_lock:
-            group = Player._group_vars.setdefault(gid, {})
-            completion_state = group.get("_party_completion_state")
-            if not isinstance(completion_state, dict):
-                return {}
-            return copy.deepcopy(completion_state)
+        completion_state = Player._group_store.get(gid, "_party_completion_state")
+        if not isinstance(completion_state, dict):
+            return {}
+        return copy.deepcopy(completion_state)
 
     def _clear_party_completion_state(self, subgroup_index=None):
         def updater(state):
@@ -1959,15 +2025,23 @@ class Player:
             )
 
     def _sync_party_roster(self):
-        """Refresh cached party information using shared group data."""
+        """Merge the ``_party_roster`` group variable into the shared roster.
+
+        Nothing is read again while neither the variable nor the roster
+        changed since the last merge of any player of the group.
+        """
 
         try:
-            roster_data = self.get_group_var("_party_roster", {})
+            roster_data, var_version = self.get_group_var_versioned("_party_roster", {})
         except RuntimeError:
             return
         except Exception:
             return
 
+        roster = self.party_roster
+        if roster.merged == (var_version, roster.version):
+            return
+
         entries = []
         if isinstance(roster_data, dict):
             for key, value in roster_data.items():
@@ -1977,105 +2051,31 @@ class Player:
             for value in roster_data:
                 if isinstance(value, dict):
                     entries.append((value.get("index"), value))
-        else:
-            return
-
-        if not entries:
-            return
-
-        party_names = list(self.partyname) if isinstance(self.partyname, list) else []
-        party_ids = list(self.partyID) if isinstance(self.partyID, list) else []
-        party_pids = list(self.partyPID) if isinstance(self.partyPID, list) else []
-
-        pid_by_slot = {}
-        for offset, pid_value in enumerate(party_pids[1:], start=0):
-            pid_int = _coerce_pid_value(pid_value)
-            if pid_int is not None:
-                pid_by_slot[offset] = pid_int
-
-        subgroup_map = getattr(self, "party_subgroups", {})
-        if not isinstance(subgroup_map, dict):
-            subgroup_map = {}
-        subgroup_members = getattr(self, "party_subgroup_members", {})
-        normalized_members = {}
-        for key, value in subgroup_members.items():
-            if isinstance(value, (list, tuple)):
-                normalized_members[key] = list(value)
-
-        names_changed = False
-        ids_changed = False
-        subgroups_changed = False
-
-        for raw_index, info in entries:
-            try:
-                slot_index = int(raw_index)
-            except (TypeError, ValueError):
-                slot_index = None
-            if slot_index is None or slot_index < 0:
-                continue
 
-            list_index = slot_index + 1
-            if list_index < 0:
-                continue
-
-            while len(party_names) <= list_index:
-                party_names.append(None)
-            while len(party_ids) <= list_index:
-                party_ids.append(None)
-
-            name_value = info.get("name") if isinstance(info, dict) else None
-            if isinstance(name_value, str) and name_value:
-                if party_names[list_index] != name_value:
-                    party_names[list_index] = name_value
-                    names_changed = True
-
-            id_value = info.get("id") if isinstance(info, dict) else None
-            try:
-                member_id = int(id_value) if id_value is not None else None
-            except (TypeError, ValueError):
-                member_id = None
-            if member_id is not None and party_ids[list_index] != member_id:
-                party_ids[list_index] = member_id
-                ids_changed = True
-
-            pid_value = pid_by_slot.get(slot_index)
-            if (
-                pid_value is not None
-                and isinstance(name_value, str)
-                and name_value
-            ):
-                subgroup_index = subgroup_map.get(pid_value)
-                if subgroup_index is not None:
-                    current_list = list(normalized_members.get(subgroup_index, []))
-                    updated = False
-                    for idx, entry in enumerate(current_list):
-                        if not isinstance(entry, (list, tuple)) or not entry:
-                            continue
-                        member_pid = _coerce_pid_value(entry[0])
-                        if member_pid == pid_value:
-                            current_name = entry[1] if len(entry) > 1 else None
-                            if current_name != name_value:
-                                current_list[idx] = (pid_value, name_value)
-                                updated = True
-                            break
-                    else:
-                        current_list.append((pid_value, name_value))
-                        updated = True
-
-                    if updated:
-                        normalized_members[subgroup_index] = current_list
-                        subgroups_changed = True
-
-        if names_changed:
-            self.partyname = party_names
-        if ids_changed:
-            self.partyID = party_ids
-        if subgroups_changed:
-            self.party_subgroup_members = normalized_members
+        if entries:
+            roster.merge_entries(entries)
+        roster.merged = (var_version, roster.version)
 
     def _get_subgroup_membership_info(self, expected_size, subgroup_index):
         self._sync_party_roster()
+        roster = self.party_roster
+        key = (
+            "membership",
+            expected_size,
+            subgroup_index,
+            getattr(self, "PIDnum", None),
+            getattr(self, "name", None),
+            roster.merged,
+        )
+        membership = roster.memo(
+            key, lambda: self._compute_subgroup_membership_info(expected_size, subgroup_index)
+        )
+        if membership is None:
+            return None
+        member_pids, member_names, position, subgroup, member_ids = membership
+        return list(member_pids), list(member_names), position, subgroup, list(member_ids)
 
+    def _compute_subgroup_membership_info(self, expected_size, subgroup_index):
         try:
             expected = int(expected_size)
         except (TypeError, ValueError):
@@ -2083,15 +2083,13 @@ class Player:
         if expected <= 0:
             return None
 
+        # copies, the roster's lists are shared with the whole group
         party_pids = getattr(self, "partyPID", [])
         party_names = getattr(self, "partyname", [])
         party_ids = getattr(self, "partyID", [])
-        if not isinstance(party_pids, list):
-            party_pids = []
-        if not isinstance(party_names, list):
-            party_names = []
-        if not isinstance(party_ids, list):
-            party_ids = []
+        party_pids = list(party_pids) if isinstance(party_pids, list) else []
+        party_names = list(party_names) if isinstance(party_names, list) else []
+        party_ids = list(party_ids) if isinstance(party_ids, list) else []
 
         if len(party_pids) <= 1 and len(party_names) > 1:
             resolved = []
@@ -2666,6 +2664,7 @@ class Player:
                     #print(f"[SEND]: {packet}")
                     if splitPacket[0] == "walk":
                         self.pos_x, self.pos_y = int(splitPacket[1]), int(splitPacket[2])
+                        self._events.publish_position()
                     for i, cond in list(enumerate(self.send_packet_conditions)):
                         try:
                             if cond[2]:
@@ -2694,19 +2693,24 @@ class Player:
                         self.id = splitPacket[6]
                         self.sp = splitPacket[15]
                     if splitPacket[0] == ("at"):
+                        at_map = int(splitPacket[2])
+                        if self._last_at is not None and self._last_at[0] != at_map:
+                            self._map_exit = (self._last_at[0], self.pos_x, self.pos_y)
                         self.pos_x, self.pos_y = int(splitPacket[3]), int(splitPacket[4])
+                        self._last_at = (at_map, self.pos_x, self.pos_y)
+                        self._events.publish_position()
                     if splitPacket[0] == ("cond"):
                         self.can_attack = bool(int(splitPacket[3]))
                         self.can_move = bool(int(splitPacket[4]))
                         self.speed = splitPacket[5]
                     if splitPacket[0] == ("c_map"):
                         if splitPacket[3] == "1":
-                            t_q = threading.Thread(target=self.queries, args=[1.5, False, False, False, True, ])
-                            t_q.start()
-                            t_mp = threading.Thread(target=self.update_map_change)
-                            t_mp.start()
+                            self._call_later(1.5, self._query_map_entities)
+                            self.update_map_change()
+                            previous_map = self.map_id
                             self.map_id = int(splitPacket[2])
-                            self.map_array = loadMap(self.map_id)
+                            self._request_map(self.map_id, previous_map)
+                            self._events.publish_map(self.map_id)
                     if splitPacket[0] == ("gold"):
                         self.gold = int(splitPacket[1])
                     if splitPacket[0] == ("lev"):
@@ -2758,6 +2762,9 @@ class Player:
                         entity_y = int(splitPacket[4])
 
                         if entity_type == 1:
+                            if str(entity_id) == str(self.id):
+                                self.pos_x, self.pos_y = entity_x, entity_y
+                                self._events.publish_position()
                             for entry in self.players[:]: 
                                 if entry['id'] == entity_id:
                                     entry["x"] = entity_x
@@ -2851,7 +2858,7 @@ class Player:
                     self.hp_percent = player_info["hp_percent"]
                     self.mp_percent = player_info["mp_percent"]
                     self.is_resting = player_info["is_resting"]
-                    self.map_array = loadMap(self.map_id)
+                    self._request_map(self.map_id)
                 if json_msg["type"] == phoenix.Type.query_inventory.value:
                     inventory = json_msg["inventory"]
                     self.equip = inventory["equip"]
@@ -2867,18 +2874,20 @@ class Player:
                     self.players = json_msg["players"]
             else:
                 time.sleep(0.003)
+        if self._workers.closed:
+            # shut down on purpose, see shutdown
+            return
         self.log(f"{self.name} lost connection")
         self.api.close()
         # purge any queued walk commands to avoid errors after disconnect
-        with self.walk_queue.mutex:
-            self.walk_queue.queue.clear()
+        self._walk_dispatcher.clear()
         # attempt to reconnect before giving up
         for delay in (1, 2, 4, 8):
             if self.stop_script:
                 break
             try:
                 self.api = phoenix.Api(self.port)
-                threading.Thread(target=self.packetlogger, daemon=True).start()
+                self._workers.spawn(self.packetlogger)
                 return
             except OSError:
                 time.sleep(delay)
@@ -2888,41 +2897,33 @@ class Player:
                 self.on_disconnect(self)
             except Exception as e:
                 self.log(f"Error in disconnect callback: {e}")
+        self.shutdown()
 
-    def _process_walk_queue(self):
-        while True:
-            func, args = self.walk_queue.get()
-            api = self.api
-            if api is None:
-                continue
+    def _dispatch_walk(self, channel, x, y):
+        # called by the walk dispatcher on the player's loop; returning False
+        # retries the target shortly, e.g. while the API reconnects
+        api = self.api
+        if api is None:
+            return True
+        if self.stop_script or (hasattr(api, "working") and not api.working()):
+            return False
+        try:
+            if channel == "pet":
+                api.pets_walk(x, y)
+            else:
+                api.player_walk(x, y)
+        except OSError as e:
+            if getattr(e, "winerror", None) != 10053:
+                self.log(f"Error executing walk command: {e}")
+        except Exception as e:
+            self.log(f"Error executing walk command: {e}")
+        return True
 
-            if self.stop_script or (hasattr(api, "working") and not api.working()):
-                # the API might report "not working" during reconnects or when the
-                # script is being reset. wait briefly so we do not drop pending
-                # walk commands, but still allow a full reset to drain the queue
-                # quickly when the script remains stopped.
-                ready = False
-                for _ in range(20):
-                    if not self.stop_script:
-                        api = self.api
-                        if api is not None and (
-                            not hasattr(api, "working") or api.working()
-                        ):
-                            ready = True
-                            break
-                    time.sleep(0.05)
-                if not ready:
-                    continue
+    def walk_dispatch_stats(self):
+        """Return counters of walk packets submitted, sent and dropped."""
+
+        return self._walk_dispatcher.stats()
 
-            try:
-                func(*args)
-            except OSError as e:
-                if getattr(e, "winerror", None) == 10053:
-                    continue
-                self.log(f"Error executing walk command: {e}")
-            except Exception as e:
-                self.log(f"Error executing walk command: {e}")
-    
     async def walk_to_point(self, point, radius=0, walk_with_pet=True, skip='auto', timeout=3, proximity=2):
         """Walk the player to ``point`` using non-blocking asyncio primitives.
 
@@ -2930,11 +2931,15 @@ class Player:
         ``y``. ``radius`` adds a random offset to the destination; if the
         resulting point is unreachable, the original coordinates are used as a
         fallback. Parameters ``walk_with_pet``, ``skip`` and ``timeout`` mirror
-        the behaviour of the old API. ``skip`` defaults to three nodes (roughly
-        four cells between waypoints) and ``timeout`` to three seconds. The
+        the behaviour of the old API. ``skip`` defaults to ``'auto'``, which
+        sends one waypoint per straight walkable segment of at most
+        ``MAX_WALK_SEGMENT`` cells; an integer caps the segment length
+        instead. ``timeout`` defaults to three seconds. The
         walk will abort if the map changes during execution. ``proximity``
         defines how close the player must be to a node before it is considered
-        reached.
+        reached. Players on the same map heading to the same ``point`` within
+        a few seconds share one cached flow field instead of searching
+        individually.
           """
 
         with self.walk_lock:
@@ -2971,38 +2976,54 @@ class Player:
         start_map = self.map_id
         loop = asyncio.get_running_loop()
         self.last_walk_failed = False
+        self.last_walk_replans = 0
+        replanner = None
+        repaired = None
+        self.walk_stats["walks"] += 1
         try:
+            await self._await_map()
             while True:
                 player_pos = [self.pos_x, self.pos_y]
-                # Random detour logic removed; proceed directly to pathfinding
-                # blocked_nodes feature removed
-                start_time = time.perf_counter()
-                Path = await loop.run_in_executor(
-                    self._path_executor,
-                    findPath,
-                    player_pos,
-                    [point[0], point[1]],
-                    self.map_array,
-                    self.map_id,
-                )
-                elapsed = time.perf_counter() - start_time
-                if Path == [] and radius > 0:
+                if repaired:
+                    Path = repaired
+                    repaired = None
+                else:
+                    # Random detour logic removed; proceed directly to pathfinding
+                    # blocked_nodes feature removed
                     start_time = time.perf_counter()
                     Path = await loop.run_in_executor(
                         self._path_executor,
-                        findPath,
+                        findSharedPath,
+                        id(self),
                         player_pos,
-                        target,
+                        [point[0], point[1]],
                         self.map_array,
                         self.map_id,
+                        target,
+                        find_path_offloaded,
                     )
                     elapsed = time.perf_counter() - start_time
-                    point = target
-                if Path == []:
-                    self.last_walk_failed = True
-                    self.log("Failed to find a path")
-                    break
-                self.log(f"Path found in {elapsed:.3f} seconds")
+                    if Path == [] and radius > 0:
+                        start_time = time.perf_counter()
+                        Path = await loop.run_in_executor(
+                            self._path_executor,
+                            findSharedPath,
+                            id(self),
+                            player_pos,
+                            target,
+                            self.map_array,
+                            self.map_id,
+                            None,
+                            find_path_offloaded,
+                        )
+                        elapsed = time.perf_counter() - start_time
+                        point = target
+                    if Path == []:
+                        self.last_walk_failed = True
+                        self.log("Failed to find a path")
+                        break
+                    self.log(f"Path found in {elapsed:.3f} seconds")
+                    replanner = None
                 # Random detour logic removed
                 if False:
                     sx, sy = int(player_pos[0]), int(player_pos[1])
@@ -3024,7 +3045,12 @@ class Player:
                             continue
                         tx, ty = sx + ox, sy + oy
                         dpath = await loop.run_in_executor(
-                            self._path_executor, findPath, [sx, sy], [tx, ty], self.map_array, self.map_id
+                            self._path_executor,
+                            find_path_offloaded,
+                            [sx, sy],
+                            [tx, ty],
+                            self.map_array,
+                            self.map_id,
                         )
                         if dpath:
                             # compress detour path to turning points
@@ -3053,10 +3079,7 @@ class Player:
                             for wx, wy in dway:
                                 if self.stop_script or self.map_id != start_map:
                                     return
-                                with self.walk_lock:
-                                    self.walk_queue.put((api.player_walk, (wx, wy)))
-                                    if walk_with_pet:
-                                        self.walk_queue.put((api.pets_walk, (wx, wy)))
+                                self._send_walk(wx, wy, walk_with_pet)
                                 startTimer = time.time()
                                 resend = max(0.5, timeout / 3)
                                 deadline = startTimer + timeout * 4
@@ -3072,65 +3095,38 @@ class Player:
                                     if self.stop_script:
                                         raise SystemExit
                                     if now - last_send >= resend:
-                                        with self.walk_lock:
-                                            self.walk_queue.put((api.player_walk, (wx, wy)))
-                                            if walk_with_pet:
-                                                self.walk_queue.put((api.pets_walk, (wx, wy)))
+                                        self._send_walk(wx, wy, walk_with_pet)
                                         last_send = now
                                     await asyncio.sleep(0.05)
                             found_detour = True
                             break
                     # Random detour logic removed
-                # Build waypoints: if skip is 'auto' or <= 0, compress path into turning points to minimize nodes.
-                def _sign(v):
-                    return -1 if v < 0 else (1 if v > 0 else 0)
-                # Extract coordinates from Path in a uniform way
-                coords = []
-                for n in Path:
-                    if hasattr(n, "x") and hasattr(n, "y"):
-                        coords.append((int(n.x), int(n.y)))
-                    else:
-                        coords.append((int(n[0]), int(n[1])))
+                # Build waypoints: string-pull the path into straight walkable
+                # segments. 'auto' (or <= 0) uses the server walk limit, an
+                # integer ``skip`` caps each segment at that many cells.
                 auto = (isinstance(skip, str) and skip.lower() == 'auto') or (isinstance(skip, int) and skip <= 0)
-                waypoints = []
-                if coords:
-                    prev = coords[0]
-                    last_dir = None
-                    for cur in coords[1:]:
-                        d = (_sign(cur[0] - prev[0]), _sign(cur[1] - prev[1]))
-                        if last_dir is None:
-                            last_dir = d
-                        elif d != last_dir:
-                            waypoints.append(prev)
-                            last_dir = d
-                        prev = cur
-                    # always end at destination
-                    waypoints.append(coords[-1])
-                effective_skip = 1 if auto else max(1, int(skip))
-                lastpath = len(waypoints if auto else Path) - 1
+                max_segment = MAX_WALK_SEGMENT if auto else max(1, int(skip))
+                waypoints = await loop.run_in_executor(
+                    self._path_executor, smooth_path, Path, self.map_array, max_segment
+                )
                 success = True
-                seq = (waypoints if auto else Path)
-                for i in range(0, len(seq), effective_skip):
+                for x, y in waypoints:
                     if self.stop_script or self.map_id != start_map:
                         return
-                    node = seq[i]
-                    if hasattr(node, "x") and hasattr(node, "y"):
-                        x, y = node.x, node.y
-                    else:
-                        x, y = node[0], node[1]
 
-                    with self.walk_lock:
-                        self.walk_queue.put((api.player_walk, (x, y)))
-                        if walk_with_pet:
-                            self.walk_queue.put((api.pets_walk, (x, y)))
+                    self._send_walk(x, y, walk_with_pet)
+                    self.walk_stats["waypoints"] += 1
                     startTimer = time.time()
                     resend = max(0.5, timeout / 3)
                     deadline = startTimer + timeout * 4
                     last_send = startTimer
+
+                    def arrived():
+                        return math.hypot(self.pos_x - x, self.pos_y - y) <= proximity
                     while True:
                         if self.map_id != start_map:
                             return
-                        if math.hypot(self.pos_x - x, self.pos_y - y) <= proximity:
+                        if arrived():
                             break
                         now = time.time()
                         if now >= deadline:
@@ -3139,28 +3135,38 @@ class Player:
                         if self.stop_script:
                             raise SystemExit
                         if now - last_send >= resend:
-                            with self.walk_lock:
-                                self.walk_queue.put((api.player_walk, (x, y)))
-                                if walk_with_pet:
-                                    self.walk_queue.put((api.pets_walk, (x, y)))
+                            self._send_walk(x, y, walk_with_pet)
                             last_send = now
-                        await asyncio.sleep(0.05)
+                        # woken by position packets, a map change or the next resend
+                        await self._events.wait_for(
+                            arrived, min(deadline, last_send + resend) - time.time()
+                        )
                     if not success:
                         break
                 if success:
-                    last_node = (waypoints if (isinstance(skip, str) and skip.lower() == 'auto') or (isinstance(skip, int) and skip <= 0) else Path)[lastpath]
-                    if hasattr(last_node, "x") and hasattr(last_node, "y"):
-                        last_x, last_y = last_node.x, last_node.y
-                    else:
-                        last_x, last_y = last_node[0], last_node[1]
-                    with self.walk_lock:
-                        self.walk_queue.put((api.player_walk, (last_x, last_y)))
-                        if walk_with_pet:
-                            self.walk_queue.put((api.pets_walk, (last_x, last_y)))
+                    last_x, last_y = waypoints[-1]
+                    self._send_walk(last_x, last_y, walk_with_pet)
                     self.last_walk_failed = False
                     break
                 else:
                     await asyncio.sleep(resend)
+                    if not self.map_array:
+                        continue
+                    # repair the stalled stretch instead of searching again
+                    if replanner is None:
+                        replanner = LocalReplanner(self.map_array, Path)
+                    start_time = time.perf_counter()
+                    repaired = await loop.run_in_executor(
+                        self._path_executor, replanner.repair, (self.pos_x, self.pos_y), (x, y)
+                    )
+                    elapsed = time.perf_counter() - start_time
+                    self.last_walk_replans += 1
+                    self.walk_stats["replans"] += 1
+                    self.walk_stats["replan_time"] += elapsed
+                    if repaired:
+                        self.log(f"Path repaired in {elapsed:.3f} seconds")
+                    else:
+                        replanner = None
                     continue
         except Exception as e:
             self.last_walk_failed = True
@@ -3172,8 +3178,285 @@ class Player:
                     self._last_periodic_walk[cond] = time.time()
 
 
-    async def walk_and_switch_map(self, point, walk_with_pet=True, skip=3, timeout=3):
-        """Walk to ``point`` and wait for a map change using asyncio."""
+    async def _learn_portal(self, start_map, cell, timeout=2):
+        # the arrival cell comes with the ``at`` packet of the new map
+        def landed():
+            last_at = self._last_at
+            return self.map_id != start_map and last_at is not None and last_at[0] == self.map_id
+        deadline = time.time() + timeout
+        while not landed():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            await self._events.wait_for(landed, remaining)
+        # the portal is where the player stood last on the old map; the
+        # walked-to cell is only used when that position is unknown
+        map_exit = self._map_exit
+        if map_exit is not None and map_exit[0] == start_map:
+            cell = map_exit[1:]
+        get_portal_graph().add(start_map, cell, self.map_id, self._last_at[1:])
+
+    async def walk_route(self, to_map, point=None, walk_with_pet=True):
+        """Walk to ``point`` on map ``to_map`` through known portals.
+
+        The route is planned over :mod:`routeplanner`'s portal graph. While a
+        leg is walked, the next map is loaded and the path of the next leg is
+        searched in the background so it is ready on arrival. Without
+        ``point`` the walk ends when ``to_map`` is reached. Returns ``True``
+        on success.
+        """
+
+        loop = asyncio.get_running_loop()
+        to_map = int(to_map)
+        self.last_walk_failed = False
+        await self._await_map()
+        legs = await loop.run_in_executor(
+            None,
+            get_portal_graph().route,
+            int(self.map_id),
+            (self.pos_x, self.pos_y),
+            to_map,
+            point,
+        )
+        if not legs and int(self.map_id) != to_map:
+            self.log(f"No known route to map {to_map}")
+            self.last_walk_failed = True
+            return False
+        prefetches = []
+        try:
+            for i, (map_id, cell, target, arrival) in enumerate(legs):
+                if self.stop_script:
+                    raise SystemExit
+                if int(self.map_id) != map_id:
+                    self.log(f"Left the planned route on map {self.map_id}")
+                    self.last_walk_failed = True
+                    return False
+                if i + 1 < len(legs):
+                    next_map, next_cell = legs[i + 1][0], legs[i + 1][1]
+                    load_map_async(next_map)
+                    # searched on the path service: the search of the next leg
+                    # joins it when it starts before the prefetch finished
+                    prefetches.append(loop.run_in_executor(
+                        self._path_executor, find_path_offloaded, arrival, next_cell, None, next_map
+                    ))
+                if target is None:
+                    await self.walk_to_point(cell, walk_with_pet=walk_with_pet)
+                    if self.last_walk_failed:
+                        return False
+                else:
+                    await self.walk_and_switch_map(cell, walk_with_pet)
+                    if int(self.map_id) != target:
+                        self.log(f"Portal at {cell} did not lead to map {target}")
+                        self.last_walk_failed = True
+                        return False
+            return True
+        finally:
+            for prefetch in prefetches:
+                if not prefetch.done():
+                    prefetch.cancel()
+                elif not prefetch.cancelled():
+                    # a failed prefetch only means the leg searches on its own
+                    prefetch.exception()
+
+    async def walk_group(self, point, formation=DEFAULT_FORMATION, spacing=DEFAULT_SPACING,
+                         walk_with_pet=True, timeout=3, proximity=2):
+        """Walk the whole group to ``point`` in ``formation``.
+
+        Every member of the group calls this with the same ``point``. The
+        leader searches one path and walks it; members follow the leader's
+        waypoints at their formation slot (see :mod:`formation`) instead of
+        searching their own, and the leader waits for members that fall more
+        than ``MAX_LAG`` waypoints behind. If the leader does not start the
+        walk within ``PLAN_WAIT`` seconds, the first member to call leads it.
+        ``formation`` is one of ``"column"``, ``"line"``, ``"wedge"`` or
+        ``"block"`` and ``spacing`` the distance between members in cells.
+        Returns ``True`` once this player reached its place.
+        """
+
+        if hasattr(point, "x") and hasattr(point, "y"):
+            point = [point.x, point.y]
+        point = [int(point[0]), int(point[1])]
+        me = id(self)
+        start_map = self.map_id
+        self.last_walk_failed = False
+        self.walk_stats["walks"] += 1
+        await self._await_map()
+        gid, key, move = self._group_move(point, formation, spacing)
+        ok = False
+        try:
+            if not self._leads_group():
+                # give the leader a moment to publish the group's path
+                await move.wait_for(lambda: move.leader is not None, PLAN_WAIT)
+            if move.claim(me):
+                ok = await self._lead_group_move(
+                    move, point, start_map, walk_with_pet, timeout, proximity
+                )
+            else:
+                ok = await self._follow_group_move(
+                    move, start_map, walk_with_pet, timeout, proximity
+                )
+        except Exception as e:
+            self.log(f"Error in walk_group: {e}")
+        finally:
+            self.last_walk_failed = not ok
+            if move.leader == me and not move.finished:
+                move.finish(failed=True)
+            self._drop_group_move(gid, key, move)
+        return ok
+
+    def _leads_group(self):
+        try:
+            return not self.leaderID or int(self.id) == int(self.leaderID)
+        except (TypeError, ValueError):
+            return True
+
+    def _group_move(self, point, formation, spacing):
+        # one GroupMove per map and destination, kept in the group's shared state
+        gid = self._resolve_gid(None)
+        key = (self.map_id, tuple(point))
+        move = None
+
+        def claim(moves):
+            nonlocal move
+            move = moves.get(key)
+            if move is not None and not move.finished:
+                return moves
+            move = GroupMove(self.map_id, point, formation, spacing)
+            return {**moves, key: move}
+
+        Player._runtime_store.update(gid, "_group_moves", claim, {})
+        return gid, key, move
+
+    def _drop_group_move(self, gid, key, move):
+        if move.leave(id(self)):
+            return
+
+        def release(moves):
+            if moves.get(key) is not move:
+                return moves
+            return {k: v for k, v in moves.items() if k != key}
+
+        Player._runtime_store.update(gid, "_group_moves", release, {})
+
+    async def _lead_group_move(self, move, point, start_map, walk_with_pet, timeout, proximity):
+        loop = asyncio.get_running_loop()
+        origin = [self.pos_x, self.pos_y]
+        start_time = time.perf_counter()
+        path = await loop.run_in_executor(
+            self._path_executor, find_path_offloaded, origin, point, self.map_array, self.map_id
+        )
+        move.searches += 1
+        waypoints = []
+        if path:
+            waypoints = await loop.run_in_executor(
+                self._path_executor, smooth_path, path, self.map_array
+            )
+        move.publish(origin, waypoints)
+        if not waypoints:
+            self.log("Failed to find a path")
+            return False
+        self.log(f"Group path found in {time.perf_counter() - start_time:.3f} seconds")
+        for index, (x, y) in enumerate(waypoints):
+            # let the slowest member catch up before getting further ahead
+            await move.wait_for(lambda: move.slowest() >= index - 1 - MAX_LAG, timeout * 4)
+            move.advance(index)
+            if not await self._walk_leg(x, y, start_map, walk_with_pet, timeout, proximity):
+                return False
+        await move.wait_for(lambda: move.slowest() >= len(waypoints) - 1, timeout * 4)
+        move.finish()
+        return True
+
+    async def _follow_group_move(self, move, start_map, walk_with_pet, timeout, proximity):
+        loop = asyncio.get_running_loop()
+        me = id(self)
+        slot = move.join(me)
+        if not await move.wait_for(lambda: move.waypoints is not None, timeout * 4):
+            self.log("The group leader did not start the walk")
+            return False
+        if move.failed:
+            return False
+        legs = await loop.run_in_executor(
+            self._path_executor,
+            follow_waypoints,
+            move.waypoints,
+            (self.pos_x, self.pos_y),
+            move.offset(slot),
+            self.map_array,
+            move.origin,
+        )
+        if not legs[0]:
+            # not in sight of the group's path yet, find the way to it once
+            path = await loop.run_in_executor(
+                self._path_executor,
+                find_path_offloaded,
+                [self.pos_x, self.pos_y],
+                list(move.waypoints[0]),
+                self.map_array,
+                self.map_id,
+            )
+            move.searches += 1
+            if not path:
+                self.log("Failed to find a path to the group")
+                return False
+            legs[0] = await loop.run_in_executor(
+                self._path_executor, smooth_path, path, self.map_array
+            )
+        for index, cells in enumerate(legs):
+            # woken by the leader's progress instead of polling it
+            await move.wait_for(lambda: move.progress >= index or move.finished, timeout * 8)
+            if move.failed or move.progress < index:
+                return False
+            for x, y in cells:
+                if not await self._walk_leg(x, y, start_map, walk_with_pet, timeout, proximity):
+                    return False
+            move.report(me, index)
+        return True
+
+    async def _walk_leg(self, x, y, start_map, walk_with_pet, timeout, proximity):
+        # walk to one waypoint, resending until it is reached or times out
+        self._send_walk(x, y, walk_with_pet)
+        self.walk_stats["waypoints"] += 1
+        resend = max(0.5, timeout / 3)
+        last_send = time.time()
+        deadline = last_send + timeout * 4
+
+        def arrived():
+            return math.hypot(self.pos_x - x, self.pos_y - y) <= proximity
+        while not arrived():
+            if self.stop_script:
+                raise SystemExit
+            if self.map_id != start_map:
+                return False
+            now = time.time()
+            if now >= deadline:
+                return False
+            if now - last_send >= resend:
+                self._send_walk(x, y, walk_with_pet)
+                last_send = now
+            await self._events.wait_for(
+                arrived, min(deadline, last_send + resend) - time.time()
+            )
+        return True
+
+    def _send_walk(self, x, y, walk_with_pet=True):
+        """Submit a walk to ``(x, y)`` for the player and its pets.
+
+        A target that was not sent yet is replaced, see :mod:`walkdispatch`.
+        """
+
+        with self.walk_lock:
+            self._walk_dispatcher.submit("player", x, y)
+            self.walk_stats["packets"] += 1
+            if walk_with_pet:
+                self._walk_dispatcher.submit("pet", x, y)
+                self.walk_stats["packets"] += 1
+
+    async def walk_and_switch_map(self, point, walk_with_pet=True, skip='auto', timeout=3):
+        """Walk to ``point`` and wait for a map change using asyncio.
+
+        The path is reduced with :func:`path.smooth_path` like in
+        ``walk_to_point``; ``skip`` caps the segment length in cells.
+        """
 
         # Normalise ``point`` just like in ``walk_to_point``
         if hasattr(point, "x") and hasattr(point, "y"):
@@ -3183,38 +3466,45 @@ class Player:
         else:
             raise TypeError("point must be a sequence or expose 'x' and 'y'")
 
-        player_pos = [self.pos_x, self.pos_y]
-        api = self.api
         loop = asyncio.get_running_loop()
+        start_map = self.map_id
+        generation = self._events.map_generation
         try:
+            await self._await_map()
+            player_pos = [self.pos_x, self.pos_y]
             Path = await loop.run_in_executor(
                 self._path_executor,
-                findPath,
+                find_path_offloaded,
                 player_pos,
                 [point[0], point[1]],
                 self.map_array,
                 self.map_id,
             )
             if Path:
-                for i in range(skip, len(Path), skip):
+                auto = (isinstance(skip, str) and skip.lower() == 'auto') or (isinstance(skip, int) and skip <= 0)
+                max_segment = MAX_WALK_SEGMENT if auto else max(1, int(skip))
+                waypoints = await loop.run_in_executor(
+                    self._path_executor, smooth_path, Path, self.map_array, max_segment
+                )
+                self.walk_stats["walks"] += 1
+                for x, y in waypoints:
                     if self.stop_script:
                         raise SystemExit
-                    node = Path[i]
-                    if hasattr(node, "x") and hasattr(node, "y"):
-                        x, y = node.x, node.y
-                    else:
-                        x, y = node[0], node[1]
+                    if self._events.map_generation != generation:
+                        # a portal on the way already switched the map
+                        break
 
-                    with self.walk_lock:
-                        self.walk_queue.put((api.player_walk, (x, y)))
-                        if walk_with_pet:
-                            self.walk_queue.put((api.pets_walk, (x, y)))
+                    self._send_walk(x, y, walk_with_pet)
+                    self.walk_stats["waypoints"] += 1
                     startTimer = time.time()
                     resend = max(0.5, timeout / 3)
                     deadline = startTimer + timeout * 4
                     last_send = startTimer
+
+                    def arrived():
+                        return abs(self.pos_x - x) <= 1 and abs(self.pos_y - y) <= 1
                     while True:
-                        if abs(self.pos_x - x) <= 1 and abs(self.pos_y - y) <= 1:
+                        if arrived() or self._events.map_generation != generation:
                             break
                         now = time.time()
                         if now >= deadline:
@@ -3222,34 +3512,26 @@ class Player:
                         if self.stop_script:
                             raise SystemExit
                         if now - last_send >= resend:
-                            with self.walk_lock:
-                                self.walk_queue.put((api.player_walk, (x, y)))
-                                if walk_with_pet:
-                                    self.walk_queue.put((api.pets_walk, (x, y)))
+                            self._send_walk(x, y, walk_with_pet)
                             last_send = now
-                        await asyncio.sleep(0.05)
+                        await self._events.wait_for(
+                            arrived, min(deadline, last_send + resend) - time.time()
+                        )
                 start = time.time()
-                while not self.map_changed and time.time() - start < 10:
+                base_x, base_y = waypoints[-1]
+                changed = self._events.map_generation != generation
+                while not changed and time.time() - start < 10:
+                    if self.stop_script:
+                        raise SystemExit
                     random_x = random.choice([-1, 1, 0])
                     random_y = random.choice([-1, 1, 0])
-                    last_node = Path[lastpath]
-                    if hasattr(last_node, "x") and hasattr(last_node, "y"):
-                        base_x, base_y = last_node.x, last_node.y
-                    else:
-                        base_x, base_y = last_node[0], last_node[1]
-
-                    with self.walk_lock:
-                        self.walk_queue.put((api.player_walk, (base_x + random_x, base_y + random_y)))
-                        if walk_with_pet:
-                            self.walk_queue.put((api.pets_walk, (base_x + random_x, base_y + random_y)))
-                    for _ in range(50):
-                        await asyncio.sleep(0.1)
-                        if self.map_changed:
-                            break
-                if not self.map_changed:
+                    self._send_walk(base_x + random_x, base_y + random_y, walk_with_pet)
+                    changed = await self._events.wait_map_change(generation, 5)
+                if not changed:
                     self.log("timeout waiting for map change")
                 else:
                     self.log("reached new map")
+                    await self._learn_portal(start_map, point)
             else:
                 self.log("Failed to find a path")
         except Exception as e:
@@ -3317,16 +3599,154 @@ class Player:
     def put_item_in_trade(self, items, gold=0):
         return self.put_items_in_trade(items, gold=gold)
 
+    def _request_map(self, map_id, previous=None):
+        """Load ``map_id`` in the background and publish it as ``map_array``.
+
+        The packet thread returns immediately; walking helpers wait for the
+        load through :meth:`_await_map` or :meth:`wait_for_map`.
+        """
+
+        future = self._map_future
+        if map_id == self._map_future_id and future is not None:
+            if not future.done() or self.map_array:
+                return
+        self.map_array = []
+        self._map_future_id = map_id
+        self._map_future = load_map_async(map_id, previous)
+        self._map_future.add_done_callback(lambda f, mid=map_id: self._map_loaded(mid, f))
+
+    def _map_loaded(self, map_id, future):
+        if map_id != self._map_future_id:
+            return
+        try:
+            self.map_array = future.result()
+        except Exception as e:
+            self.log(f"Error loading map {map_id}: {e}")
+
+    def wait_for_map(self, timeout=10):
+        """Block until the current map is loaded and return ``map_array``."""
+
+        future = self._map_future
+        if future is not None and not future.done():
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        return self.map_array
+
+    async def _await_map(self, timeout=10):
+        future = self._map_future
+        if future is None or future.done():
+            return
+        try:
+            # shield so a timeout here does not cancel the shared load
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except Exception as e:
+            self.log(f"Map {self.map_id} not loaded yet: {e}")
+
+    @property
+    def map_changed(self):
+        """``True`` for half a second after a map change."""
+
+        return time.monotonic() < self._map_changed_until
+
+    @map_changed.setter
+    def map_changed(self, value):
+        self._map_changed_until = float("inf") if value else 0.0
+
     def update_map_change(self):
-        self.map_changed = True
-        time.sleep(0.5)
-        self.map_changed = False
+        self._map_changed_until = time.monotonic() + 0.5
+
+    def _call_later(self, delay, callback, *args):
+        """Run ``callback(*args)`` on the player's loop after ``delay`` seconds."""
+
+        loop = self._ensure_loop()
+        try:
+            loop.call_soon_threadsafe(loop.call_later, delay, callback, *args)
+        except RuntimeError:
+            # the loop was closed by shutdown
+            pass
+
+    def _query_map_entities(self):
+        api = self.api
+        if api is None:
+            return
+        try:
+            api.query_map_entities()
+        except Exception as e:
+            self.log(f"Error querying map entities: {e}")
+
+    def worker_stats(self):
+        """Return the live threads, pooled futures and loop tasks of this player."""
+
+        stats = self._workers.stats(self.loop)
+        loop_thread = self._loop_thread
+        stats["loop"] = bool(loop_thread is not None and loop_thread.is_alive())
+        if stats["loop"]:
+            stats["threads"] += 1
+        return stats
+
+    def shutdown(self, timeout=None):
+        """Stop every thread, task and pooled job of this player.
+
+        Called once the client is gone for good. The loop is stopped and
+        closed; :meth:`start_condition_loop` starts a new one if the player
+        is used again. Returns the threads still running after ``timeout``
+        seconds.
+        """
+
+        self.stop_script = True
+        self._workers.stop()
+        self._cancel_group_watches()
+        self._walk_dispatcher.clear()
+        api = self.api
+        if api is not None:
+            try:
+                api.close()
+            except Exception:
+                pass
+
+        loop = self.loop
+        loop_thread = self._loop_thread
+
+        def _stop_loop():
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.stop()
+
+        if loop_thread is not None and loop_thread.is_alive():
+            try:
+                loop.call_soon_threadsafe(_stop_loop)
+            except RuntimeError:
+                pass
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        alive = self._workers.close(extra=[loop_thread], **kwargs)
+        if loop_thread not in alive and not loop.is_running() and not loop.is_closed():
+            loop.close()
+        if alive:
+            self.log(
+                f"{self.name}: {len(alive)} thread(s) still running after shutdown: "
+                + ", ".join(thread.name for thread in alive)
+            )
+        return alive
+
+    # the helpers below wait for a map that is still loading after a map
+    # change; they return None when no walkable cell is found
 
     def find_field(self, a, b, a_angle, b_angle):
-        return calculate_field_location([int(a[0]), int(a[1])], [int(b[0]), int(b[1])], float(a_angle), float(b_angle), self.map_array)
+        map_array = self.wait_for_map()
+        return calculate_field_location([int(a[0]), int(a[1])], [int(b[0]), int(b[1])], float(a_angle), float(b_angle), map_array)
         
+    def find_field_fused(self, readings):
+        """Fuse ``(x, y, angle)`` rod readings, e.g. collected from the whole
+        group in ``selfgroup``, into ``(x, y, confidence)`` or ``None``."""
+        return calculate_fused_field_location(
+            [(int(r[0]), int(r[1]), float(r[2])) + tuple(r[3:]) for r in readings],
+            self.wait_for_map(),
+        )
+
     def find_point_b(self, x, y, angle, offset = 20):
-        return calculate_point_B_position(int(x), int(y), float(angle), self.map_array, offset)
+        return calculate_point_B_position(int(x), int(y), float(angle), self.wait_for_map(), offset)
 
     def randomize_delay(self, min_val, max_val, decimals=1000):
         if min_val <= 0 and max_val <= 0:
@@ -3347,6 +3767,15 @@ class Player:
         try:
             sx, sy = (int(self.pos_x), int(self.pos_y)) if from_pos is None else (int(from_pos[0]), int(from_pos[1]))
             dx, dy = int(x), int(y)
+            self.wait_for_map()
+            service = get_path_service()
+            if service is not None and self.map_id is not None:
+                try:
+                    future = service.can_reach(int(self.map_id), (sx, sy), (dx, dy))
+                    return future.result(PATH_SERVICE_TIMEOUT)
+                except Exception as e:
+                    self.log(f"Path service failed, searching locally: {e}")
+            # without the service, or when it failed, search in this thread
             if self.map_array not in (None, []):
                 path = findPath([sx, sy], [dx, dy], mapArray=self.map_array)
             else:
@@ -3502,6 +3931,14 @@ class Player:
         tree = ast.parse(script, mode="exec")
 
         class AwaitTransformer(ast.NodeTransformer):
+            def visit_Await(self, node):
+                # already awaited by the script, do not await twice
+                if isinstance(node.value, ast.Call):
+                    self.generic_visit(node.value)
+                else:
+                    self.generic_visit(node)
+                return node
+
             def visit_Call(self, node):
                 self.generic_visit(node)
                 if (
@@ -3524,6 +3961,19 @@ class Player:
                     if node.func.value.id == "self" and node.func.attr in {
                         "walk_to_point",
                         "walk_and_switch_map",
+                        "walk_route",
+                        "walk_group",
+                        "wait_group_var",
+                        "wait_subgroup_var",
+                        "group_barrier",
+                        "subgroup_rendezvous",
+                    }:
+                        return ast.Await(value=node)
+                    if (node.func.value.id, node.func.attr) in {
+                        ("selfgroup", "wait_for"),
+                        ("selfsubg", "wait_for"),
+                        ("selfgroup", "barrier"),
+                        ("selfsubg", "rendezvous"),
                     }:
                         return ast.Await(value=node)
                     # Offload known blocking Player methods to a thread so
@@ -3735,20 +4185,14 @@ class Player:
         except (TypeError, ValueError):
             current_group = 0
         if current_group > 0:
-            with Player._subgroup_var_lock:
-                Player._subgroup_vars.pop(current_group, None)
-        for i in range(1, 100):
-            setattr(self, f'attr{i}', 0)
+            Player._drop_subgroup_vars(current_group)
+        self.reset_registers(99)
         self.leadername = ""
         self.leaderID = 0
-        self.partyname = []
-        self.partyID = []
-        self.partyPID = []
+        # a roster of its own, the old one stays with the group
+        self.party_roster = PartyRoster()
         self.subgroup_index = None
         self.subgroup_member_limit = 0
-        self.party_subgroups = {}
-        self.party_subgroup_order = {}
-        self.party_subgroup_members = {}
 
         self.clear_group_script_state()
 
@@ -3756,6 +4200,7 @@ class Player:
         """Stop scripts, cancel condition tasks and clear shared state."""
 
         self.stop_script = True
+        self._cancel_group_watches()
         self.script_loaded = False
         self.clear_group_console_buffer()
 
@@ -3827,19 +4272,10 @@ class Player:
             # nothing was ever set for this context
             pass
 
-        try:
-            while True:
-                self.walk_queue.get_nowait()
-        except Empty:
-            pass
+        self._walk_dispatcher.clear()
 
-        executor = getattr(self, "_cond_executor", None)
-        if executor:
-            try:
-                executor.shutdown(wait=False, cancel_futures=True)
-            except Exception:
-                pass
-            self._cond_executor = ThreadPoolExecutor(max_workers=4)
+        # path searches queued for the old scripts
+        self._workers.cancel_pending()
 
         gid = None
         if getattr(self, "leaderID", 0):
@@ -3847,19 +4283,21 @@ class Player:
         elif getattr(self, "_current_gid", None) is not None:
             gid = self._current_gid
         if gid is not None:
-            with Player._group_var_lock:
-                Player._group_vars.pop(gid, None)
+            Player._group_store.drop(gid)
+            Player._runtime_store.drop(gid)
         current_group = getattr(self, "attr19", 0)
         try:
             current_group = int(current_group)
         except (TypeError, ValueError):
             current_group = 0
         if current_group > 0:
-            with Player._subgroup_var_lock:
-                Player._subgroup_vars.pop(current_group, None)
+            Player._drop_subgroup_vars(current_group)
         self._current_gid = self._unique_group_id
         self.subgroup_index = None
         self.subgroup_member_limit = 0
+        if Player._snapshots is not None:
+            # a group that was stopped on purpose is not resumed
+            Player._snapshots.forget(self.name)
 
         self.clear_group_script_state()
 
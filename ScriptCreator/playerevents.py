@@ -0,0 +1,99 @@
+"""Position and map-change notifications for coroutines on a player's loop.
+
+The packet thread calls :meth:`PlayerEvents.publish_position` and
+:meth:`PlayerEvents.publish_map`; coroutines running on the player's asyncio
+loop await :meth:`PlayerEvents.wait_for` or :meth:`PlayerEvents.wait_map_change`
+instead of polling ``pos_x``/``pos_y`` and ``map_changed``. Waiters are only
+touched on the loop thread, the packet thread hands events over with
+``call_soon_threadsafe``.
+"""
+
+import asyncio
+import threading
+
+
+class PlayerEvents:
+    """Wake waiters of one player when its position or map changes."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._waiters = []
+        self._lock = threading.Lock()
+        self.map_generation = 0
+        self.map_id = None
+
+    def rebind(self, loop):
+        """Use ``loop`` after the player's loop was recreated."""
+
+        self.loop = loop
+        self._waiters = []
+
+    def publish_position(self):
+        """Called from the packet thread after the position was updated."""
+
+        if self._waiters:
+            self._schedule(False)
+
+    def publish_map(self, map_id):
+        """Called from the packet thread on ``c_map``."""
+
+        with self._lock:
+            self.map_generation += 1
+            self.map_id = map_id
+        self._schedule(True)
+
+    def _schedule(self, map_changed):
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, map_changed)
+        except RuntimeError:
+            # loop already closed, the player is shutting down
+            pass
+
+    def _dispatch(self, map_changed=False):
+        remaining = []
+        for predicate, future in self._waiters:
+            if future.done():
+                continue
+            try:
+                ready = predicate()
+            except Exception:
+                ready = False
+            if ready or map_changed:
+                future.set_result(ready)
+            else:
+                remaining.append((predicate, future))
+        self._waiters = remaining
+
+    async def wait_for(self, predicate, timeout=None):
+        """Wait until ``predicate()`` holds after a position update.
+
+        Also returns early, with ``False``, when the map changes, and after
+        ``timeout`` seconds. Must be awaited on the player's loop.
+        """
+
+        if predicate():
+            return True
+        if asyncio.get_running_loop() is not self.loop:
+            # awaited from a foreign loop: fall back to a short poll
+            await asyncio.sleep(0.05 if timeout is None else min(timeout, 0.05))
+            return predicate()
+        future = self.loop.create_future()
+        self._waiters.append((predicate, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return predicate()
+        finally:
+            if not future.done():
+                future.cancel()
+            self._waiters = [w for w in self._waiters if w[1] is not future]
+
+    async def wait_map_change(self, since, timeout=None):
+        """Wait until the map generation moves past ``since``.
+
+        ``since`` is a ``map_generation`` value read before starting the
+        action that should change the map, so a ``c_map`` that arrives
+        before this call is still seen.
+        """
+
+        return await self.wait_for(lambda: self.map_generation > since, timeout)
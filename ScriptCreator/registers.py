@@ -0,0 +1,97 @@
+"""Scratch registers ``attr1``..``attr100`` that scripts use as they like.
+
+``Player`` used to create them as 100 instance attributes: 49 ints and 50
+empty lists per player, most of them never touched, all in the instance
+dict. :class:`Registers` declares them as slots instead, so they take one
+pointer each inside the object. The int registers read as fast as before.
+The list registers get their empty list the first time they are read; they
+go through a descriptor for that, which makes their reads a few times slower
+(still well under a microsecond).
+
+No ``__getattr__`` is used for that: it would take the attribute lookups of
+the whole class off the interpreter's fast path.
+"""
+
+ATTR_COUNT = 100
+# attr1..attr50 start as 0, attr51..attr100 as empty lists
+FIRST_LIST = 51
+
+NAMES = tuple(f"attr{index}" for index in range(1, ATTR_COUNT + 1))
+_INT_NAMES = NAMES[: FIRST_LIST - 1]
+_LIST_NAMES = NAMES[FIRST_LIST - 1 :]
+# a list register that was never read or written
+_UNSET = object()
+
+
+def default(index):
+    """Return a fresh initial value of register ``index``."""
+
+    return [] if index >= FIRST_LIST else 0
+
+
+class _ListRegister:
+    """A list register stored in the slot ``_attrN``, created on first read."""
+
+    __slots__ = ("slot",)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return self.slot.__get__(obj, objtype)
+        except AttributeError:
+            value = []
+            self.slot.__set__(obj, value)
+            return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+    def peek(self, obj):
+        """Return the stored value without creating the list."""
+
+        try:
+            return self.slot.__get__(obj, type(obj))
+        except AttributeError:
+            return _UNSET
+
+
+class Registers:
+    """``attr1``..``attr100`` stored in slots."""
+
+    __slots__ = _INT_NAMES + tuple(f"_{name}" for name in _LIST_NAMES)
+
+    def __init__(self):
+        for name in _INT_NAMES:
+            setattr(self, name, 0)
+
+    def reset_registers(self, stop=ATTR_COUNT):
+        """Set ``attr1`` through ``attr{stop}`` to 0."""
+
+        for name in NAMES[:stop]:
+            setattr(self, name, 0)
+
+    def changed_registers(self):
+        """Return ``{"attrN": value}`` of the registers not at their initial value."""
+
+        changed = {}
+        for name in _INT_NAMES:
+            value = getattr(self, name)
+            if not (type(value) is int and value == 0):
+                changed[name] = value
+        for name in _LIST_NAMES:
+            value = _LIST_REGISTERS[name].peek(self)
+            if value is _UNSET or (type(value) is list and not value):
+                continue
+            changed[name] = value
+        return changed
+
+
+_LIST_REGISTERS = {}
+for _name in _LIST_NAMES:
+    _LIST_REGISTERS[_name] = _ListRegister(getattr(Registers, f"_{_name}"))
+    setattr(Registers, _name, _LIST_REGISTERS[_name])
+del _name
@@ -0,0 +1,213 @@
+"""Party roster shared by reference by the players of one group.
+
+Every player of a group used to carry its own copies of the party lists
+(``partyname``, ``partyID``, ``partyPID`` and the subgroup maps). The window
+rebuilt all of them on every name refresh, and ``Player._sync_party_roster``
+copied and walked them again on every ``make_party`` step. A
+:class:`PartyRoster` holds the lists once per group. Every change bumps
+:attr:`PartyRoster.version`, so readers whose last look was at the current
+version skip their work, and :meth:`PartyRoster.memo` keeps results derived
+from one version.
+
+The lists are replaced on change, never modified in place; treat what the
+attributes return as read-only.
+"""
+
+import re
+import threading
+from collections import deque
+
+# (attribute, empty value factory)
+FIELDS = (
+    ("names", list),
+    ("ids", list),
+    ("pids", list),
+    ("subgroups", dict),
+    ("subgroup_order", dict),
+    ("subgroup_members", dict),
+)
+_FIELD_NAMES = frozenset(name for name, _factory in FIELDS)
+# number of changes :meth:`PartyRoster.changes_since` can look back on
+CHANGE_LOG = 64
+
+
+def _copy(value):
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _coerce_pid(value):
+    # same rules as player._coerce_pid_value
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            return int(value, 10)
+        except ValueError:
+            digits = re.findall(r"\d+", value)
+            return int(digits[0], 10) if digits else None
+    return None
+
+
+class PartyRoster:
+    """Party lists of one group with a version bumped on every change."""
+
+    def __init__(self, **fields):
+        for name, factory in FIELDS:
+            setattr(self, name, factory())
+        self.version = 0
+        # (version of the _party_roster group var, roster version) of the
+        # last merge, see Player._sync_party_roster
+        self.merged = None
+        self._log = deque(maxlen=CHANGE_LOG)
+        self._memo = {}
+        self._lock = threading.Lock()
+        if fields:
+            self.assign(**fields)
+
+    def _changed(self, slots):
+        # caller holds ``_lock``; ``slots`` of None means everything changed
+        self.version += 1
+        self._log.append((self.version, slots))
+        self._memo = {}
+
+    def assign(self, **fields):
+        """Replace the given lists; returns ``True`` if anything changed."""
+
+        with self._lock:
+            changed = False
+            for name, value in fields.items():
+                if name not in _FIELD_NAMES:
+                    raise AttributeError(f"PartyRoster has no list {name!r}")
+                value = _copy(value)
+                if getattr(self, name) != value:
+                    setattr(self, name, value)
+                    changed = True
+            if changed:
+                self._changed(None)
+            return changed
+
+    def changes_since(self, version):
+        """Return the party slots changed after ``version``.
+
+        ``None`` means more changed than the log remembers or a whole list
+        was replaced; read everything again then.
+        """
+
+        with self._lock:
+            if version == self.version:
+                return frozenset()
+            if not self._log or self._log[0][0] > version + 1:
+                return None
+            slots = set()
+            for changed_at, changed in self._log:
+                if changed_at <= version:
+                    continue
+                if changed is None:
+                    return None
+                slots.update(changed)
+            return frozenset(slots)
+
+    def memo(self, key, compute):
+        """Return ``compute()`` cached for the current version.
+
+        A result is only kept when nothing changed the roster while it was
+        computed, including ``compute`` itself. ``None`` is never cached.
+        """
+
+        version = self.version
+        cached = self._memo.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = compute()
+        with self._lock:
+            if value is not None and self.version == version:
+                self._memo[key] = (version, value)
+        return value
+
+    def merge_entries(self, entries):
+        """Merge ``(slot, {"name": ..., "id": ...})`` entries of the roster var.
+
+        ``slot`` counts members after the leader. Names and ids replace the
+        ones in :attr:`names` and :attr:`ids`; a named member whose pid is
+        known is added to or renamed in its subgroup's member list. Returns
+        the set of slots that changed.
+        """
+
+        with self._lock:
+            names = list(self.names) if isinstance(self.names, list) else []
+            ids = list(self.ids) if isinstance(self.ids, list) else []
+            pids = self.pids if isinstance(self.pids, list) else []
+            subgroups = self.subgroups if isinstance(self.subgroups, dict) else {}
+            members = None
+            changed = set()
+
+            for raw_index, info in entries:
+                try:
+                    slot = int(raw_index)
+                except (TypeError, ValueError):
+                    continue
+                if slot < 0 or not isinstance(info, dict):
+                    continue
+                index = slot + 1
+                while len(names) <= index:
+                    names.append(None)
+                while len(ids) <= index:
+                    ids.append(None)
+
+                name = info.get("name")
+                if isinstance(name, str) and name and names[index] != name:
+                    names[index] = name
+                    changed.add(slot)
+
+                try:
+                    member_id = int(info["id"]) if info.get("id") is not None else None
+                except (TypeError, ValueError):
+                    member_id = None
+                if member_id is not None and ids[index] != member_id:
+                    ids[index] = member_id
+                    changed.add(slot)
+
+                pid = _coerce_pid(pids[index]) if index < len(pids) else None
+                if pid is None or not isinstance(name, str) or not name:
+                    continue
+                subgroup = subgroups.get(pid)
+                if subgroup is None:
+                    continue
+                if members is None:
+                    current_members = self.subgroup_members
+                    if not isinstance(current_members, dict):
+                        current_members = {}
+                    members = {
+                        key: list(value)
+                        for key, value in current_members.items()
+                        if isinstance(value, (list, tuple))
+                    }
+                current = members.get(subgroup, [])
+                for position, entry in enumerate(current):
+                    if not isinstance(entry, (list, tuple)) or not entry:
+                        continue
+                    if _coerce_pid(entry[0]) == pid:
+                        if (entry[1] if len(entry) > 1 else None) != name:
+                            current[position] = (pid, name)
+                            changed.add(slot)
+                        break
+                else:
+                    current.append((pid, name))
+                    changed.add(slot)
+                members[subgroup] = current
+
+            if not changed:
+                return changed
+            if names != self.names:
+                self.names = names
+            if ids != self.ids:
+                self.ids = ids
+            if members is not None and members != self.subgroup_members:
+                self.subgroup_members = members
+            self._changed(frozenset(changed))
+            return changed
@@ -0,0 +1,217 @@
+"""Multi-map routes over a graph of portals.
+
+A portal is a cell on one map that moves the player to an arrival cell on
+another map. Portals are read from ``resources/portals.json``::
+
+    [{"map": 1, "x": 68, "y": 57, "target": 2, "tx": 12, "ty": 40}, ...]
+
+and new ones are learned whenever ``walk_and_switch_map`` changes maps. Walking
+costs between the arrival cells and the portals of a map are computed once per
+map with the same grid search the walkers use, so ``route`` only runs a small
+Dijkstra over the portal graph plus two searches for the real start and goal.
+"""
+
+import heapq
+import json
+import os
+import threading
+
+from gridsearch import dijkstra, octile
+from path import loadMap
+
+PORTALS_FILE = os.path.join("resources", "portals.json")
+# portals closer than this (cells) to a known one with the same target merge
+PORTAL_MERGE_DISTANCE = 3
+# extra cost of a map change, roughly the cells walked during the loading
+PORTAL_COST = 10.0
+
+
+class PortalGraph:
+    """Portals between maps and the walking costs inside every map."""
+
+    def __init__(self, portals=(), path=None):
+        self.path = path
+        self._portals = {}
+        self._costs = {}
+        self._lock = threading.RLock()
+        for portal in portals:
+            self.add(*portal, save=False)
+
+    @classmethod
+    def load(cls, path=PORTALS_FILE):
+        """Read portals from ``path``; a missing file gives an empty graph."""
+
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError):
+            entries = []
+        portals = [
+            (e["map"], (e["x"], e["y"]), e["target"], (e["tx"], e["ty"]))
+            for e in entries
+        ]
+        return cls(portals, path)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [
+                {"map": m, "x": c[0], "y": c[1], "target": t, "tx": a[0], "ty": a[1]}
+                for m, portals in sorted(self._portals.items())
+                for c, t, a in portals
+            ]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(entries, fh, indent=1)
+        os.replace(tmp, self.path)
+
+    def portals(self, map_id):
+        """Return ``[(cell, target_map, arrival_cell), ...]`` of ``map_id``."""
+
+        with self._lock:
+            return list(self._portals.get(map_id, ()))
+
+    def add(self, map_id, cell, target, arrival, save=True):
+        """Record a portal; returns ``False`` when it was already known."""
+
+        cell = (int(cell[0]), int(cell[1]))
+        arrival = (int(arrival[0]), int(arrival[1]))
+        with self._lock:
+            known = self._portals.setdefault(map_id, [])
+            for other, other_target, _arrival in known:
+                if other_target == target and octile(*cell, *other) <= PORTAL_MERGE_DISTANCE:
+                    return False
+            known.append((cell, target, arrival))
+            # walking costs on both maps now have a new end point
+            self._costs.pop(map_id, None)
+            self._costs.pop(target, None)
+        if save:
+            self.save()
+        return True
+
+    def _entries(self, map_id):
+        # cells a route can enter map_id through
+        with self._lock:
+            return [
+                arrival
+                for portals in self._portals.values()
+                for _cell, target, arrival in portals
+                if target == map_id
+            ]
+
+    def map_costs(self, map_id):
+        """Return ``{entry_cell: {portal_cell: cost}}`` for ``map_id``."""
+
+        with self._lock:
+            cached = self._costs.get(map_id)
+        if cached is not None:
+            return cached
+        grid = loadMap(map_id)
+        exits = [cell for cell, _t, _a in self.portals(map_id)]
+        costs = {}
+        if grid and exits:
+            for entry in set(self._entries(map_id)):
+                costs[entry] = dijkstra(grid, entry, targets=exits)
+        with self._lock:
+            self._costs[map_id] = costs
+        return costs
+
+    def precompute(self):
+        """Compute the walking costs of every map with portals."""
+
+        with self._lock:
+            maps = list(self._portals)
+        for map_id in maps:
+            self.map_costs(map_id)
+
+    def route(self, from_map, start, to_map, goal=None):
+        """Return the legs of the cheapest route or ``[]`` when none is known.
+
+        Each leg is ``(map_id, cell, target_map, arrival)``: walk to ``cell``
+        on ``map_id``, a portal to ``arrival`` on ``target_map``. The final
+        walk to ``goal`` has ``None`` for both. Without ``goal`` the route
+        ends on arrival in ``to_map``.
+        """
+
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1])) if goal is not None else None
+        if from_map == to_map:
+            return [(to_map, goal, None, None)] if goal is not None else []
+
+        grid = loadMap(from_map)
+        exits = [cell for cell, _t, _a in self.portals(from_map)]
+        if not grid or not exits:
+            return []
+        first = dijkstra(grid, start, targets=exits)
+
+        goal_costs = {}
+        if goal is not None:
+            to_grid = loadMap(to_map)
+            entries = self._entries(to_map)
+            if to_grid and entries:
+                goal_costs = dijkstra(to_grid, goal, targets=entries)
+
+        # nodes are (map_id, arrival cell); the start is a pseudo arrival
+        origin = (from_map, start)
+        best = {origin: 0.0}
+        parent = {origin: None}
+        heap = [(0.0, 0, origin)]
+        counter = 1
+        done = set()
+        finish = None
+        while heap:
+            cost, _n, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            map_id, cell = node
+            if map_id == to_map:
+                finish = node
+                break
+            walk = first if node == origin else self.map_costs(map_id).get(cell, {})
+            for portal_cell, target, arrival in self.portals(map_id):
+                step = walk.get(portal_cell)
+                if step is None:
+                    continue
+                nxt = (target, arrival)
+                if target == to_map and goal is not None:
+                    if arrival not in goal_costs:
+                        continue
+                    extra = goal_costs[arrival]
+                else:
+                    extra = 0.0
+                new_cost = cost + step + PORTAL_COST + extra
+                if new_cost < best.get(nxt, float("inf")):
+                    best[nxt] = new_cost
+                    parent[nxt] = (node, portal_cell, target)
+                    heapq.heappush(heap, (new_cost, counter, nxt))
+                    counter += 1
+
+        if finish is None:
+            return []
+        legs = [(to_map, goal, None, None)] if goal is not None else []
+        node = finish
+        while parent[node] is not None:
+            arrival = node[1]
+            node, portal_cell, target = parent[node]
+            legs.append((node[0], portal_cell, target, arrival))
+        legs.reverse()
+        return legs
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_portal_graph():
+    """Return the shared portal graph, loading ``PORTALS_FILE`` on first use."""
+
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            _graph = PortalGraph.load()
+        return _graph
@@ -0,0 +1,57 @@
+import argparse
+
+import shadowmaps
+from path import _get_bin_dimensions
+
+try:
+    import requests
+except Exception:
+    requests = None
+
+SHADOW_URL = "https://itempicker.atlagaming.eu/api/maps/shadow/{map_id}"
+
+
+def _read_source(map_id, source):
+    if source is None:
+        source = SHADOW_URL.format(map_id=map_id)
+    if source.startswith(("http://", "https://")):
+        if requests is None:
+            raise SystemExit("requests is required to download shadow maps")
+        resp = requests.get(source, timeout=30)
+        if resp.status_code != 200:
+            raise SystemExit(f"{source}: HTTP {resp.status_code}")
+        return source, resp.content
+    with open(source, "rb") as fh:
+        return source, fh.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shadow map store")
+    parser.add_argument("--dir", default=shadowmaps.SHADOW_DIR, help="store directory")
+    subparsers = parser.add_subparsers(dest="cmd")
+
+    import_p = subparsers.add_parser("import", help="import a shadow map image")
+    import_p.add_argument("map_id", type=int, help="map id")
+    import_p.add_argument("source", nargs="?", help="PNG file or URL (default: shadow API)")
+    import_p.add_argument("--threshold", type=int, default=shadowmaps.THRESHOLD)
+
+    subparsers.add_parser("list", help="list imported shadow maps")
+
+    args = parser.parse_args()
+
+    if args.cmd == "import":
+        source, data = _read_source(args.map_id, args.source)
+        packed = shadowmaps.threshold_image(
+            data, _get_bin_dimensions(args.map_id), args.threshold
+        )
+        entry = shadowmaps.store(args.map_id, packed, source, args.dir)
+        print(f"map {args.map_id}: version {entry['version']} ({entry['width']}x{entry['height']})")
+    elif args.cmd == "list":
+        for map_id, entry in sorted(shadowmaps.load_index(args.dir).items(), key=lambda i: int(i[0])):
+            print(f"{map_id}: version {entry['version']} {entry['width']}x{entry['height']} from {entry['source']}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
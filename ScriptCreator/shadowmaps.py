@@ -0,0 +1,153 @@
+"""Local store of shadow maps in the packed ``maps.zip`` format.
+
+Shadow maps used to be downloaded and converted pixel by pixel inside
+``loadMap``, which runs on the packet thread. They are now imported ahead of
+time with ``shadow_tool.py`` and kept under ``resources/shadow``:
+
+* ``index.json`` maps every imported map id to its current version,
+* ``<map_id>-<version>.bin`` holds the grid exactly like ``maps/<id>.bin``:
+  a little endian ``uint16`` width and height followed by one byte per cell,
+  ``0`` for walkable and ``1`` for blocked.
+
+Reading the store never touches the network.
+"""
+
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
+SHADOW_DIR = os.path.join("resources", "shadow")
+FORMAT_VERSION = 1
+THRESHOLD = 128
+
+_index_lock = threading.Lock()
+_index_cache = {}
+
+
+def _index_path(directory):
+    return os.path.join(directory, "index.json")
+
+
+def load_index(directory=SHADOW_DIR):
+    """Return the ``{map_id: entry}`` index of ``directory``.
+
+    The parsed index is cached until the file changes on disk.
+    """
+
+    path = _index_path(directory)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    with _index_lock:
+        cached = _index_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        if data.get("format") != FORMAT_VERSION:
+            return {}
+        maps = data.get("maps", {})
+        _index_cache[path] = (mtime, maps)
+        return maps
+
+
+def _write_index(directory, maps):
+    path = _index_path(directory)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"format": FORMAT_VERSION, "maps": maps}, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def pack(width, height, cells):
+    """Return ``cells`` (``width * height`` bytes) with the ``.bin`` header."""
+
+    if len(cells) != width * height:
+        raise ValueError("Invalid data length for the given width and height")
+    return struct.pack("<HH", width, height) + bytes(cells)
+
+
+def unpack_header(data):
+    """Return ``(width, height)`` stored in a packed map."""
+
+    return struct.unpack_from("<HH", data)
+
+
+def threshold_image(data, size=None, threshold=THRESHOLD):
+    """Convert PNG bytes into packed map data.
+
+    Pixels at or above ``threshold`` are walkable. ``size`` optionally
+    resizes the image (nearest neighbour) to the dimensions of the matching
+    ``maps.zip`` entry first.
+    """
+
+    if Image is None:
+        raise RuntimeError("Pillow is required to import shadow maps")
+    im = Image.open(io.BytesIO(data)).convert("L")
+    if size is not None and im.size != tuple(size):
+        im = im.resize(tuple(size), Image.NEAREST)
+    cells = im.point(lambda v: 0 if v >= threshold else 1).tobytes()
+    width, height = im.size
+    return pack(width, height, cells)
+
+
+def store(map_id, packed, source="", directory=SHADOW_DIR):
+    """Save ``packed`` as the next version of ``map_id`` and return its entry."""
+
+    os.makedirs(directory, exist_ok=True)
+    with _index_lock:
+        _index_cache.pop(_index_path(directory), None)
+    maps = dict(load_index(directory))
+    key = str(map_id)
+    previous = maps.get(key)
+    version = previous["version"] + 1 if previous else 1
+    filename = f"{key}-{version}.bin"
+    tmp = os.path.join(directory, filename + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(packed)
+    os.replace(tmp, os.path.join(directory, filename))
+
+    width, height = unpack_header(packed)
+    entry = {
+        "version": version,
+        "file": filename,
+        "width": width,
+        "height": height,
+        "sha1": hashlib.sha1(packed).hexdigest(),
+        "source": source,
+        "imported": int(time.time()),
+    }
+    maps[key] = entry
+    _write_index(directory, maps)
+    if previous:
+        try:
+            os.remove(os.path.join(directory, previous["file"]))
+        except OSError:
+            pass
+    return entry
+
+
+def read(map_id, directory=SHADOW_DIR):
+    """Return the packed data of the current version of ``map_id`` or ``None``."""
+
+    entry = load_index(directory).get(str(map_id))
+    if entry is None:
+        return None
+    try:
+        with open(os.path.join(directory, entry["file"]), "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
@@ -0,0 +1,371 @@
+"""Crash-recovery snapshots of the group runtime state.
+
+Group and subgroup variables, the make-party progress, the party roster and
+the ``attr1``..``attr100`` registers of every player only live in memory. When
+ScriptCreator crashes or a client relogs, a group had to run its
+initialization conditions again from the start.
+
+:class:`SnapshotWriter` captures that state every few seconds on a
+background thread and writes it to one file. Capturing is cheap: the stores
+publish their entries as snapshots that are never changed in place, so
+reading them takes no lock, and players' registers are copied one level deep.
+The file holds a short header and the state pickled and compressed with zlib;
+it is only rewritten when the state changed, through a temporary file so a
+crash while writing leaves the previous snapshot intact.
+
+Groups are keyed by leader name. A group that is loaded again can be resumed
+with :func:`restore`, which maps the saved variables onto the new group id
+and group number.
+"""
+
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+from partystate import MakePartyState
+from registers import ATTR_COUNT, default as default_register
+from roster import FIELDS as ROSTER_FIELDS
+
+SNAPSHOT_FILE = "group_snapshot.bin"
+# seconds between two snapshots
+SNAPSHOT_INTERVAL = 5.0
+MAGIC = b"SCGS"
+FORMAT_VERSION = 1
+# magic, format version, time the file was written
+_HEADER = struct.Struct("<4sBd")
+# set by the group loader for the new group; kept unless it left them empty
+LOADER_FIELDS = (
+    "attr19",
+    "attr20",
+    "attr51",
+    "leadername",
+    "leaderID",
+    "subgroup_index",
+    "subgroup_member_limit",
+)
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def _group_number(players):
+    for player in players:
+        try:
+            number = int(getattr(player, "attr19", 0))
+        except (TypeError, ValueError):
+            continue
+        if number > 0:
+            return number
+    return 0
+
+
+def _group_id(player):
+    return getattr(player, "leaderID", 0) or getattr(player, "_current_gid", None)
+
+
+def _conditions(player):
+    states = {}
+    for cond_type in ("recv_packet", "send_packet"):
+        states[cond_type] = {
+            cond[0]: bool(cond[2])
+            for cond in list(getattr(player, f"{cond_type}_conditions", []))
+        }
+    states["periodical"] = {
+        cond.name: bool(cond.active) for cond in list(getattr(player, "periodical_conditions", []))
+    }
+    return states
+
+
+def capture_player(player):
+    """Return the registers, leader fields and condition flags of ``player``.
+
+    Registers still at their initial value are left out.
+    """
+
+    return {
+        "attrs": {name: _copy(value) for name, value in player.changed_registers().items()},
+        "leadername": getattr(player, "leadername", ""),
+        "leaderID": getattr(player, "leaderID", 0),
+        "subgroup_index": getattr(player, "subgroup_index", None),
+        "subgroup_member_limit": getattr(player, "subgroup_member_limit", 0),
+        "conditions": _conditions(player),
+    }
+
+
+def capture(players, group_store, subgroup_store, runtime_store):
+    """Return ``{leader_name: group state}`` of the groups of ``players``.
+
+    Only players with a loaded script are captured.
+    """
+
+    by_leader = {}
+    for player in players:
+        if not getattr(player, "script_loaded", False):
+            continue
+        leader_name = getattr(player, "leadername", "") or player.name
+        by_leader.setdefault(leader_name, []).append(player)
+
+    groups = {}
+    subgroup_keys = subgroup_store.groups()
+    for leader_name, members in by_leader.items():
+        leader = next((p for p in members if p.name == leader_name), members[0])
+        gid = _group_id(leader)
+        number = _group_number(members)
+        board = runtime_store.get(gid, "_make_party_state")
+        make_party = {}
+        if isinstance(board, MakePartyState):
+            make_party = {index: board.get(index) for index in board.subgroups()}
+        roster = getattr(leader, "party_roster", None)
+        groups[leader_name] = {
+            "saved": time.time(),
+            "group_id": gid,
+            "group_number": number,
+            "vars": group_store.snapshot(gid),
+            "subgroup_vars": {
+                key[1]: subgroup_store.snapshot(key)
+                for key in subgroup_keys
+                if number and key[0] == number
+            },
+            "make_party": make_party,
+            "roster": {
+                name: _copy(getattr(roster, name)) for name, _factory in ROSTER_FIELDS
+            }
+            if roster is not None
+            else {},
+            "players": {player.name: capture_player(player) for player in members},
+        }
+    return groups
+
+
+def _unchanged(previous, group):
+    # the capture time alone does not make a group worth writing again
+    try:
+        return all(previous.get(key) == value for key, value in group.items() if key != "saved")
+    except Exception:
+        return False
+
+
+def _picklable(value):
+    # drop the values that cannot be pickled (locks, futures, game objects)
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            try:
+                result[key] = _picklable(item)
+            except Exception:
+                continue
+        return result
+    pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return value
+
+
+def encode(state):
+    """Return the compressed payload of ``state`` (without the header)."""
+
+    try:
+        data = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        data = pickle.dumps(_picklable(state), pickle.HIGHEST_PROTOCOL)
+    return zlib.compress(data, 1)
+
+
+def write(path, payload):
+    """Write ``payload`` with a header to ``path``, replacing it atomically."""
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, time.time()))
+        handle.write(payload)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_path, path)
+
+
+def read(path):
+    """Return the state saved in ``path``; ``None`` if missing or unreadable."""
+
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, _written = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    try:
+        return pickle.loads(zlib.decompress(data[_HEADER.size:]))
+    except Exception:
+        return None
+
+
+def restore(group, players, group_store, subgroup_store, runtime_store):
+    """Put the captured ``group`` back into the stores and onto ``players``.
+
+    ``players`` are the members of the group as loaded again: the group id,
+    group number, leader fields and subgroup assignment the loader gave them
+    are kept, everything else continues from the snapshot. Returns the names
+    of the players that were found in the snapshot.
+    """
+
+    saved_players = group.get("players", {})
+    restored = []
+    for player in players:
+        state = saved_players.get(player.name)
+        if state is None:
+            continue
+        values = dict(state.get("attrs", {}))
+        for name in ("leadername", "leaderID", "subgroup_index", "subgroup_member_limit"):
+            values[name] = state.get(name)
+        for index in range(1, ATTR_COUNT + 1):
+            values.setdefault(f"attr{index}", default_register(index))
+        for name, value in values.items():
+            if name in LOADER_FIELDS and getattr(player, name, None):
+                continue
+            setattr(player, name, value)
+
+        conditions = state.get("conditions", {})
+        for cond_type in ("recv_packet", "send_packet"):
+            flags = conditions.get(cond_type, {})
+            for cond in getattr(player, f"{cond_type}_conditions", []):
+                if cond[0] in flags:
+                    cond[2] = flags[cond[0]]
+        flags = conditions.get("periodical", {})
+        for cond in getattr(player, "periodical_conditions", []):
+            if cond.name in flags:
+                cond.active = flags[cond.name]
+        restored.append(player.name)
+
+    leader = next((p for p in players if p.leadername == p.name), None)
+    gid = _group_id(leader) if leader is not None else None
+    if gid is not None:
+        for name, value in group.get("vars", {}).items():
+            group_store.set(gid, name, value)
+        if group.get("make_party"):
+            board, _ = runtime_store.update(
+                gid,
+                "_make_party_state",
+                lambda stored: stored if isinstance(stored, MakePartyState) else MakePartyState(),
+            )
+            board.load(group["make_party"])
+
+    number = _group_number(players)
+    if number:
+        for sid, values in group.get("subgroup_vars", {}).items():
+            for name, value in values.items():
+                subgroup_store.set((number, sid), name, value)
+
+    saved_roster = group.get("roster", {})
+    rosters = {id(p.party_roster): p.party_roster for p in players if hasattr(p, "party_roster")}
+    for roster in rosters.values():
+        missing = {
+            name: value
+            for name, value in saved_roster.items()
+            if value and not getattr(roster, name, None)
+        }
+        if missing:
+            roster.assign(**missing)
+    return restored
+
+
+class SnapshotWriter:
+    """Write the groups of ``players()`` to ``path`` every ``interval`` seconds.
+
+    Groups saved by an earlier run stay in the file until they are resumed
+    (their live state replaces them) or dropped with :meth:`discard`. Players
+    that left their group are dropped with :meth:`forget`.
+    """
+
+    def __init__(self, path, players, stores, interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._players = players
+        self._stores = stores
+        saved = read(path) or {}
+        self._groups = dict(saved.get("groups", {}))
+        # something changed since the last write
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self, flush=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval)
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as error:
+                print(f"[snapshots] {error}")
+
+    def saved_group(self, leader_name):
+        """Return the saved state of the group led by ``leader_name``."""
+
+        with self._lock:
+            return self._groups.get(leader_name)
+
+    def discard(self, leader_name):
+        with self._lock:
+            if self._groups.pop(leader_name, None) is not None:
+                self._dirty = True
+
+    def forget(self, name):
+        """Drop the player ``name``, and its group if it led one."""
+
+        with self._lock:
+            if self._groups.pop(name, None) is not None:
+                self._dirty = True
+            for leader_name, group in list(self._groups.items()):
+                if name in group.get("players", {}):
+                    players = dict(group["players"])
+                    del players[name]
+                    self._groups[leader_name] = dict(group, players=players)
+                    self._dirty = True
+
+    def flush(self):
+        """Capture the live groups now; returns ``True`` if the file was written."""
+
+        live = capture(list(self._players()), *self._stores)
+        with self._lock:
+            for leader_name, group in live.items():
+                previous = self._groups.get(leader_name)
+                if previous is not None:
+                    # members that relogged keep their last saved state
+                    players = dict(previous.get("players", {}))
+                    players.update(group["players"])
+                    group["players"] = players
+                    if _unchanged(previous, group):
+                        continue
+                self._groups[leader_name] = group
+                self._dirty = True
+            if not self._dirty:
+                return False
+            payload = encode({"groups": self._groups})
+            self._dirty = False
+        with self._write_lock:
+            write(self.path, payload)
+        return True
@@ -0,0 +1,56 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from calculatefieldlocation import (  # noqa: E402
+    calculate_field_location,
+    calculate_point_B_position,
+    find_walkable_pos,
+    solve_field_location,
+)
+
+
+def _full_scan(x, y, map_array):
+    best = None
+    for i in range(len(map_array[0])):
+        for j in range(len(map_array)):
+            if map_array[j][i] == 1:
+                key = (abs(i - x) + abs(j - y), i, j)
+                if best is None or key < best:
+                    best = key
+    return best[1:]
+
+
+def test_nearest_walkable_matches_full_scan():
+    rng = random.Random(3)
+    grid = [[1 if rng.random() < 0.1 else 0 for _ in range(23)] for _ in range(17)]
+
+    for x in range(-5, 28):
+        for y in range(-5, 22):
+            assert find_walkable_pos(x, y, grid) == _full_scan(x, y, grid)
+
+
+def test_nearest_walkable_without_walkable_cells():
+    assert find_walkable_pos(1, 1, [[0, 0], [0, 0]]) is None
+    assert find_walkable_pos(1, 1, []) is None
+    assert calculate_point_B_position(1, 1, 0.0, [[0, 0], [0, 0]]) is None
+    assert calculate_field_location((0, 0), (100, 0), 0.785, 2.36, [[0, 0]]) is None
+
+
+def test_fused_readings_match_two_ray_intersection():
+    readings = [(0, 0, 0.785), (100, 0, 2.36)]
+    two = calculate_field_location(readings[0][:2], readings[1][:2], 0.785, 2.36)
+    x, y, confidence, residual = solve_field_location(readings)
+
+    assert (int(x), int(y)) == two
+    assert residual < 1e-6 and confidence > 0.9
+
+
+def test_disagreeing_and_parallel_readings_lower_confidence():
+    good = solve_field_location([(0, 0, 0.0), (50, -50, 1.57), (0, 50, -0.785)])
+    noisy = solve_field_location([(0, 0, 0.0), (50, -50, 1.57), (0, 70, -0.785)])
+
+    assert noisy[2] < good[2]
+    assert solve_field_location([(0, 0, 0.5), (10, 0, 0.5)]) is None
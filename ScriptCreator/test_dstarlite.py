@@ -0,0 +1,47 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dstarlite import DStarLite, LocalReplanner  # noqa: E402
+from gridsearch import astar, path_cost  # noqa: E402
+
+
+def _cost(path, extra):
+    return path_cost(path) + sum(extra.get(a, 0) + extra.get(b, 0) for a, b in zip(path, path[1:]))
+
+
+def test_incremental_updates_stay_optimal():
+    rng = random.Random(2)
+    grid = [[1 if rng.random() > 0.2 else 0 for _ in range(24)] for _ in range(24)]
+    grid[0][0] = grid[23][23] = 1
+    reference = astar(grid, (0, 0), (23, 23))
+    planner = DStarLite(grid, (0, 0), (23, 23))
+
+    path = planner.path()
+    assert path_cost(path) == path_cost(reference)
+
+    # block the middle of the route; the repair must avoid it like a fresh search
+    for cell in path[5:8]:
+        planner.add_cost(cell, 50)
+    planner.move_start(path[1])
+    repaired = planner.path()
+    fresh = DStarLite(grid, path[1], (23, 23))
+    fresh.extra = dict(planner.extra)
+
+    assert abs(_cost(repaired, planner.extra) - _cost(fresh.path(), planner.extra)) < 1e-6
+    assert not set(path[5:8]) & set(repaired)
+
+
+def test_local_repair_rejoins_original_path():
+    grid = [[1] * 40 for _ in range(10)]
+    path = [(x, 5) for x in range(40)]
+    replanner = LocalReplanner(grid, path)
+
+    repaired = replanner.repair((10, 5), (15, 5))
+
+    assert repaired[0] == (10, 5) and repaired[-1] == (39, 5)
+    assert (11, 5) not in repaired
+    for (ax, ay), (bx, by) in zip(repaired, repaired[1:]):
+        assert max(abs(ax - bx), abs(ay - by)) == 1
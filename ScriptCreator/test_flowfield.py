@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flowfield import FlowField, FlowFieldCache, WalkTargetTracker  # noqa: E402
+from gridsearch import astar, path_cost  # noqa: E402
+
+
+def _grid():
+    grid = [[1] * 30 for _ in range(20)]
+    for y in range(0, 17):
+        grid[y][15] = 0
+    return grid
+
+
+def test_flow_field_paths_are_optimal_for_every_start():
+    grid = _grid()
+    field = FlowField(grid, (28, 2))
+
+    for start in ((0, 0), (5, 18), (20, 10)):
+        path = field.path_from(start)
+        assert path[0] == start and path[-1] == (28, 2)
+        assert abs(path_cost(path) - path_cost(astar(grid, start, (28, 2)))) < 1e-9
+
+    grid[5][5] = 0
+    assert FlowField(grid, (5, 5)).path_from((0, 0)) == []
+
+
+def test_cache_evicts_least_recently_used_field():
+    grid = _grid()
+    cache = FlowFieldCache(maxsize=2)
+    first = cache.get(1, (1, 1), grid)
+    second = cache.get(1, (2, 2), grid)
+    assert cache.get(1, (1, 1), grid) is first
+    cache.get(1, (3, 3), grid)
+    assert cache.get(1, (1, 1), grid) is first
+    assert cache.get(1, (2, 2), grid) is not second
+
+
+def test_tracker_counts_distinct_walkers_inside_window():
+    tracker = WalkTargetTracker(window=5.0)
+    assert tracker.register((1, (5, 5)), "a", now=0.0) == 1
+    assert tracker.register((1, (5, 5)), "a", now=1.0) == 1
+    assert tracker.register((1, (5, 5)), "b", now=2.0) == 2
+    assert tracker.register((1, (5, 5)), "c", now=10.0) == 1
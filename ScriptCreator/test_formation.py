@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from formation import (  # noqa: E402
+    GroupMove,
+    follow_waypoints,
+    formation_offsets,
+    heading,
+    place,
+)
+from path import has_line_of_sight  # noqa: E402
+
+
+def _open_grid(width, height):
+    return [[1] * width for _ in range(height)]
+
+
+def test_offsets_rotate_with_heading():
+    offsets = formation_offsets("wedge", 3, spacing=2)
+    assert offsets == [(0, 0), (-2, 2), (-2, -2)]
+    # walking right (+x): behind is -x, the right-hand side is +y
+    assert place((10, 10), offsets[1], heading((0, 10), (10, 10))) == (8, 12)
+    # walking down (+y): behind is -y, the right-hand side is -x
+    assert place((10, 10), offsets[1], heading((10, 0), (10, 10))) == (8, 8)
+
+
+def test_followers_keep_line_of_sight_and_narrow_in_corridors():
+    grid = _open_grid(30, 21)
+    # a wall across the map with a one-cell gap at x == 15
+    for x in range(30):
+        if x != 15:
+            grid[10][x] = 0
+    waypoints = [(15, 5), (15, 15), (15, 19)]
+    origin = (15, 1)
+    for offset in formation_offsets("line", 3, spacing=3)[1:]:
+        legs = follow_waypoints(waypoints, (origin[0] + offset[1], origin[1]), offset, grid, origin)
+        assert len(legs) == len(waypoints)
+        current = (origin[0] + offset[1], origin[1])
+        for cells in legs:
+            for cell in cells:
+                assert grid[cell[1]][cell[0]] == 1
+                assert has_line_of_sight(grid, current, cell)
+                current = cell
+        # the gap leg had to fall back onto the leader's line
+        assert legs[1][-1] == (15, 15)
+
+
+def _run_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop
+
+
+def test_members_follow_progress_published_from_another_loop():
+    leader_loop, member_loop = _run_loop(), _run_loop()
+    move = GroupMove(1, (10, 10))
+    assert move.claim("leader")
+    assert not move.claim("member")
+    assert move.join("member") == 1
+    seen = []
+
+    async def follow():
+        await move.wait_for(lambda: move.waypoints is not None, 2)
+        for index in range(len(move.waypoints)):
+            await move.wait_for(lambda: move.progress >= index, 2)
+            seen.append(index)
+            move.report("member", index)
+        return True
+
+    async def lead():
+        move.publish((0, 0), [(5, 5), (10, 10)])
+        for index in range(2):
+            assert await move.wait_for(lambda: move.slowest() >= index - 1, 2)
+            move.advance(index)
+        assert await move.wait_for(lambda: move.slowest() >= 1, 2)
+        move.finish()
+
+    member = asyncio.run_coroutine_threadsafe(follow(), member_loop)
+    asyncio.run_coroutine_threadsafe(lead(), leader_loop).result(3)
+    assert member.result(3) is True
+    assert seen == [0, 1]
+    assert move.leave("member") == 1
+    for loop in (leader_loop, member_loop):
+        loop.call_soon_threadsafe(loop.stop)
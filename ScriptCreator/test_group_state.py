@@ -0,0 +1,209 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest  # noqa: E402
+
+from group_state import CounterStore, GroupStore, barrier  # noqa: E402
+
+
+def test_compare_and_set_rejects_stale_versions():
+    store = GroupStore()
+    assert store.get_versioned(1, "ids") == (None, 0)
+    stored, version = store.compare_and_set(1, "ids", 0, [7])
+    assert stored
+    # a second writer that read the missing value loses
+    assert store.compare_and_set(1, "ids", 0, [8]) == (False, version)
+    assert store.compare_and_set(1, "ids", version, [7, 8])[0]
+    assert store.get(1, "ids") == [7, 8]
+
+    # dropping and recreating a group never hands out an old version again
+    store.drop(1)
+    assert store.get(1, "ids", "gone") == "gone"
+    assert store.set(1, "ids", [9]) > version
+
+
+def test_updates_from_many_threads_are_not_lost():
+    store = GroupStore()
+
+    def work(me):
+        for i in range(200):
+            store.update(5, "ids", lambda ids: ids + [(me, i)], [])
+            store.update(5, "count", lambda n: n + 1, 0)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get(5, "count") == 1600
+    assert len(set(store.get(5, "ids"))) == 1600
+
+
+def test_merge_and_delete_keep_old_semantics():
+    store = GroupStore()
+    store.set("placeholder", "a", 1)
+    store.set("placeholder", "b", 2)
+    store.set(42, "b", 3)
+    store.merge("placeholder", 42)
+    assert store.snapshot(42) == {"a": 1, "b": 2}
+    assert "placeholder" not in store.shards()
+
+    store.delete(42, "a")
+    store.delete(42, "b")
+    assert 42 not in store.shards()
+
+
+def test_counters_are_atomic_and_array_backed():
+    store = CounterStore()
+
+    def work():
+        for _ in range(500):
+            store.add((1, 1), "arrived", 1)
+            store.add((1, 1), "left", -1)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.snapshot((1, 1)) == {"arrived": 4000, "left": -4000}
+    assert store.shard((1, 1)).values.typecode == "q"
+
+    assert store.compare_and_swap((1, 2), "turn", 0, 1, 0) == (True, 1)
+    assert store.compare_and_swap((1, 2), "turn", 0, 2, 0) == (False, 1)
+    _value, version = store.get_versioned((1, 2), "turn")
+    assert store.compare_and_set((1, 2), "turn", version, 5)[0]
+    assert store.compare_and_set((1, 2), "turn", version, 6)[0] is False
+    assert store.get((1, 2), "turn") == 5
+    with pytest.raises(ValueError):
+        store.set((1, 2), "turn", "many")
+    with pytest.raises(ValueError):
+        store.add((1, 2), "turn", 2**63)
+
+    store.merge((1, 2), (1, 1))
+    assert store.snapshot((1, 1)) == {"arrived": 4000, "left": -4000, "turn": 5}
+    assert store.groups() == [(1, 1)]
+    for name in ("arrived", "left", "turn"):
+        store.delete((1, 1), name)
+    assert store.groups() == [] and store.get((1, 1), "turn", 0) == 0
+
+
+def _run_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def test_wait_for_wakes_on_a_write_from_another_thread():
+    loop = _run_loop()
+    store = GroupStore()
+    seen = []
+    ready = threading.Event()
+
+    def subscribe():
+        store.watch(3, "trade", seen.append)
+        ready.set()
+
+    loop.call_soon_threadsafe(subscribe)
+    ready.wait(2)
+    waiting = asyncio.run_coroutine_threadsafe(
+        store.wait_for(3, "trade", lambda v: v == "1", timeout=5), loop
+    )
+    threading.Timer(0.05, store.set, args=(3, "trade", "0")).start()
+    threading.Timer(0.1, store.set, args=(3, "trade", "1")).start()
+    started = time.perf_counter()
+    assert waiting.result(3) is True
+    # woken by the write, not by the one second re-check
+    assert time.perf_counter() - started < 0.5
+    assert asyncio.run_coroutine_threadsafe(
+        store.wait_for(3, "trade", lambda v: v == "2", timeout=0.05), loop
+    ).result(2) is False
+
+    store.delete(3, "trade")
+    time.sleep(0.05)
+    assert seen == ["0", "1", None]
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_waiters_follow_a_merged_placeholder_without_vars():
+    loop = _run_loop()
+    for store in (GroupStore(), CounterStore()):
+        waiting = asyncio.run_coroutine_threadsafe(
+            store.wait_for("placeholder", "trade", lambda v: v == 1, timeout=5), loop
+        )
+        time.sleep(0.05)
+        store.merge("placeholder", "leader")
+        started = time.perf_counter()
+        store.set("leader", "trade", 1)
+        assert waiting.result(3) is True
+        assert time.perf_counter() - started < 0.5
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_wait_for_resolves_a_changed_group_id_without_a_write():
+    # like leaderID arriving in a packet after the wait started
+    loop = _run_loop()
+    store = GroupStore()
+    store.set("leader", "trade", 1)
+    key = ["placeholder"]
+    waiting = asyncio.run_coroutine_threadsafe(
+        store.wait_for(lambda: key[0], "trade", lambda v: v == 1, timeout=10), loop
+    )
+    time.sleep(0.05)
+    key[0] = "leader"
+    started = time.perf_counter()
+    assert waiting.result(5) is True
+    assert time.perf_counter() - started < 2
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_next_write_is_not_taken_from_the_merged_group():
+    loop = _run_loop()
+    store = GroupStore()
+    store.set("leader", "trade", "old")
+    waiting = asyncio.run_coroutine_threadsafe(
+        store.wait_for("placeholder", "trade", timeout=5), loop
+    )
+    time.sleep(0.05)
+    store.merge("placeholder", "leader")
+    time.sleep(0.1)
+    # the leader's existing version is no new write
+    assert not waiting.done()
+    store.set("leader", "trade", "new")
+    assert waiting.result(3) is True
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_barrier_releases_members_on_their_own_loops():
+    store = GroupStore()
+    members = ("lead", "a", "b")
+    results = {}
+
+    def member(name, delay, timeout):
+        async def run():
+            await asyncio.sleep(delay)
+            return await barrier(store, 9, "room1", name, 3, timeout, members)
+
+        results[name] = asyncio.run(run())
+
+    threads = [
+        threading.Thread(target=member, args=(name, 0.05 * n, 5)) for n, name in enumerate(members)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - started < 0.5
+    assert all(results[name] for name in members)
+    assert sorted(results["lead"].arrived) == sorted(members)
+
+    # the name is reusable; a member that is alone times out and says who is late
+    late = asyncio.run(barrier(store, 9, "room1", "lead", 3, 0.05, members))
+    assert not late and late.missing == ("a", "b")
+    assert store.get(9, "room1")[1] == ()
@@ -0,0 +1,103 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from group_state import GroupStore  # noqa: E402
+import groupserver  # noqa: E402
+from groupserver import GroupStateServer, SharedStore, connect, key_path, parse_address  # noqa: E402
+
+
+def _address(tmp_path):
+    if sys.platform == "win32":
+        return r"\\.\pipe\ScriptCreatorGroupsTest"
+    return str(tmp_path / "groups.sock")
+
+
+def _add_many(address, count):
+    store = connect(address)["group"]
+    for _ in range(count):
+        store.update(1, "hits", lambda hits: hits + 1, 0)
+
+
+def test_parse_address():
+    assert parse_address("127.0.0.1:7777") == ("127.0.0.1", 7777)
+    assert parse_address("/tmp/x.sock") == "/tmp/x.sock"
+    assert parse_address(r"\\.\pipe\groups") == r"\\.\pipe\groups"
+    assert parse_address("localhost:7777") == ("localhost", 7777)
+    with pytest.raises(ValueError):
+        parse_address("0.0.0.0:7777")
+    with pytest.raises(ValueError):
+        parse_address("example.com:7777")
+
+
+def test_generated_key_is_private_and_required(tmp_path, monkeypatch):
+    monkeypatch.delenv("SCRIPTCREATOR_GROUP_KEY", raising=False)
+    server = GroupStateServer(_address(tmp_path))
+    server.start()
+    try:
+        assert server.key_file == key_path(server.address)
+        if sys.platform != "win32":
+            assert os.stat(server.key_file).st_mode & 0o077 == 0
+        with pytest.raises(multiprocessing.AuthenticationError):
+            connect(server.address, b"scriptcreator-groups")
+        assert connect(server.address)["group"].get(1, "x", 3) == 3
+    finally:
+        server.close()
+    assert not os.path.exists(server.key_file)
+
+
+def test_processes_share_versioned_group_vars(tmp_path):
+    server = GroupStateServer(_address(tmp_path))
+    server.start()
+    try:
+        stores = connect(server.address)
+        group, subgroup = stores["group"], stores["subgroup"]
+        version = group.set(1, "target", (10, 20))
+        assert group.get_versioned(1, "target") == ((10, 20), version)
+        assert group.compare_and_set(1, "target", version - 1, None) == (False, version)
+        subgroup.set((1, 2), "n", 5)
+        assert subgroup.groups() == [(1, 2)] and group.get(2, "n") is None
+
+        context = multiprocessing.get_context("spawn")
+        workers = [context.Process(target=_add_many, args=(server.address, 50)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        _add_many(server.address, 50)
+        for worker in workers:
+            worker.join(60)
+        assert group.get(1, "hits") == 150
+
+        async def wait_for_leader():
+            other = connect(server.address)["group"]
+            seen = []
+            watch = group.watch(1, "leader", seen.append)
+            waiting = asyncio.ensure_future(group.wait_for(1, "leader", lambda v: v == 7, 5))
+            await asyncio.sleep(0.05)
+            other.set(1, "leader", 7)
+            assert await waiting is True
+            await asyncio.sleep(0.05)
+            watch.cancel()
+            return seen
+
+        assert asyncio.run(wait_for_leader()) == [7]
+    finally:
+        server.close()
+
+
+def test_shared_store_falls_back_without_server(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCRIPTCREATOR_GROUP_SERVER", str(tmp_path / "missing.sock"))
+    monkeypatch.setenv("SCRIPTCREATOR_GROUP_KEY", "test")
+    monkeypatch.setattr(groupserver, "_process_stores", None)
+
+    class Holder:
+        store = SharedStore("group")
+
+    # nothing is opened until the store is used
+    assert groupserver._process_stores is None
+    store = Holder.store
+    assert isinstance(store, GroupStore) and Holder.__dict__["store"] is store
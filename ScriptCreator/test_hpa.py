@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gridsearch import astar, path_cost  # noqa: E402
+from hpa import AbstractGraph  # noqa: E402
+
+
+def _maze(width, height, seed=1):
+    rng = random.Random(seed)
+    grid = [[1] * width for _ in range(height)]
+    for x in range(8, width, 12):
+        gap = rng.randrange(height)
+        for y in range(height):
+            if abs(y - gap) > 1:
+                grid[y][x] = 0
+    return grid
+
+
+def _assert_valid(grid, path, start, goal):
+    assert path[0] == start
+    assert path[-1] == goal
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert max(abs(ax - bx), abs(ay - by)) == 1
+        assert grid[by][bx]
+
+
+def test_hpa_path_is_valid_and_close_to_optimal():
+    grid = _maze(96, 64)
+    graph = AbstractGraph(grid, cluster_size=16)
+    start, goal = (1, 1), (94, 62)
+
+    path = graph.find_path(start, goal)
+    optimal = astar(grid, start, goal)
+
+    _assert_valid(grid, path, start, goal)
+    assert path_cost(path) <= path_cost(optimal) * 1.25
+
+
+def test_hpa_same_cluster_and_unreachable_goal():
+    grid = _maze(64, 64)
+    grid[40][40] = 0
+    graph = AbstractGraph(grid, cluster_size=16)
+
+    path = graph.find_path((2, 2), (5, 9))
+    _assert_valid(grid, path, (2, 2), (5, 9))
+    assert graph.find_path((2, 2), (40, 40)) == []
+
+
+def test_intra_cluster_edges_are_cached():
+    grid = _maze(64, 32)
+    graph = AbstractGraph(grid, cluster_size=16)
+
+    first = graph.intra_edges((1, 0))
+    assert graph.intra_edges((1, 0)) is first
@@ -0,0 +1,44 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from maploader import MapLoader  # noqa: E402
+
+
+def test_concurrent_requests_share_one_load():
+    release = threading.Event()
+    calls = []
+
+    def load(map_id):
+        calls.append(map_id)
+        release.wait(5)
+        return [[map_id]]
+
+    loader = MapLoader(load)
+    first = loader.get(1)
+    second = loader.get(1)
+    release.set()
+
+    assert first is second
+    assert first.result(5) == [[1]]
+    assert calls == [1]
+
+
+def test_history_drives_prefetch():
+    cache = {}
+
+    def load(map_id):
+        cache[map_id] = [[map_id]]
+        return cache[map_id]
+
+    loader = MapLoader(load, cached=cache.get, prefetch_count=1)
+    for target in (2, 3, 2):
+        loader.record_transition(1, target)
+
+    assert loader.predict(1) == [2]
+    assert loader.predict(5) == []
+    loader.prefetch(1)
+    loader.get(2).result(5)
+    assert 2 in cache and 3 not in cache
@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from partystate import WAIT_RECHECK, MakePartyState  # noqa: E402
+
+
+def test_party_starts_once_every_member_is_ready():
+    board = MakePartyState()
+    assert board.register_ready(1, 10, 2, [10, 11], ["Lead", "Other"]) == (True, 1, 2, False, False)
+    assert board.wait_started(1, 2, timeout=0.05) is False
+    assert board.register_ready(1, 11, 2, [10, 11], ["Lead", "Other"]) == (True, 2, 2, True, True)
+    assert board.wait_started(1, 2, timeout=0) is True
+    assert board.get(1)["leader_name"] == "lead"
+
+    assert board.confirm(1, " Other ") == (1, 2)
+    board.set_stage(1, 2, completed=True)
+    assert board.finalize(1, 10) is False
+    assert board.finalize(1, 11) is True
+    assert board.subgroups() == []
+
+
+def test_waiters_wake_on_changes_from_other_threads():
+    board = MakePartyState()
+    board.register_ready(1, 10, 2, [10, 11])
+    board.register_ready(1, 11, 2, [10, 11])
+    woke = {}
+
+    def wait_stage():
+        state = board.wait_stage(1, 1, timeout=5)
+        woke["stage"] = (time.monotonic(), state["stage"])
+
+    def wait_count():
+        total = board.wait(1, lambda sub: sub.confirmed_total() >= 2 and sub.confirmed_total(), 5)
+        woke["count"] = (time.monotonic(), total)
+
+    threads = [threading.Thread(target=wait_stage), threading.Thread(target=wait_count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    changed = time.monotonic()
+    board.set_stage(1, 1)
+    board.confirm(1, "other")
+    for thread in threads:
+        thread.join(5)
+
+    assert woke["stage"][1] == 1 and woke["count"][1] == 2
+    # woken by the change, not by the periodic recheck
+    assert woke["stage"][0] - changed < WAIT_RECHECK / 2
+    assert woke["count"][0] - changed < WAIT_RECHECK / 2
+
+    assert board.wait_stage(1, 9, timeout=5, cancelled=lambda: True) is None
@@ -0,0 +1,40 @@
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from path import _parse_bin_dimensions, has_line_of_sight, smooth_path  # noqa: E402
+
+
+def test_smooth_path_keeps_straight_walkable_segments():
+    grid = [[1] * 10 for _ in range(10)]
+    for y in range(0, 8):
+        grid[y][5] = 0
+    staircase = [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4), (4, 5), (4, 6), (4, 7),
+                 (4, 8), (5, 8), (6, 7), (7, 6), (8, 5)]
+
+    waypoints = smooth_path(staircase, grid, max_segment=None)
+
+    assert waypoints[-1] == (8, 5)
+    assert len(waypoints) < len(staircase) - 1
+    prev = staircase[0]
+    for cell in waypoints:
+        assert has_line_of_sight(grid, prev, cell)
+        prev = cell
+
+
+def test_smooth_path_respects_max_segment():
+    grid = [[1] * 50]
+    line = [(x, 0) for x in range(50)]
+
+    assert smooth_path(line, grid, max_segment=None) == [(49, 0)]
+    assert smooth_path(line, grid, max_segment=20) == [(20, 0), (40, 0), (49, 0)]
+
+
+def test_bin_dimensions_come_from_the_header():
+    # 300x2 matches none of the old special cases
+    data = struct.pack("<HH", 300, 2) + bytes(600)
+    assert _parse_bin_dimensions(data) == (300, 2)
+    # a header that does not match the size falls back to the old guess
+    assert _parse_bin_dimensions(bytes([4, 0, 9, 9]) + bytes(8)) == (4, 2)
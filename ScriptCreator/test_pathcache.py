@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gridsearch import astar  # noqa: E402
+from pathcache import FuzzyPathCache  # noqa: E402
+
+
+def _open_grid(width=40, height=40):
+    return [[1] * width for _ in range(height)]
+
+
+def test_nearby_start_and_goal_are_stitched_onto_cached_route():
+    grid = _open_grid()
+    cache = FuzzyPathCache(bucket_size=8)
+    cache.store(1, astar(grid, (2, 2), (33, 35)), search_time=0.5)
+
+    path = cache.lookup(1, grid, (3, 4), (34, 33))
+
+    assert path[0] == (3, 4) and path[-1] == (34, 33)
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        assert max(abs(ax - bx), abs(ay - by)) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["exact_hits"] == 0
+    assert stats["saved_time"] > 0
+
+
+def test_other_buckets_and_maps_miss():
+    grid = _open_grid()
+    cache = FuzzyPathCache(bucket_size=8)
+    cache.store(1, astar(grid, (2, 2), (33, 35)))
+
+    assert cache.lookup(1, grid, (2, 2), (33, 35)) is not None
+    assert cache.lookup(1, grid, (12, 2), (33, 35)) is None
+    assert cache.lookup(2, grid, (2, 2), (33, 35)) is None
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,63 @@
+import os
+import sys
+from multiprocessing import shared_memory
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pathservice import PathService, components, pack_grid, unflatten, unpack_grid  # noqa: E402
+
+
+def _walled_grid():
+    # two rooms split by a wall at x == 5, the right one is closed
+    grid = [[1] * 10 for _ in range(8)]
+    for y in range(8):
+        grid[y][5] = 0
+    return grid
+
+
+def test_grid_round_trips_through_shared_layout():
+    grid = _walled_grid()
+    rows = unpack_grid(pack_grid(grid))
+    assert [list(row) for row in rows] == grid
+    labels = components(rows)
+    assert labels[0] == labels[4] != labels[6]
+    assert labels[5] == -1
+
+
+def test_service_answers_from_worker_processes():
+    grid = _walled_grid()
+    grid[3][5] = 1  # a door
+    service = PathService(workers=1, load=lambda _map_id: grid)
+    try:
+        path = unflatten(service.find_path(900001, (0, 0), (9, 7)).result(30))
+        assert path[0] == [0, 0] and path[-1] == [9, 7]
+        assert [5, 3] in path
+        assert service.can_reach(900001, (0, 0), (9, 7)).result(30) is True
+        assert service.nearest_walkable(900001, 5, 6).result(30) in ((4, 6), (6, 6))
+        assert service.stats()["maps"] == 1
+    finally:
+        service.close()
+
+
+def test_old_maps_are_unlinked_and_loaded_outside_the_lock():
+    grid = _walled_grid()
+    loads = []
+
+    def load(map_id):
+        # other requests are not held up while a map loads
+        loads.append(service._lock.locked())
+        return grid
+
+    service = PathService(workers=1, load=load, max_maps=1)
+    try:
+        assert service.can_reach(1, (0, 0), (4, 4)).result(30) is True
+        first = service._blocks[1].name
+        assert service.can_reach(2, (0, 0), (9, 7)).result(30) is False
+        assert loads == [False, False]
+        assert list(service._blocks) == [2]
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=first)
+    finally:
+        service.close()
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from playerevents import PlayerEvents  # noqa: E402
+
+
+def _run_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    return loop
+
+
+def test_position_wait_wakes_on_publish_from_other_thread():
+    loop = _run_loop()
+    events = PlayerEvents(loop)
+    pos = {"x": 0}
+
+    waiting = asyncio.run_coroutine_threadsafe(
+        events.wait_for(lambda: pos["x"] == 5, timeout=5), loop
+    )
+    threading.Timer(0.05, lambda: (pos.update(x=5), events.publish_position())).start()
+
+    assert waiting.result(2) is True
+    assert asyncio.run_coroutine_threadsafe(
+        events.wait_for(lambda: pos["x"] == 9, timeout=0.05), loop
+    ).result(2) is False
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_map_change_before_wait_is_not_missed():
+    loop = _run_loop()
+    events = PlayerEvents(loop)
+    since = events.map_generation
+    events.publish_map(2)
+
+    assert asyncio.run_coroutine_threadsafe(
+        events.wait_map_change(since, timeout=0.05), loop
+    ).result(2) is True
+    loop.call_soon_threadsafe(loop.stop)
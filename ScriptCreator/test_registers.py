@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from registers import Registers  # noqa: E402
+
+
+class _Player(Registers):
+    __slots__ = ("__dict__",)
+
+
+def test_registers_behave_like_attributes():
+    player = _Player()
+    assert player.attr1 == 0 and player.attr50 == 0
+    assert player.changed_registers() == {}
+
+    player.attr51.append("Member")
+    assert player.attr51 == ["Member"]
+    assert player.attr52 == [] and player.attr52 is player.attr52
+    player.attr19 = 3
+    player.attr60 = None
+    assert player.changed_registers() == {"attr19": 3, "attr51": ["Member"], "attr60": None}
+
+    player.reset_registers(99)
+    assert player.attr51 == 0 and player.attr100 == []
+    assert "attr1" not in vars(player)
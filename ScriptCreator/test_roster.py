@@ -0,0 +1,60 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from roster import PartyRoster  # noqa: E402
+
+
+def _roster():
+    return PartyRoster(
+        names=["Lead", "A", "B"],
+        ids=[1, 2, 3],
+        pids=[100, 101, 102],
+        subgroups={101: 1, 102: 1},
+        subgroup_order={101: 1, 102: 2},
+        subgroup_members={1: [(101, "A"), (102, "B")]},
+    )
+
+
+def test_unchanged_assign_keeps_the_version():
+    roster = _roster()
+    version = roster.version
+    assert roster.assign(names=["Lead", "A", "B"], ids=(1, 2, 3)) is False
+    assert roster.version == version
+    assert roster.changes_since(version) == frozenset()
+
+    assert roster.assign(ids=[1, 2, 4]) is True
+    assert roster.version == version + 1
+    # a whole list was replaced
+    assert roster.changes_since(version) is None
+
+
+def test_merge_entries_records_changed_slots():
+    roster = _roster()
+    version = roster.version
+    names = roster.names
+    assert roster.merge_entries([(0, {"name": "A", "id": 2}), (1, {"name": "Bee", "id": 9})]) == {1}
+    assert roster.names == ["Lead", "A", "Bee"] and roster.ids == [1, 2, 9]
+    assert roster.subgroup_members[1] == [(101, "A"), (102, "Bee")]
+    # readers holding the old list are not affected
+    assert names == ["Lead", "A", "B"]
+    assert roster.changes_since(version) == frozenset({1})
+    assert roster.merge_entries([(1, {"name": "Bee"})]) == set()
+    assert roster.version == version + 1
+
+
+def test_memo_is_dropped_on_change():
+    roster = _roster()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return tuple(roster.names)
+
+    assert roster.memo("names", compute) == ("Lead", "A", "B")
+    assert roster.memo("names", compute) == ("Lead", "A", "B")
+    assert len(calls) == 1
+    roster.assign(names=["Lead", "A"])
+    assert roster.memo("names", compute) == ("Lead", "A")
+    assert len(calls) == 2
@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import routeplanner  # noqa: E402
+from routeplanner import PortalGraph  # noqa: E402
+
+
+def _grids(monkeypatch):
+    grids = {m: [[1] * 30 for _ in range(30)] for m in (1, 2, 3, 4)}
+    monkeypatch.setattr(routeplanner, "loadMap", lambda map_id: grids.get(map_id, []))
+
+
+def test_route_picks_cheapest_portal_chain(monkeypatch, tmp_path):
+    _grids(monkeypatch)
+    graph = PortalGraph(path=str(tmp_path / "portals.json"))
+    graph.add(1, (29, 0), 2, (0, 0))
+    graph.add(2, (29, 29), 3, (5, 5))
+    # a direct but far portal on map 1 and a short one via map 4
+    graph.add(1, (0, 29), 4, (0, 0))
+    graph.add(4, (1, 1), 3, (6, 6))
+
+    legs = graph.route(1, (0, 25), 3, (10, 10))
+
+    assert legs == [(1, (0, 29), 4, (0, 0)), (4, (1, 1), 3, (6, 6)), (3, (10, 10), None, None)]
+    assert graph.route(1, (0, 25), 2) == [(1, (29, 0), 2, (0, 0))]
+    assert graph.route(3, (0, 0), 1) == []
+
+
+def test_portals_merge_and_persist(monkeypatch, tmp_path):
+    _grids(monkeypatch)
+    path = str(tmp_path / "portals.json")
+    graph = PortalGraph(path=path)
+
+    assert graph.add(1, (10, 10), 2, (3, 3))
+    assert not graph.add(1, (11, 12), 2, (4, 4))
+    assert PortalGraph.load(path).portals(1) == [((10, 10), 2, (3, 3))]
@@ -0,0 +1,36 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import shadowmaps  # noqa: E402
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _png(pixels):
+    im = Image.new("L", (len(pixels[0]), len(pixels)))
+    im.putdata([v for row in pixels for v in row])
+    buf = io.BytesIO()
+    im.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_import_is_thresholded_packed_and_versioned(tmp_path):
+    directory = str(tmp_path)
+    data = _png([[255, 0, 200], [10, 128, 127]])
+
+    packed = shadowmaps.threshold_image(data)
+    assert shadowmaps.unpack_header(packed) == (3, 2)
+    assert packed[4:] == bytes([0, 1, 0, 1, 0, 1])
+
+    first = shadowmaps.store(7, packed, "a.png", directory)
+    second = shadowmaps.store(7, shadowmaps.threshold_image(data, size=(6, 4)), "b.png", directory)
+
+    assert (first["version"], second["version"]) == (1, 2)
+    assert not os.path.exists(os.path.join(directory, first["file"]))
+    assert shadowmaps.unpack_header(shadowmaps.read(7, directory)) == (6, 4)
+    assert shadowmaps.read(8, directory) is None
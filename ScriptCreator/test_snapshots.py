@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from group_state import CounterStore, GroupStore  # noqa: E402
+from partystate import MakePartyState  # noqa: E402
+from registers import Registers  # noqa: E402
+from roster import PartyRoster  # noqa: E402
+from snapshots import SnapshotWriter, read, restore  # noqa: E402
+
+
+class _Condition:
+    def __init__(self, name, active):
+        self.name = name
+        self.active = active
+
+
+class _Player(Registers):
+    def __init__(self, name, leader, leader_id, number):
+        super().__init__()
+        self.name = name
+        self.attr19 = number
+        self.leadername = leader
+        self.leaderID = leader_id
+        self.subgroup_index = None
+        self.subgroup_member_limit = 0
+        self._current_gid = -1
+        self.party_roster = PartyRoster()
+        self.script_loaded = True
+        self.recv_packet_conditions = [["1_wait", "", True]]
+        self.send_packet_conditions = []
+        self.periodical_conditions = [_Condition("2_walk", True)]
+
+
+def _stores():
+    return GroupStore(), CounterStore(), GroupStore()
+
+
+def test_group_resumes_under_its_new_ids(tmp_path):
+    path = str(tmp_path / "groups.bin")
+    group_store, subgroup_store, runtime_store = _stores()
+    lead, member = _Player("Lead", "Lead", 7, 0), _Player("Member", "Lead", 7, 3)
+    member.subgroup_index = 1
+    member.attr5 = [1, 2]
+    member.attr12 = "stage two"
+    member.recv_packet_conditions[0][2] = False
+    lead.party_roster.assign(names=["Lead", "Member"], ids=[7, 8])
+    group_store.set(7, "phase", 4)
+    group_store.set(7, "lock", threading.Lock())
+    subgroup_store.set((3, 1), "kills", 12)
+    board = MakePartyState()
+    board.register_ready(1, 7, 2, [7, 8], ["Lead", "Member"])
+    runtime_store.set(7, "_make_party_state", board)
+
+    writer = SnapshotWriter(path, lambda: [lead, member], (group_store, subgroup_store, runtime_store))
+    assert writer.flush() is True
+    # nothing changed, nothing written
+    assert writer.flush() is False
+    saved = read(path)["groups"]["Lead"]
+    assert "lock" not in saved["vars"]
+
+    # a new session loads the same group as group number 5
+    stores = _stores()
+    lead, member = _Player("Lead", "Lead", 7, 0), _Player("Member", "Lead", 0, 5)
+    writer = SnapshotWriter(path, lambda: [], stores)
+    group = writer.saved_group("Lead")
+    assert restore(group, [lead, member], *stores) == ["Lead", "Member"]
+
+    group_store, subgroup_store, runtime_store = stores
+    assert group_store.get(7, "phase") == 4
+    assert subgroup_store.get((5, 1), "kills") == 12
+    assert runtime_store.get(7, "_make_party_state").get(1)["ready"] == {7}
+    assert member.attr19 == 5 and member.leaderID == 7 and member.subgroup_index == 1
+    assert member.attr5 == [1, 2] and member.attr12 == "stage two"
+    assert member.recv_packet_conditions[0][2] is False
+    assert lead.party_roster.names == ["Lead", "Member"]
+
+    writer.forget("Lead")
+    assert writer.saved_group("Lead") is None
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from walkdispatch import WalkDispatcher  # noqa: E402
+
+
+def _wait(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def _stop(loop, dispatcher):
+    dispatcher.close()
+    time.sleep(0.05)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_superseded_targets_are_dropped_and_sends_rate_limited():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    sent = []
+    dispatcher = WalkDispatcher(loop, lambda c, x, y: sent.append((c, x, y, time.monotonic())) or True, rate=5)
+
+    dispatcher.submit("player", 1, 1)
+    assert _wait(lambda: len(sent) == 1)
+    for x in range(2, 12):
+        dispatcher.submit("player", x, x)
+    dispatcher.submit("pet", 3, 3)
+
+    assert _wait(lambda: len(sent) == 3)
+    time.sleep(0.3)
+    assert [s[:3] for s in sent] == [("player", 1, 1), ("pet", 3, 3), ("player", 11, 11)]
+    assert sent[2][3] - sent[0][3] >= 0.19
+    stats = dispatcher.stats()
+    assert stats["sent"] == 3 and stats["dropped"] == 9
+    _stop(loop, dispatcher)
+
+
+def test_not_ready_api_is_retried():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    attempts = []
+
+    def send(channel, x, y):
+        attempts.append((x, y))
+        return len(attempts) >= 3
+
+    dispatcher = WalkDispatcher(loop, send)
+    dispatcher.submit("player", 4, 5)
+
+    assert _wait(lambda: dispatcher.stats()["sent"] == 1)
+    assert attempts == [(4, 5)] * 3
+    _stop(loop, dispatcher)
@@ -0,0 +1,48 @@
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import workers  # noqa: E402
+from workers import PlayerWorkers, shared_pool  # noqa: E402
+
+
+def test_players_share_pools_and_shut_down_their_work(monkeypatch):
+    monkeypatch.setitem(workers.POOL_SIZES, "test", 1)
+    first, second = PlayerWorkers("first"), PlayerWorkers("second")
+    assert first.executor("test") is first.executor("test")
+
+    async def search():
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            loop.run_in_executor(first.executor("test"), threading.current_thread),
+            loop.run_in_executor(second.executor("test"), threading.current_thread),
+        )
+
+    # one pool thread serves both players
+    assert len(set(asyncio.run(search()))) == 1
+
+    release, running = threading.Event(), threading.Event()
+
+    def block():
+        running.set()
+        release.wait()
+
+    thread = first.spawn(release.wait)
+    blocker = first.submit("test", block)
+    running.wait(1)
+    queued = first.submit("test", lambda: None)
+    assert first.stats() == {"threads": 1, "futures": 2, "tasks": 0, "started": 1}
+
+    assert first.close(timeout=0.05) == [thread]
+    assert queued.cancelled() and not blocker.cancelled()
+    assert first.spawn(release.wait) is None
+    release.set()
+    thread.join(1)
+    blocker.result(1)
+    assert first.stats()["threads"] == 0 and first.stats()["futures"] == 0
+    # the other player keeps using the pool
+    assert second.submit("test", lambda: 7).result(1) == 7
+    shared_pool("test").shutdown()
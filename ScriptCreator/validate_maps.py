@@ -0,0 +1,248 @@
+"""Decode every map and check every path finder against it.
+
+Run from the ``ScriptCreator`` folder so ``resources/maps.zip`` resolves::
+
+    python validate_maps.py --pairs 5
+    python validate_maps.py --maps 1 260 --finders astar hpa --json report.json
+
+Every ``maps/<id>.bin`` of the archive is decoded the way ``path.loadMap``
+does it. Maps that fail to decode, and maps where the old dimension guess
+disagrees with the header, are listed. For each map, ``--pairs`` random
+start/goal pairs are sampled from the same connected region, so a path
+exists. Every finder is run on them. Each path must start and end on the
+requested cells, move between adjacent walkable cells only, and be as short
+as the shortest one found. HPA* is allowed to be longer and to give up,
+because ``findPath`` falls back to a flat search then. Latency percentiles
+are printed per finder, so a change to a finder can be compared with a
+previous ``--json`` report.
+"""
+
+import argparse
+import json
+import random
+import time
+import zipfile
+
+import path
+from dstarlite import DStarLite
+from flowfield import FlowField
+from gridsearch import astar, cell_coords, is_walkable, path_cost
+from hpa import AbstractGraph
+from pathservice import components
+
+MAPS_ARCHIVE = "resources\\maps.zip"
+# finders whose paths must be shortest paths
+EXACT_FINDERS = ("pathfinding", "astar", "flowfield", "dstar")
+FINDERS = EXACT_FINDERS + ("hpa",)
+_TOLERANCE = 1e-6
+
+
+def map_ids(archive):
+    ids = []
+    for name in archive.namelist():
+        if name.startswith("maps/") and name.endswith(".bin"):
+            try:
+                ids.append(int(name[5:-4]))
+            except ValueError:
+                continue
+    return sorted(ids)
+
+
+def decode(archive, map_id):
+    """Return ``(grid, problem, seconds)``; ``grid`` is ``None`` on failure."""
+
+    begin = time.perf_counter()
+    data = archive.read(f"maps/{map_id}.bin")
+    dimensions = path._parse_bin_dimensions(data)
+    if dimensions is None:
+        return None, "dimensions unknown", time.perf_counter() - begin
+    try:
+        grid = path.convertToArray(data[4:], *dimensions)
+    except ValueError as e:
+        return None, str(e), time.perf_counter() - begin
+    seconds = time.perf_counter() - begin
+    problem = None
+    guessed = path._guess_bin_dimensions(data)
+    if guessed != dimensions:
+        problem = f"header says {dimensions[0]}x{dimensions[1]}, old guess {guessed}"
+    return grid, problem, seconds
+
+
+def sample_pairs(grid, rng, count):
+    """Return ``count`` start/goal pairs that are connected to each other."""
+
+    width = len(grid[0]) if grid else 0
+    labels = components(grid)
+    regions = {}
+    for index, label in enumerate(labels):
+        if label != -1:
+            regions.setdefault(label, []).append(index)
+    # weight regions by size, like picking a random walkable cell
+    cells = [c for c in regions.values() if len(c) > 1]
+    if not cells:
+        return []
+    weights = [len(c) for c in cells]
+    pairs = []
+    for _ in range(count):
+        region = rng.choices(cells, weights)[0]
+        a, b = rng.sample(region, 2)
+        pairs.append(((a % width, a // width), (b % width, b // width)))
+    return pairs
+
+
+def check_path(grid, cells, start, goal):
+    """Return why ``cells`` is not a valid path, or ``None``."""
+
+    if not cells:
+        return "no path"
+    if cells[0] != start or cells[-1] != goal:
+        return f"runs from {cells[0]} to {cells[-1]}"
+    for a, b in zip(cells, cells[1:]):
+        if max(abs(a[0] - b[0]), abs(a[1] - b[1])) != 1:
+            return f"jumps from {a} to {b}"
+        if not is_walkable(grid, *b):
+            return f"crosses blocked cell {b}"
+    return None
+
+
+def _finders(grid, names):
+    finders = {}
+    if "pathfinding" in names:
+        finders["pathfinding"] = lambda s, g: path._flat_find_path(grid, *s, *g)
+    if "astar" in names:
+        finders["astar"] = lambda s, g: astar(grid, s, g)
+    if "flowfield" in names:
+        finders["flowfield"] = lambda s, g: FlowField(grid, g).path_from(s)
+    if "dstar" in names:
+        finders["dstar"] = lambda s, g: DStarLite(grid, s, g).path()
+    if "hpa" in names:
+        graph = AbstractGraph(grid)
+        graph.precompute()
+        finders["hpa"] = graph.find_path
+    return finders
+
+
+def _percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(ids, pair_count, names, seed, verbose=False):
+    rng = random.Random(seed)
+    report = {
+        "maps": 0,
+        "decoded": 0,
+        "decode_failures": {},
+        "dimension_mismatches": {},
+        "decode_times": [],
+        "finders": {
+            name: {"times": [], "invalid": 0, "longer": 0, "empty": 0, "worst_ratio": 1.0}
+            for name in names
+        },
+        "problems": [],
+    }
+    with zipfile.ZipFile(MAPS_ARCHIVE, "r") as archive:
+        ids = ids or map_ids(archive)
+        for map_id in ids:
+            report["maps"] += 1
+            try:
+                grid, problem, seconds = decode(archive, map_id)
+            except KeyError:
+                grid, problem, seconds = None, "not in archive", 0.0
+            if grid is None:
+                report["decode_failures"][map_id] = problem
+                print(f"map {map_id}: decode failed, {problem}")
+                continue
+            report["decoded"] += 1
+            report["decode_times"].append(seconds)
+            if problem:
+                report["dimension_mismatches"][map_id] = problem
+                print(f"map {map_id}: {problem}")
+
+            pairs = sample_pairs(grid, rng, pair_count)
+            finders = _finders(grid, names)
+            for start, goal in pairs:
+                results = {}
+                for name, finder in finders.items():
+                    begin = time.perf_counter()
+                    cells = cell_coords(finder(start, goal))
+                    report["finders"][name]["times"].append(time.perf_counter() - begin)
+                    results[name] = cells
+                costs = {}
+                for name, cells in results.items():
+                    stats = report["finders"][name]
+                    error = check_path(grid, cells, start, goal)
+                    if error == "no path" and name == "hpa":
+                        stats["empty"] += 1
+                        continue
+                    if error:
+                        stats["invalid"] += 1
+                        report["problems"].append((map_id, name, start, goal, error))
+                        continue
+                    costs[name] = path_cost(cells)
+                exact = [costs[n] for n in EXACT_FINDERS if n in costs]
+                if not exact:
+                    continue
+                best = min(exact)
+                for name, cost in costs.items():
+                    stats = report["finders"][name]
+                    if best:
+                        stats["worst_ratio"] = max(stats["worst_ratio"], cost / best)
+                    if name in EXACT_FINDERS and cost > best + _TOLERANCE:
+                        stats["longer"] += 1
+                        report["problems"].append(
+                            (map_id, name, start, goal, f"cost {cost:.3f}, shortest {best:.3f}")
+                        )
+            if verbose:
+                print(f"map {map_id} ({len(grid[0])}x{len(grid)}): {len(pairs)} pairs checked")
+    return report
+
+
+def print_summary(report):
+    times = report["decode_times"]
+    print(
+        f"\ndecoded {report['decoded']}/{report['maps']} maps, "
+        f"{len(report['dimension_mismatches'])} dimension guesses differ from the header; "
+        f"decode p50 {_percentile(times, 0.5) * 1000:.1f} ms, "
+        f"max {max(times, default=0) * 1000:.1f} ms"
+    )
+    print(f"{'finder':<12} {'n':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'invalid':>8} {'longer':>7} {'empty':>6} {'worst':>6}")
+    for name, stats in report["finders"].items():
+        t = stats["times"]
+        print(
+            f"{name:<12} {len(t):>6} {_percentile(t, 0.5) * 1000:>9.2f} "
+            f"{_percentile(t, 0.9) * 1000:>9.2f} {_percentile(t, 0.99) * 1000:>9.2f} "
+            f"{max(t, default=0) * 1000:>9.2f} {stats['invalid']:>8} {stats['longer']:>7} "
+            f"{stats['empty']:>6} {stats['worst_ratio']:>6.3f}"
+        )
+    for map_id, name, start, goal, error in report["problems"][:20]:
+        print(f"  map {map_id} {name} {start} -> {goal}: {error}")
+    if len(report["problems"]) > 20:
+        print(f"  ... {len(report['problems']) - 20} more problems")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate map decoding and path finders")
+    parser.add_argument("--maps", nargs="+", type=int, help="map ids, all maps by default")
+    parser.add_argument("--pairs", type=int, default=5, help="start/goal pairs per map")
+    parser.add_argument("--finders", nargs="+", choices=FINDERS, default=list(FINDERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    report = run(args.maps, args.pairs, args.finders, args.seed, args.verbose)
+    print_summary(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=1)
+    failed = report["decode_failures"] or any(
+        stats["invalid"] or stats["longer"] for stats in report["finders"].values()
+    )
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
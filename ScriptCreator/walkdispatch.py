@@ -0,0 +1,155 @@
+"""Latest-target-wins dispatch of walk packets.
+
+Every walk helper used to append ``player_walk``/``pets_walk`` calls to a FIFO
+drained by a dedicated thread, so resends and concurrent walks piled up stale
+targets that were still sent one after another. ``WalkDispatcher`` keeps at
+most one pending target per channel (``"player"`` and ``"pet"``): a newer
+target replaces the pending one, and sends on a channel are spaced by
+``1 / rate`` seconds. It runs as a task on the player's event loop.
+"""
+
+import asyncio
+import threading
+import time
+
+# walk packets per second and channel
+WALK_SEND_RATE = 10.0
+# delay between attempts while the API is not ready, and how many to make
+RETRY_DELAY = 0.05
+MAX_RETRIES = 20
+
+
+class WalkDispatcher:
+    """Send the latest walk target of each channel through ``send``.
+
+    ``send(channel, x, y)`` performs the call and returns ``False`` when the
+    API is not ready yet; the target is then retried unless it was superseded
+    in the meantime.
+    """
+
+    def __init__(self, loop, send, rate=WALK_SEND_RATE):
+        self.loop = loop
+        self.rate = rate
+        self._send = send
+        self._pending = {}
+        self._retries = {}
+        self._not_before = {}
+        self._lock = threading.Lock()
+        self._wake = None
+        self._task = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def stats(self):
+        """Return how many walk commands were submitted, sent and dropped."""
+
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": len(self._pending),
+            }
+
+    def submit(self, channel, x, y):
+        """Queue a walk to ``(x, y)`` on ``channel``; safe from any thread."""
+
+        with self._lock:
+            self.submitted += 1
+            if channel in self._pending:
+                self.dropped += 1
+            self._pending[channel] = (x, y)
+            self._retries.pop(channel, None)
+        try:
+            self.loop.call_soon_threadsafe(self._kick)
+        except RuntimeError:
+            # loop closed, the player is shutting down
+            pass
+
+    def clear(self):
+        """Forget every pending target."""
+
+        with self._lock:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+            self._retries.clear()
+
+    def close(self):
+        """Stop the dispatch task."""
+
+        task = self._task
+        if task is not None:
+            try:
+                self.loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass
+
+    def rebind(self, loop):
+        """Continue on ``loop`` after the player's loop was recreated."""
+
+        self.loop = loop
+        self._wake = None
+        self._task = None
+        with self._lock:
+            pending = bool(self._pending)
+        if pending:
+            loop.call_soon_threadsafe(self._kick)
+
+    def _kick(self):
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+
+    def _next(self):
+        # channel that may be sent the soonest and when
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                return None, 0.0
+            channel = min(self._pending, key=lambda c: self._not_before.get(c, 0.0))
+            return channel, self._not_before.get(channel, 0.0) - now
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                channel, wait = self._next()
+                if channel is None:
+                    break
+                if wait > 0:
+                    # a newer target may arrive meanwhile and is sent instead
+                    await asyncio.sleep(wait)
+                    continue
+                with self._lock:
+                    target = self._pending.pop(channel, None)
+                if target is None:
+                    continue
+                ok = self._send(channel, *target)
+                now = time.monotonic()
+                with self._lock:
+                    if ok:
+                        self.sent += 1
+                        self._retries.pop(channel, None)
+                        self._not_before[channel] = now + 1.0 / self.rate
+                        continue
+                    retries = self._retries.get(channel, 0) + 1
+                    if channel in self._pending:
+                        # superseded while we were trying
+                        self.dropped += 1
+                        self._retries.pop(channel, None)
+                    elif retries > MAX_RETRIES:
+                        self.failed += 1
+                        self._retries.pop(channel, None)
+                    else:
+                        self._pending[channel] = target
+                        self._retries[channel] = retries
+                    self._not_before[channel] = now + RETRY_DELAY
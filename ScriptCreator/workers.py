@@ -0,0 +1,197 @@
+"""Background threads and pooled work of the players.
+
+Every ``Player`` used to create a 4-worker condition executor (never used)
+and a 1-worker path executor, and to start a thread for every delayed query
+and map change flag. Nothing shut them down when a client disconnected or a
+group was reset, so long sessions collected threads.
+
+:class:`PlayerWorkers` is the lifecycle manager of one player:
+
+* blocking work goes to pools shared by the whole process
+  (:func:`shared_pool`), created on first use; :meth:`PlayerWorkers.executor`
+  returns an executor for ``loop.run_in_executor`` that submits to them and
+  remembers the player's futures;
+* threads of the player (the packet logger, the initial queries) are started
+  with :meth:`PlayerWorkers.spawn`, which tracks them until they return;
+* :meth:`PlayerWorkers.close` refuses new work, cancels the queued futures and
+  joins the threads within a deadline;
+* :meth:`PlayerWorkers.stats` counts live threads, pending futures and the
+  tasks of the player's event loop.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+# workers per shared pool; path searches wait on the path service processes
+# most of the time, so a few threads more than processes keep them busy
+POOL_SIZES = {"path": max(4, min(16, 2 * (os.cpu_count() or 2)))}
+# seconds PlayerWorkers.close waits for the threads of a player
+CLOSE_TIMEOUT = 2.0
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def shared_pool(name):
+    """Return the process-wide pool ``name``, created on first use."""
+
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ThreadPoolExecutor(
+                    max_workers=POOL_SIZES[name], thread_name_prefix=f"player-{name}"
+                )
+    return pool
+
+
+def shutdown_pools(wait=False):
+    """Shut the shared pools down; they are created again when needed."""
+
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class _PlayerExecutor(Executor):
+    """Submits to a shared pool on behalf of one player."""
+
+    def __init__(self, workers, pool):
+        self._workers = workers
+        self._pool = pool
+
+    def submit(self, fn, /, *args, **kwargs):
+        return self._workers.submit(self._pool, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        # the pool is shared; only this player's futures are cancelled
+        if cancel_futures:
+            self._workers.cancel_pending()
+
+
+class PlayerWorkers:
+    """Threads and pooled work of one player."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._threads = set()
+        self._futures = set()
+        self._executors = {}
+        self._closed = False
+        # threads started so far
+        self.started = 0
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stop(self):
+        """Refuse new threads and jobs; :meth:`close` also waits for the old ones."""
+
+        self._closed = True
+
+    def reopen(self):
+        """Accept work again after :meth:`close`, e.g. for a reconnected client."""
+
+        self._closed = False
+
+    def spawn(self, target, *args, name=None):
+        """Run ``target(*args)`` on a new daemon thread; ``None`` once closed."""
+
+        with self._lock:
+            if self._closed:
+                return None
+            self.started += 1
+            thread = threading.Thread(
+                target=self._run,
+                args=(target, args),
+                name=name or f"{self.name or 'player'}-{getattr(target, '__name__', 'worker')}",
+                daemon=True,
+            )
+            self._threads.add(thread)
+        thread.start()
+        return thread
+
+    def _run(self, target, args):
+        try:
+            target(*args)
+        finally:
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+    def submit(self, pool, fn, *args, **kwargs):
+        """Submit ``fn`` to the shared pool ``pool`` and track the future."""
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"workers of {self.name or 'player'} are shut down")
+            future = shared_pool(pool).submit(fn, *args, **kwargs)
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def executor(self, pool):
+        """Return an executor for ``run_in_executor`` backed by the pool ``pool``."""
+
+        executor = self._executors.get(pool)
+        if executor is None:
+            executor = self._executors[pool] = _PlayerExecutor(self, pool)
+        return executor
+
+    def cancel_pending(self):
+        """Cancel the futures that did not start yet; returns how many."""
+
+        with self._lock:
+            futures = list(self._futures)
+        return sum(1 for future in futures if future.cancel())
+
+    def stats(self, loop=None):
+        """Return ``{"threads", "futures", "tasks", "started"}`` counts.
+
+        ``tasks`` counts the unfinished tasks of ``loop``.
+        """
+
+        with self._lock:
+            threads = sum(1 for thread in self._threads if thread.is_alive())
+            futures = len(self._futures)
+        tasks = 0
+        if loop is not None and not loop.is_closed():
+            try:
+                tasks = len(asyncio.all_tasks(loop))
+            except RuntimeError:
+                tasks = 0
+        return {"threads": threads, "futures": futures, "tasks": tasks, "started": self.started}
+
+    def close(self, timeout=CLOSE_TIMEOUT, extra=()):
+        """Stop accepting work, cancel queued futures and join the threads.
+
+        ``extra`` threads (like the event loop thread) are joined as well.
+        The calling thread is never joined. Returns the threads still alive
+        after ``timeout`` seconds.
+        """
+
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        self.cancel_pending()
+        current = threading.current_thread()
+        deadline = time.monotonic() + timeout
+        alive = []
+        for thread in [*threads, *extra]:
+            if thread is None or thread is current:
+                continue
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                alive.append(thread)
+        return alive